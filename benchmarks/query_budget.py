@@ -0,0 +1,392 @@
+"""Check every API endpoint against a declared SQL statement budget.
+
+Usage:
+    python -m benchmarks.query_budget
+    python -m benchmarks.query_budget --small 500 --large 5000 --verbose
+
+Two databases of different sizes are seeded, every route of every
+blueprint is called once on each through the Flask test client, and the
+SQL statements it issues are counted. Caches are cleared before each call,
+so the count is the cold one. The run fails (exit status 1) when an
+endpoint has no budget in BUDGETS, issues more statements than its budget,
+or issues more statements on the larger database than on the smaller one:
+a query per row (N+1). Failures list the statements with the application
+frames that issued them.
+"""
+import argparse
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import traceback
+from collections import Counter
+
+from benchmarks.seed import seed_database
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+ADMIN_TOKEN = 'query-budget'
+
+# Frames of application code shown for each statement, innermost last
+STACK_DEPTH = 6
+
+# Expanding IN lists differ in length from one database to the other
+_IN_LIST = re.compile(r'\(\?(?:, \?)+\)')
+
+# SQL statements per request; a change that needs more must raise its budget here
+BUDGETS = {
+    'admin.export_catalogue': 6,
+    'admin.import_catalogue_upload': 6,
+    'analytics.get_category_analytics': 2,
+    'analytics.get_content_analytics': 2,
+    'analytics.get_site_analytics': 1,
+    'brand.create_brand': 10,
+    'brand.delete_brand': 4,
+    'brand.get_all_brands': 7,
+    'brand.get_brand': 7,
+    'brand.update_brand': 10,
+    'category.create_category': 10,
+    'category.delete_category': 5,
+    'category.get_all_categories': 7,
+    'category.get_category': 7,
+    'category.update_category': 10,
+    'changes.get_changes': 14,
+    'content.create_content': 12,
+    'content.delete_content': 6,
+    'content.download_archive': 8,
+    'content.get_all_content': 9,
+    'content.get_content': 11,
+    'content.get_content_facets': 5,
+    'content.get_content_image': 1,
+    'content.get_content_stats': 5,
+    'content.get_near_duplicates': 4,
+    'content.get_related_content': 8,
+    'content.like_content': 4,
+    'content.update_content': 11,
+    'events.stream_events': 0,
+    'jobs.get_job': 1,
+    'settings.delete_setting': 3,
+    'settings.get_all_settings': 1,
+    'settings.get_developer_mode_status': 1,
+    'settings.get_seo_settings': 5,
+    'settings.get_setting': 1,
+    'settings.get_social_media_settings': 8,
+    'settings.get_theme_settings': 4,
+    'settings.set_setting': 4,
+    'settings.toggle_developer_mode': 3,
+    'settings.update_seo_settings': 6,
+    'settings.update_social_media_settings': 11,
+    'settings.update_theme_settings': 6,
+    'taxonomy.get_taxonomy_tree': 6,
+    'type.create_type': 11,
+    'type.delete_type': 4,
+    'type.get_all_types': 7,
+    'type.get_type': 7,
+    'type.update_type': 10,
+    'user.create_user': 2,
+    'user.delete_user': 3,
+    'user.get_user': 1,
+    'user.get_users': 1,
+    'user.update_user': 2
+}
+
+
+def build_fixtures(app):
+    """Ids the requests refer to, plus spare rows for the delete endpoints to remove"""
+    from PIL import Image
+    from src.models.user import db, User
+    from src.models.content import Content
+    from src.models.category import Category
+    from src.models.type import Type
+    from src.models.brand import Brand
+    from src.models.settings import Settings
+    from src.models.image_hash import ImageHash
+    from src.models.job import Job
+    from src.models.ids import new_id
+    from src.utils.transfer import export_records
+    from src.utils.storage import resolve_url
+    from src.utils.related import rebuild_related
+
+    with app.app_context():
+        # Every reference set, so each request takes its longest path
+        content = Content.query.filter(
+            Content.is_public.is_(True), Content.content_type == 'image',
+            Content.type_id.isnot(None), Content.brand_id.isnot(None)
+        ).order_by(Content.id).first()
+        spare_category = Category(name='Query budget spare')
+        db.session.add(spare_category)
+        db.session.flush()
+        spare_content = Content(title='Query budget spare', file_url='/uploads/query-budget-spare.jpg',
+                                content_type='image', category_id=spare_category.id, uploaded_by=content.uploaded_by)
+        spare_type = Type(name='Query budget spare', category_id=spare_category.id)
+        spare_brand = Brand(name='Query budget spare')
+        spare_user = User(username='query-budget-spare', email='query-budget-spare@example.com', password='spare')
+        db.session.add_all([spare_content, spare_type, spare_brand, spare_user,
+                            Settings(key='query_budget_spare', value='1')])
+        job = Job.enqueue('process-media', {'content_id': content.id})
+        db.session.commit()
+        rebuild_related()
+
+        record = dict(db.session.execute(db.select(Content.__table__).where(Content.id == content.id)).one()._mapping)
+        record.update(id=new_id(), title='Query budget import')
+        catalogue = next(export_records()) + json.dumps({'type': 'content', 'data': record}, default=str) + '\n'
+
+        fixtures = {
+            'content_id': content.id,
+            'hashed_id': ImageHash.query.order_by(ImageHash.content_id).first().content_id,
+            'category_id': content.category_id,
+            'type_id': content.type_id,
+            'brand_id': content.brand_id,
+            'archive_ids': ','.join(row.id for row in Content.query.filter_by(is_public=True).order_by(Content.id).limit(5)),
+            'user_id': content.uploaded_by,
+            'spare_content_id': spare_content.id,
+            'spare_category_id': spare_category.id,
+            'spare_type_id': spare_type.id,
+            'spare_brand_id': spare_brand.id,
+            'spare_user_id': spare_user.id,
+            'job_id': job.id,
+            'catalogue': catalogue.encode('utf-8')
+        }
+
+    image = io.BytesIO()
+    Image.new('RGB', (8, 8), (99, 102, 241)).save(image, 'PNG')
+    fixtures['image'] = image.getvalue()
+
+    # The seeded rows have no files; give this one a real image to resize
+    with app.app_context():
+        backend, key = resolve_url(content.file_url)
+        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as upload:
+            upload.write(fixtures['image'])
+        backend.save_file(upload.name, key, move=True)
+    return fixtures
+
+
+def build_cases(fixtures):
+    """[(endpoint, method, path, request options)]; deletes come last so the other cases keep their rows"""
+    f = fixtures
+    admin = {'headers': {'Authorization': f'Bearer {ADMIN_TOKEN}'}}
+    return [
+        ('content.get_all_content', 'GET', f'/api/content?category_id={f["category_id"]}', {}),
+        ('content.get_content_facets', 'GET', f'/api/content/facets?category_id={f["category_id"]}', {}),
+        ('content.download_archive', 'GET', f'/api/content/archive?ids={f["archive_ids"]}', {}),
+        ('content.get_content', 'GET', f'/api/content/{f["content_id"]}', {}),
+        ('content.create_content', 'POST', '/api/content', {'data': {
+            'files': (io.BytesIO(f['image']), 'budget.png'), 'category_id': f['category_id'], 'tags': 'budget'
+        }}),
+        ('content.update_content', 'PUT', f'/api/content/{f["content_id"]}', {'json': {
+            'description': 'Query budget', 'tags': ['budget']
+        }}),
+        ('content.like_content', 'POST', f'/api/content/{f["content_id"]}/like', {}),
+        ('content.get_content_image', 'GET', f'/api/content/{f["content_id"]}/image?w=320&h=320&fit=cover', {}),
+        ('content.get_near_duplicates', 'GET', f'/api/content/{f["hashed_id"]}/near-duplicates', {}),
+        ('content.get_related_content', 'GET', f'/api/content/{f["content_id"]}/related', {}),
+        ('content.get_content_stats', 'GET', '/api/content/stats', {}),
+        ('category.get_all_categories', 'GET', '/api/categories', {}),
+        ('category.get_category', 'GET', f'/api/categories/{f["category_id"]}', {}),
+        ('category.create_category', 'POST', '/api/categories', {'json': {'name': 'Query budget category'}}),
+        ('category.update_category', 'PUT', f'/api/categories/{f["category_id"]}', {'json': {
+            'description': 'Query budget'
+        }}),
+        ('type.get_all_types', 'GET', '/api/types', {}),
+        ('type.get_type', 'GET', f'/api/types/{f["type_id"]}', {}),
+        ('type.create_type', 'POST', '/api/types', {'json': {
+            'name': 'Query budget type', 'category_id': f['category_id']
+        }}),
+        ('type.update_type', 'PUT', f'/api/types/{f["type_id"]}', {'json': {'description': 'Query budget'}}),
+        ('brand.get_all_brands', 'GET', '/api/brands', {}),
+        ('brand.get_brand', 'GET', f'/api/brands/{f["brand_id"]}', {}),
+        ('brand.create_brand', 'POST', '/api/brands', {'json': {'name': 'Query budget brand'}}),
+        ('brand.update_brand', 'PUT', f'/api/brands/{f["brand_id"]}', {'json': {'description': 'Query budget'}}),
+        ('taxonomy.get_taxonomy_tree', 'GET', '/api/taxonomy', {}),
+        ('settings.get_all_settings', 'GET', '/api/settings', {}),
+        ('settings.get_setting', 'GET', '/api/settings/theme_mode', {}),
+        ('settings.set_setting', 'PUT', '/api/settings/query_budget_spare', {'json': {'value': '2'}}),
+        ('settings.get_theme_settings', 'GET', '/api/settings/theme', {}),
+        ('settings.update_theme_settings', 'POST', '/api/settings/theme', {'json': {
+            'theme_mode': 'light', 'primary_color': '#6366f1'
+        }}),
+        ('settings.get_social_media_settings', 'GET', '/api/settings/social-media', {}),
+        ('settings.update_social_media_settings', 'POST', '/api/settings/social-media', {'json': {
+            'github': 'https://github.com/Abdallah72288'
+        }}),
+        ('settings.get_seo_settings', 'GET', '/api/settings/seo', {}),
+        ('settings.update_seo_settings', 'POST', '/api/settings/seo', {'json': {'site_author': 'Abdallah'}}),
+        ('settings.get_developer_mode_status', 'GET', '/api/settings/developer-mode', {}),
+        ('settings.toggle_developer_mode', 'POST', '/api/settings/developer-mode', {'json': {'enabled': False}}),
+        ('analytics.get_site_analytics', 'GET', '/api/analytics/site', {}),
+        ('analytics.get_category_analytics', 'GET', f'/api/analytics/categories/{f["category_id"]}', {}),
+        ('analytics.get_content_analytics', 'GET', f'/api/analytics/content/{f["content_id"]}', {}),
+        ('changes.get_changes', 'GET', '/api/changes?since=0', {}),
+        ('events.stream_events', 'GET', '/api/events', {}),
+        ('jobs.get_job', 'GET', f'/api/jobs/{f["job_id"]}', {}),
+        ('admin.export_catalogue', 'GET', '/api/admin/export', admin),
+        ('admin.import_catalogue_upload', 'POST', '/api/admin/import', {**admin, 'data': {
+            'file': (io.BytesIO(f['catalogue']), 'catalogue.ndjson')
+        }}),
+        ('user.get_users', 'GET', '/api/users', {}),
+        ('user.create_user', 'POST', '/api/users', {'json': {
+            'username': 'query-budget', 'email': 'query-budget@example.com', 'password': 'query-budget'
+        }}),
+        ('user.get_user', 'GET', f'/api/users/{f["user_id"]}', {}),
+        ('user.update_user', 'PUT', f'/api/users/{f["user_id"]}', {'json': {'role': 'uploader'}}),
+        ('user.delete_user', 'DELETE', f'/api/users/{f["spare_user_id"]}', {}),
+        ('settings.delete_setting', 'DELETE', '/api/settings/query_budget_spare', {}),
+        ('content.delete_content', 'DELETE', f'/api/content/{f["spare_content_id"]}', {}),
+        ('type.delete_type', 'DELETE', f'/api/types/{f["spare_type_id"]}', {}),
+        ('brand.delete_brand', 'DELETE', f'/api/brands/{f["spare_brand_id"]}', {}),
+        ('category.delete_category', 'DELETE', f'/api/categories/{f["spare_category_id"]}', {}),
+    ]
+
+
+def blueprint_endpoints(app):
+    return {rule.endpoint for rule in app.url_map.iter_rules() if '.' in rule.endpoint and rule.endpoint != 'static'}
+
+
+def application_stack():
+    """The innermost frames of application code on the current call stack"""
+    frames = [frame for frame in traceback.extract_stack()[:-2] if frame.filename.startswith(SOURCE_DIR)]
+    root = os.path.dirname(SOURCE_DIR)
+    return [f'{os.path.relpath(frame.filename, root)}:{frame.lineno} in {frame.name}'
+            for frame in frames[-STACK_DEPTH:]]
+
+
+def measure(app, fixtures):
+    """{endpoint: {'status', 'statements': [[sql, stack]]}} for one call of each case"""
+    from sqlalchemy import event
+    from src.models.user import db
+    from src.models.taxonomy import invalidate_taxonomy
+    from src.routes.content import facet_cache
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append([_IN_LIST.sub('(?, ...)', ' '.join(statement.split())), application_stack()])
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+
+    client = app.test_client()
+    results = {}
+    try:
+        for endpoint, method, path, options in build_cases(fixtures):
+            facet_cache.clear()
+            invalidate_taxonomy()
+            statements.clear()
+            response = client.open(path, method=method, buffered=False, **options)
+            if endpoint != 'events.stream_events':  # Never ends; the handler itself is what is measured
+                response.get_data()
+            response.close()
+            results[endpoint] = {'status': response.status_code, 'statements': list(statements)}
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return results
+
+
+def run_scale(rows, directory):
+    """Seed and measure in a child process: the application binds to one database per process"""
+    output = os.path.join(directory, f'budget-{rows}.json')
+    subprocess.run([sys.executable, '-m', 'benchmarks.query_budget', '--measure', str(rows),
+                    '--directory', directory, '--output', output], check=True)
+    with open(output) as handle:
+        return json.load(handle)
+
+
+def print_statements(statements, highlight=None):
+    counts = Counter(sql for sql, _ in statements)
+    shown = set()
+    for sql, stack in statements:
+        if sql in shown or (highlight is not None and sql not in highlight):
+            continue
+        shown.add(sql)
+        print(f'    {counts[sql]}x {sql[:300]}')
+        for frame in stack:
+            print(f'         {frame}')
+
+
+def check(small, large, endpoints, verbose=False):
+    """Print a row per endpoint and the details of each failure; returns the number of failures"""
+    failures = 0
+    print(f'{"endpoint":44} {"status":>6} {"small":>6} {"large":>6} {"budget":>6}')
+    for endpoint in sorted(endpoints | set(BUDGETS)):
+        budget = BUDGETS.get(endpoint)
+        if endpoint not in small or endpoint not in large:
+            failures += 1
+            print(f'{endpoint:44} FAIL: no request for this endpoint in build_cases')
+            continue
+        status = large[endpoint]['status']
+        small_statements, large_statements = small[endpoint]['statements'], large[endpoint]['statements']
+        print(f'{endpoint:44} {status:>6} {len(small_statements):>6} {len(large_statements):>6} '
+              f'{"-" if budget is None else budget:>6}')
+
+        problems = []
+        if endpoint not in endpoints:
+            problems.append('budget for an endpoint that no longer exists')
+        if budget is None:
+            problems.append('no budget declared in BUDGETS')
+        elif len(large_statements) > budget:
+            problems.append(f'{len(large_statements)} statements, over the budget of {budget}')
+        if len(large_statements) > len(small_statements):
+            problems.append(f'{len(large_statements) - len(small_statements)} more statements on the larger database')
+        if status >= 500:
+            problems.append(f'status {status}')
+
+        if problems:
+            failures += 1
+            print(f'  FAIL: {"; ".join(problems)}')
+            small_counts = Counter(sql for sql, _ in small_statements)
+            repeated = {sql for sql, count in Counter(sql for sql, _ in large_statements).items()
+                        if count > 1 or count > small_counts[sql]}
+            if repeated:
+                print('  Repeated or grown with the data:')
+                print_statements(large_statements, repeated)
+            print('  Statements:')
+            print_statements(large_statements)
+        elif verbose:
+            print_statements(large_statements)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--small', type=int, default=300, help='Content rows in the smaller database')
+    parser.add_argument('--large', type=int, default=3000, help='Content rows in the larger database')
+    parser.add_argument('--verbose', action='store_true', help='List the statements of passing endpoints too')
+    parser.add_argument('--measure', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--directory', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        directory = os.path.join(args.directory, str(args.measure))
+        os.makedirs(directory)
+        os.environ['IMAGE_CACHE_FOLDER'] = os.path.join(directory, 'image-cache')
+        app = seed_database(os.path.join(directory, 'gallery.db'), args.measure, echo=lambda message: None)
+        from src.utils.storage import create_storage
+        app.config['UPLOAD_FOLDER'] = os.path.join(directory, 'uploads')
+        app.config['ADMIN_TOKEN'] = ADMIN_TOKEN
+        app.extensions['storage'] = create_storage(app)
+        results = measure(app, build_fixtures(app))
+        results['_endpoints'] = sorted(blueprint_endpoints(app))
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f'Seeding and measuring {args.small} and {args.large} content rows')
+        small = run_scale(args.small, directory)
+        large = run_scale(args.large, directory)
+    endpoints = set(large.pop('_endpoints'))
+    small.pop('_endpoints')
+
+    failures = check(small, large, endpoints, args.verbose)
+    if failures:
+        print(f'\n{failures} endpoint(s) failed their query budget')
+        sys.exit(1)
+    print(f'\nAll {len(endpoints)} endpoints within their query budgets')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,354 @@
+"""Benchmark every public endpoint and compare against a saved baseline.
+
+Usage:
+    python -m benchmarks.run --scale 10k
+    python -m benchmarks.run --scale 100k --mode server --workers 4 --concurrency 16
+    python -m benchmarks.run --scale 100k --mode all --concurrency 1000
+    python -m benchmarks.run --scale 10k --save-baseline benchmarks/baselines/10k.json
+    python -m benchmarks.run --scale 10k --baseline benchmarks/baselines/10k.json
+
+"client" mode drives the Flask test client in-process and also counts SQL
+statements per request; "server" mode starts a pre-forked Flask server and
+"async" mode the asyncio read server (read-path endpoints only), both loaded
+over concurrent keep-alive HTTP connections. "all" runs every mode and
+compares the two servers. The run fails (exit status 1) when an
+endpoint's p95 latency or throughput is worse than the baseline by more than
+--tolerance, or when it issues more SQL statements than before.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.seed import database_url, load_app, parse_scale, seed_database
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCHMARK_DIR, 'data')
+
+
+def build_endpoints(app, seed=7):
+    """Return [(name, method, path)] covering every public endpoint"""
+    from src.models.content import Content
+    from src.models.category import Category
+    from src.models.type import Type
+    from src.models.brand import Brand
+    from src.models.image_hash import ImageHash
+
+    rng = random.Random(seed)
+    with app.app_context():
+        content_id = Content.query.filter_by(is_public=True).order_by(Content.id).first().id
+        hashed_id = ImageHash.query.order_by(ImageHash.content_id).first().content_id
+        category = Category.query.order_by(Category.name).first()
+        type_id = Type.query.order_by(Type.name).first().id
+        brand_id = Brand.query.order_by(Brand.name).first().id
+        search = rng.choice(['item 00', 'Bench', '12'])
+
+    return [
+        ('index', 'GET', '/'),
+        ('health', 'GET', '/health'),
+        ('content_list', 'GET', '/api/content'),
+        ('content_list_filtered', 'GET', f'/api/content?category_id={category.id}&content_type=image'),
+        ('content_list_search', 'GET', f'/api/content?search={search.replace(" ", "%20")}'),
+        ('content_list_trending', 'GET', '/api/content?sort=trending'),
+        ('content_list_deep_page', 'GET', '/api/content?page=200'),
+        ('content_detail', 'GET', f'/api/content/{content_id}'),
+        ('content_like', 'POST', f'/api/content/{content_id}/like'),
+        ('content_facets', 'GET', f'/api/content/facets?category_id={category.id}'),
+        ('content_stats', 'GET', '/api/content/stats'),
+        ('content_near_duplicates', 'GET', f'/api/content/{hashed_id}/near-duplicates'),
+        ('categories', 'GET', '/api/categories'),
+        ('category_detail', 'GET', f'/api/categories/{category.id}'),
+        ('types', 'GET', '/api/types'),
+        ('type_detail', 'GET', f'/api/types/{type_id}'),
+        ('brands', 'GET', '/api/brands'),
+        ('brand_detail', 'GET', f'/api/brands/{brand_id}'),
+        ('taxonomy', 'GET', '/api/taxonomy'),
+        ('settings', 'GET', '/api/settings'),
+        ('settings_theme', 'GET', '/api/settings/theme'),
+        ('settings_seo', 'GET', '/api/settings/seo'),
+        ('settings_social', 'GET', '/api/settings/social-media'),
+        ('analytics_site', 'GET', '/api/analytics/site'),
+        ('analytics_category', 'GET', f'/api/analytics/categories/{category.id}'),
+        ('analytics_content', 'GET', f'/api/analytics/content/{content_id}'),
+        ('sitemap', 'GET', '/api/sitemap'),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, elapsed, queries=None):
+    """Turn raw samples into the reported metrics (latencies in milliseconds)"""
+    latencies = sorted(latencies)
+    result = {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status >= 500),
+        'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3)
+    }
+    if queries is not None:
+        result['queries_per_request'] = max(queries) if queries else 0
+    return result
+
+
+def run_client(app, endpoints, requests_per_endpoint, warmup=3):
+    """Benchmark through the Flask test client, counting SQL per request"""
+    from sqlalchemy import event
+    from src.models.user import db
+
+    counter = {'statements': 0}
+
+    def count(*args, **kwargs):
+        counter['statements'] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+
+    client = app.test_client()
+    results = {}
+    try:
+        for name, method, path in endpoints:
+            for _ in range(warmup):
+                client.open(path, method=method)
+
+            latencies, statuses, queries = [], [], []
+            started = time.perf_counter()
+            for _ in range(requests_per_endpoint):
+                counter['statements'] = 0
+                begin = time.perf_counter()
+                response = client.open(path, method=method, headers={'Accept-Encoding': 'gzip'})
+                response.get_data()
+                latencies.append(time.perf_counter() - begin)
+                statuses.append(response.status_code)
+                queries.append(counter['statements'])
+            results[name] = summarize(latencies, statuses, time.perf_counter() - started, queries)
+            print_row(name, results[name])
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return results
+
+
+# Endpoints the asyncio read server (src/read_server.py) handles
+READ_PATH_ENDPOINTS = {
+    'health', 'content_list', 'content_list_filtered', 'content_list_search', 'content_list_trending',
+    'content_list_deep_page', 'categories', 'types', 'brands', 'taxonomy'
+}
+
+
+def server_command(kind, database, port, workers):
+    if kind == 'async':
+        return [sys.executable, '-m', 'src.read_server', '--database', database_url(database),
+                '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers)]
+    return [sys.executable, '-m', 'benchmarks.server', '--database', database,
+            '--port', str(port), '--workers', str(workers)]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    return status, headers.get('connection') != 'close'
+
+
+async def generate_load(port, method, path, connections, total_requests):
+    """Send total_requests over the given number of concurrent keep-alive connections"""
+    latencies, statuses = [], []
+    remaining = total_requests
+    payload = (f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+               f'Accept-Encoding: gzip\r\nContent-Length: 0\r\n\r\n').encode()
+
+    async def connection():
+        nonlocal remaining
+        reader = writer = None
+        try:
+            while remaining > 0:
+                remaining -= 1
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                begin = time.perf_counter()
+                writer.write(payload)
+                status, keep_alive = await read_response(reader)
+                latencies.append(time.perf_counter() - begin)
+                statuses.append(status)
+                if not keep_alive:
+                    writer.close()
+                    writer = None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(connection() for _ in range(connections)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def run_server(kind, database, endpoints, requests_per_endpoint, workers, concurrency, port):
+    """Benchmark a real multi-worker server over concurrent keep-alive connections"""
+    server = subprocess.Popen(server_command(kind, database, port, workers), cwd=os.path.dirname(BENCHMARK_DIR))
+    try:
+        wait_for_server(server, port)
+        results = {}
+        for name, method, path in endpoints:
+            latencies, statuses, elapsed = asyncio.run(
+                generate_load(port, method, path, concurrency, max(requests_per_endpoint, concurrency))
+            )
+            results[name] = summarize(latencies, statuses, elapsed)
+            print_row(name, results[name])
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def wait_for_server(server, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'benchmark server exited with status {server.returncode}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError('benchmark server did not start')
+
+
+def print_comparison(flask_results, async_results):
+    print('Async read server vs Flask workers')
+    for name, current in async_results.items():
+        baseline = flask_results.get(name)
+        if not baseline or not baseline['throughput']:
+            continue
+        print(f'  {name:<26} throughput x{current["throughput"] / baseline["throughput"]:>6.2f}  '
+              f'p99 {baseline["p99_ms"]:>9.2f} -> {current["p99_ms"]:>9.2f} ms')
+
+
+def print_row(name, result):
+    queries = result.get('queries_per_request')
+    print(f'  {name:<26} {result["throughput"]:>9.1f} req/s  p50 {result["p50_ms"]:>9.2f} ms  '
+          f'p95 {result["p95_ms"]:>9.2f} ms  p99 {result["p99_ms"]:>9.2f} ms'
+          + (f'  sql {queries:>4}' if queries is not None else '')
+          + (f'  errors {result["errors"]}' if result['errors'] else ''))
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages"""
+    regressions = []
+    for mode, endpoints in results.items():
+        for name, current in endpoints.items():
+            previous = baseline.get(mode, {}).get(name)
+            if not previous:
+                continue
+            if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                regressions.append(f'{mode}/{name}: p95 {previous["p95_ms"]} -> {current["p95_ms"]} ms')
+            if current['throughput'] < previous['throughput'] * (1 - tolerance):
+                regressions.append(f'{mode}/{name}: throughput {previous["throughput"]} -> {current["throughput"]} req/s')
+            if current.get('queries_per_request', 0) > previous.get('queries_per_request', float('inf')):
+                regressions.append(f'{mode}/{name}: SQL statements {previous["queries_per_request"]} -> '
+                                   f'{current["queries_per_request"]}')
+            if current['errors'] > previous['errors']:
+                regressions.append(f'{mode}/{name}: errors {previous["errors"]} -> {current["errors"]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='10k', help='10k, 100k, 1m or a row count')
+    parser.add_argument('--database', help='Seeded SQLite file (default: benchmarks/data/zamzam-<scale>.db)')
+    parser.add_argument('--mode', choices=['client', 'server', 'async', 'both', 'all'], default='both',
+                        help='both = client + server; all = client + server + async')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+    parser.add_argument('--workers', type=int, default=4, help='Server worker processes')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent keep-alive connections in server modes')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--only', help='Comma-separated endpoint names to run')
+    parser.add_argument('--baseline', help='Compare against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed latency/throughput regression')
+    parser.add_argument('--save-baseline', metavar='PATH', help='Write the results as a new baseline')
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(DATA_DIR, f'zamzam-{args.scale.lower()}.db')
+    if not os.path.exists(database):
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        print(f'Seeding {database}')
+        app = seed_database(database, parse_scale(args.scale))
+    else:
+        app = load_app(database)
+
+    endpoints = build_endpoints(app)
+    if args.only:
+        wanted = set(args.only.split(','))
+        endpoints = [endpoint for endpoint in endpoints if endpoint[0] in wanted]
+
+    results = {}
+    if args.mode in ('client', 'both', 'all'):
+        print('Flask test client')
+        results['client'] = run_client(app, endpoints, args.requests)
+    if args.mode in ('server', 'both', 'all'):
+        print(f'Flask server ({args.workers} workers, {args.concurrency} connections)')
+        results['server'] = run_server('flask', database, endpoints, args.requests,
+                                       args.workers, args.concurrency, args.port)
+    if args.mode in ('async', 'all'):
+        print(f'Async read server ({args.workers} workers, {args.concurrency} connections)')
+        read_endpoints = [endpoint for endpoint in endpoints if endpoint[0] in READ_PATH_ENDPOINTS]
+        results['async'] = run_server('async', database, read_endpoints, args.requests,
+                                      args.workers, args.concurrency, args.port)
+    if 'server' in results and 'async' in results:
+        print_comparison(results['server'], results['async'])
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f'Baseline written to {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('Regressions:')
+            for message in regressions:
+                print(f'  {message}')
+            sys.exit(1)
+        print('No regressions against baseline')
+
+
+if __name__ == '__main__':
+    main()
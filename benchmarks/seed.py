@@ -0,0 +1,208 @@
+"""Seed a synthetic gallery database for benchmarking.
+
+Usage:
+    python -m benchmarks.seed --scale 100k --database benchmarks/data/zamzam-100k.db
+
+The database is created through the application itself (so the schema and
+default rows match production) and then filled with content whose category,
+type, brand, tag and activity distributions are skewed like a real gallery.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+CATEGORY_COUNT = 24
+BRAND_COUNT = 60
+TAG_VOCABULARY = 400
+USER_COUNT = 20
+BATCH_SIZE = 10_000
+
+IMAGE_SIZES = [(4032, 3024), (3024, 4032), (1920, 1080), (1080, 1920), (1080, 1080), (6000, 4000), (800, 600)]
+VIDEO_SIZES = [(1920, 1080), (1080, 1920), (3840, 2160), (1280, 720)]
+
+
+def parse_scale(value):
+    """Accept 10k/100k/1m or a plain row count"""
+    return SCALES.get(value.lower()) or int(value)
+
+
+def database_url(path):
+    return f'sqlite:///{os.path.abspath(path)}'
+
+
+def load_app(path):
+    """Import the application bound to the database at path"""
+    os.environ['DATABASE_URL'] = database_url(path)
+    # Every benchmark request comes from one address
+    os.environ.setdefault('ADMISSION_RATE_LIMITS', 'off')
+    from src.main import app
+    return app
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative Zipf weights, so a few options get most of the rows"""
+    total = 0.0
+    cumulative = []
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def seed_database(path, rows, seed=42, echo=print):
+    """Create and fill the database at path with the given number of content rows"""
+    app = load_app(path)
+
+    from src.models.user import db, User
+    from src.models.ids import new_id
+    from src.models.category import Category
+    from src.models.type import Type
+    from src.models.brand import Brand
+    from src.models.content import Content, ranking_score, RANKING_HALF_LIVES, UPLOAD_WEIGHT, VIEW_WEIGHT, LIKE_WEIGHT
+    from src.models.image_hash import ImageHash
+    from src.models.analytics import ContentStatsBucket
+    from src.utils.perceptual_hash import split_bands, to_signed
+
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    with app.app_context():
+        connection = db.session.connection()
+        connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+        connection.exec_driver_sql('PRAGMA synchronous=OFF')
+
+        for i in range(CATEGORY_COUNT):
+            db.session.add(Category(name=f'Bench category {i:02d}', description='Synthetic category'))
+        for i in range(BRAND_COUNT):
+            db.session.add(Brand(name=f'Bench brand {i:02d}', description='Synthetic brand'))
+        for i in range(USER_COUNT):
+            db.session.add(User(username=f'bench{i:02d}', email=f'bench{i:02d}@example.com', password='bench'))
+        db.session.flush()
+
+        categories = [c.id for c in Category.query.order_by(Category.name)]
+        for category_id in categories:
+            for i in range(rng.randint(3, 8)):
+                db.session.add(Type(name=f'Bench type {i}', category_id=category_id, description='Synthetic type'))
+        db.session.commit()
+
+        brands = [b.id for b in Brand.query.order_by(Brand.name)]
+        users = [u.id for u in User.query.order_by(User.username)]
+        types_by_category = {}
+        for type_obj in Type.query.order_by(Type.name):
+            types_by_category.setdefault(type_obj.category_id, []).append(type_obj.id)
+
+        rng.shuffle(categories)
+        rng.shuffle(brands)
+        category_weights = zipf_weights(len(categories))
+        brand_weights = zipf_weights(len(brands))
+        tags = [f'tag-{i:04d}' for i in range(TAG_VOCABULARY)]
+        tag_weights = zipf_weights(len(tags), 1.0)
+        span = timedelta(days=3 * 365).total_seconds()
+
+        hashes = []
+        inserted = 0
+        while inserted < rows:
+            content_rows, hash_rows, bucket_rows = [], [], []
+            for _ in range(min(BATCH_SIZE, rows - inserted)):
+                content_id = new_id()
+                category_id = rng.choices(categories, cum_weights=category_weights)[0]
+                category_types = types_by_category.get(category_id, [])
+                is_image = rng.random() < 0.8
+                width, height = rng.choice(IMAGE_SIZES if is_image else VIDEO_SIZES)
+                # Upload volume grows over time: recent dates are more likely
+                upload_date = now - timedelta(seconds=span * (1 - rng.random() ** 0.6))
+                views = int(rng.lognormvariate(3, 1.5))
+                likes = int(views * rng.betavariate(1, 30))
+                extension = rng.choice(['jpg', 'png']) if is_image else 'mp4'
+                weight = UPLOAD_WEIGHT + VIEW_WEIGHT * views + LIKE_WEIGHT * likes
+
+                content_rows.append({
+                    'id': content_id,
+                    'title': f'Bench item {inserted:07d}',
+                    'description': 'Synthetic benchmark content' if rng.random() < 0.5 else None,
+                    'file_url': f'/uploads/{content_id}.{extension}',
+                    'thumbnail_url': f'/uploads/{content_id}.{extension}' if is_image else None,
+                    'content_type': 'image' if is_image else 'video',
+                    'upload_date': upload_date,
+                    'views_count': views,
+                    'likes_count': likes,
+                    'trending_score': ranking_score(weight, upload_date, RANKING_HALF_LIVES['trending_score']),
+                    'popular_score': ranking_score(weight, upload_date, RANKING_HALF_LIVES['popular_score']),
+                    'category_id': category_id,
+                    'type_id': rng.choice(category_types) if category_types and rng.random() < 0.55 else None,
+                    'brand_id': rng.choices(brands, cum_weights=brand_weights)[0] if rng.random() < 0.4 else None,
+                    'uploaded_by': rng.choice(users),
+                    'tags': json.dumps(sorted(set(rng.choices(tags, cum_weights=tag_weights, k=rng.randint(0, 6))))),
+                    'is_public': rng.random() < 0.97,
+                    'content_metadata': None,
+                    'width': width,
+                    'height': height,
+                    'orientation': 'landscape' if width > height else 'portrait' if width < height else 'square',
+                    'file_size': rng.randint(200_000, 8_000_000) if is_image else rng.randint(5_000_000, 90_000_000),
+                    'mime_type': {'jpg': 'image/jpeg', 'png': 'image/png', 'mp4': 'video/mp4'}[extension],
+                    'captured_at': upload_date - timedelta(days=rng.randint(0, 30)),
+                    'camera_model': rng.choice(['iPhone 15 Pro', 'Canon EOS R5', 'Pixel 8', None])
+                })
+
+                if is_image:
+                    # About 3% of images are re-encoded copies of an earlier one
+                    if hashes and rng.random() < 0.03:
+                        value = rng.choice(hashes)
+                        for bit in rng.sample(range(64), rng.randint(0, 4)):
+                            value ^= 1 << bit
+                    else:
+                        value = rng.getrandbits(64)
+                    hashes.append(value)
+                    bands = split_bands(value)
+                    hash_rows.append({'content_id': content_id, 'hash': to_signed(value),
+                                      **{f'band_{band}': bands[band] for band in range(4)}})
+
+                if rng.random() < 0.01:
+                    for days in range(0, 60, 6):
+                        bucket_rows.append({
+                            'content_id': content_id,
+                            'granularity': 'day' if days >= 7 else 'hour',
+                            'bucket_start': (now - timedelta(days=days)).replace(minute=0, second=0)
+                            if days < 7 else (now - timedelta(days=days)).replace(hour=0, minute=0, second=0),
+                            'category_id': category_id,
+                            'views': rng.randint(1, 50),
+                            'likes': rng.randint(0, 5)
+                        })
+                inserted += 1
+
+            db.session.execute(db.insert(Content), content_rows)
+            if hash_rows:
+                db.session.execute(db.insert(ImageHash), hash_rows)
+            if bucket_rows:
+                db.session.execute(db.insert(ContentStatsBucket), bucket_rows)
+            db.session.commit()
+            echo(f'  {inserted}/{rows} content rows')
+
+        connection = db.session.connection()
+        connection.exec_driver_sql('ANALYZE')
+        db.session.commit()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='10k', help='10k, 100k, 1m or a row count')
+    parser.add_argument('--database', help='Output SQLite file (default: benchmarks/data/zamzam-<scale>.db)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+    args = parser.parse_args()
+
+    path = args.database or os.path.join(os.path.dirname(__file__), 'data', f'zamzam-{args.scale.lower()}.db')
+    if os.path.exists(path):
+        parser.error(f'{path} already exists')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    print(f'Seeding {path}')
+    seed_database(path, parse_scale(args.scale), args.seed)
+
+
+if __name__ == '__main__':
+    main()
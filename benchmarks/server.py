@@ -0,0 +1,71 @@
+"""Run the application as a pre-forked multi-worker HTTP server.
+
+Usage:
+    python -m benchmarks.server --database benchmarks/data/zamzam-10k.db --port 8765 --workers 4
+
+All workers accept connections from one shared listening socket, like a
+production pre-fork server, so the benchmark does not depend on gunicorn
+being installed.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+
+from werkzeug.serving import make_server
+
+from benchmarks.seed import load_app
+
+
+def serve(app, host, port, workers):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(1024)
+    listener.set_inheritable(True)
+
+    from src.models.user import db
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            # Connections opened before the fork must not be shared
+            with app.app_context():
+                db.engine.dispose(close=False)
+            server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def stop(signum, frame):
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in children:
+        os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='SQLite file to serve')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = load_app(args.database)
+    app.logger.setLevel(logging.ERROR)  # Slow-query warnings would flood the report
+    serve(app, args.host, args.port, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify, send_file
+from flask import Flask, send_from_directory, jsonify, send_file, abort, redirect, request
 from flask_cors import CORS
 from datetime import datetime
 
@@ -17,6 +17,13 @@ from src.models.category import Category
 from src.models.type import Type
 from src.models.brand import Brand
 from src.models.settings import Settings
+from src.models.analytics import ContentStatsBucket
+from src.models.image_hash import ImageHash
+from src.models.job import Job
+from src.models.change import Change
+from src.models.event import Event
+from src.models.related import ContentTag, RelatedContent
+from src.models.schema import upgrade_schema
 
 # Import all routes
 from src.routes.user import user_bp
@@ -25,10 +32,37 @@ from src.routes.category import category_bp
 from src.routes.type import type_bp
 from src.routes.brand import brand_bp
 from src.routes.settings import settings_bp
+from src.routes.analytics import analytics_bp
+from src.routes.taxonomy import taxonomy_bp
+from src.routes.jobs import jobs_bp
+from src.routes.admin import admin_bp
+from src.routes.changes import changes_bp
+from src.routes.events import events_bp
+
+from src.utils.metrics import init_metrics, report_exception
+from src.utils.admission import init_admission
+from src.utils.events import init_events
+from src.utils.compression import init_compression, send_precompressed, precompress_command
+from src.utils.assets import build_assets_command
+from src.utils.ranking import update_rankings_command
+from src.utils.analytics import rollup_analytics_command
+from src.utils.duplicates import find_duplicates_command
+from src.utils.media_metadata import extract_metadata_command
+from src.utils.reconcile import reconcile_uploads_command
+from src.utils.jobs import run_jobs_command, requeue_jobs_command
+from src.utils.transfer import export_catalogue_command, import_catalogue_command
+from src.utils.ingest import ingest_media_command
+from src.utils.changes import compact_changes_command
+from src.utils.related import update_related_command
+from src.utils.storage import init_storage, create_storage, shard_key, migrate_storage_command
+from src.utils.images import init_images
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'zamzam-gallery-secret-key-2025'
 
+# Bearer token for the /api/admin endpoints; they are disabled when unset
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+
 # Enable CORS for all routes
 CORS(app, origins="*")
 
@@ -36,6 +70,64 @@ CORS(app, origins="*")
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
 app.config['UPLOAD_FOLDER'] = os.path.join(app.static_folder, 'uploads')
 
+# Uploads go to STORAGE_BACKEND (local sharded directory or S3);
+# move existing files with `flask migrate-storage`
+init_storage(app)
+app.cli.add_command(migrate_storage_command)
+
+# Resized image variants for /api/content/<id>/image, in a size-bounded disk cache
+init_images(app)
+
+# Request timings, SQL counts and slow-query log; Prometheus output at /metrics.
+# Registered before compression so response sizes are the compressed ones.
+init_metrics(app)
+
+# Per-pool concurrency limits and per-client rate limits, so uploads and
+# writes cannot take the threads the read endpoints need
+init_admission(app)
+
+# Compress API responses; static files are precompressed by `flask precompress-static`
+init_compression(app)
+app.cli.add_command(precompress_command)
+
+# Fingerprinted assets built by `flask build-assets`
+app.config['ASSETS_FOLDER'] = os.path.join(app.static_folder, 'dist')
+app.config['ASSETS_MAX_AGE'] = 365 * 24 * 60 * 60
+app.cli.add_command(build_assets_command)
+
+# Recompute ranking scores with `flask update-rankings`
+app.cli.add_command(update_rankings_command)
+
+# Roll up analytics buckets with `flask rollup-analytics` (run daily)
+app.cli.add_command(rollup_analytics_command)
+
+# Cluster near-duplicate images with `flask find-duplicates`
+app.cli.add_command(find_duplicates_command)
+
+# Backfill media metadata with `flask extract-metadata`
+app.cli.add_command(extract_metadata_command)
+
+# Find orphaned uploads and rows with missing files with `flask reconcile-uploads`
+app.cli.add_command(reconcile_uploads_command)
+
+# Background jobs (media hashing, file deletion) run in `flask run-jobs`;
+# retry dead-lettered jobs with `flask requeue-jobs`
+app.cli.add_command(run_jobs_command)
+app.cli.add_command(requeue_jobs_command)
+
+# Move or back up the catalogue with `flask export-catalogue` / `flask import-catalogue`
+app.cli.add_command(export_catalogue_command)
+app.cli.add_command(import_catalogue_command)
+
+# Load an existing folder of photos and videos with `flask ingest-media`
+app.cli.add_command(ingest_media_command)
+
+# Compact the change feed with `flask compact-changes` (run daily)
+app.cli.add_command(compact_changes_command)
+
+# Refresh the related-content lists with `flask update-related` (run every few minutes)
+app.cli.add_command(update_related_command)
+
 # Register all blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(content_bp, url_prefix='/api')
@@ -43,17 +135,30 @@ app.register_blueprint(category_bp, url_prefix='/api')
 app.register_blueprint(type_bp, url_prefix='/api')
 app.register_blueprint(brand_bp, url_prefix='/api')
 app.register_blueprint(settings_bp, url_prefix='/api')
+app.register_blueprint(analytics_bp, url_prefix='/api')
+app.register_blueprint(taxonomy_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(admin_bp, url_prefix='/api')
+app.register_blueprint(changes_bp, url_prefix='/api')
+app.register_blueprint(events_bp, url_prefix='/api')
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL',
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Initialize database
 db.init_app(app)
 
+# Live updates at /api/events; set EVENTS_TRANSPORT=database when running several workers
+init_events(app)
+
 # Create all tables and add sample data
 with app.app_context():
     db.create_all()
+    upgrade_schema()
     
     # Create default user if not exists
     if not User.query.filter_by(username='abdallah').first():
@@ -157,79 +262,124 @@ with app.app_context():
     # Commit all changes
     db.session.commit()
 
+def send_index():
+    """Send the SPA shell, preferring the fingerprinted build when present"""
+    if os.path.isfile(os.path.join(app.config['ASSETS_FOLDER'], 'index.html')):
+        response = send_precompressed(app.config['ASSETS_FOLDER'], 'index.html')
+    else:
+        response = send_precompressed(app.static_folder, 'index.html')
+    
+    # The HTML must stay fresh so new asset hashes are picked up
+    response.cache_control.no_cache = True
+    return response
+
 # Main routes
 @app.route('/')
 def index():
     """Main page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_index()
+
+@app.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    """Fingerprinted assets, cached forever"""
+    response = send_precompressed(app.config['ASSETS_FOLDER'], filename, max_age=app.config['ASSETS_MAX_AGE'])
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/uploads/<path:key>')
+def uploaded_file(key):
+    """Uploaded media kept by the local storage backend"""
+    if any(part.startswith('.') for part in key.split('/')):
+        abort(404)
+    
+    storage = create_storage(app, 'local')
+    if not storage.exists(key) and '/' not in key and storage.exists(shard_key(key)):
+        # Flat URL of a file already moved into the sharded layout
+        return redirect(storage.url(shard_key(key)), 301)
+    
+    # Upload names are unique and never reused
+    response = send_from_directory(storage.root, key, max_age=app.config['ASSETS_MAX_AGE'])
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/favicon.ico')
 def favicon():
     """Favicon"""
-    return send_from_directory(app.static_folder, 'favicon.ico', mimetype='image/vnd.microsoft.icon')
+    return send_precompressed(app.static_folder, 'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
 @app.route('/manifest.json')
 def manifest():
     """PWA Manifest"""
-    return send_from_directory(app.static_folder, 'manifest.json', mimetype='application/json')
+    return send_precompressed(app.static_folder, 'manifest.json', mimetype='application/json')
 
 @app.route('/sitemap.xml')
 def sitemap():
     """XML Sitemap for SEO"""
-    return send_from_directory(app.static_folder, 'sitemap.xml', mimetype='application/xml')
+    return send_precompressed(app.static_folder, 'sitemap.xml', mimetype='application/xml')
 
 @app.route('/robots.txt')
 def robots():
     """Robots.txt for SEO"""
-    return send_from_directory(app.static_folder, 'robots.txt', mimetype='text/plain')
+    return send_precompressed(app.static_folder, 'robots.txt', mimetype='text/plain')
+
+@app.route('/script.js')
+def script():
+    """Main JavaScript bundle"""
+    return send_precompressed(app.static_folder, 'script.js', mimetype='application/javascript')
 
 @app.route('/sw.js')
 def service_worker():
     """Service Worker for PWA"""
-    return send_from_directory(app.static_folder, 'sw.js', mimetype='application/javascript')
+    # The built worker carries the current build version and hashed shell URLs
+    directory = app.config['ASSETS_FOLDER']
+    if not os.path.isfile(os.path.join(directory, 'sw.js')):
+        directory = app.static_folder
+    response = send_precompressed(directory, 'sw.js', mimetype='application/javascript')
+    response.cache_control.no_cache = True
+    return response
 
 # SEO-friendly routes
 @app.route('/gallery')
 @app.route('/gallery/')
 def gallery_page():
     """Gallery page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_index()
 
 @app.route('/upload')
 @app.route('/upload/')
 def upload_page():
     """Upload page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_index()
 
 @app.route('/management')
 @app.route('/management/')
 def management_page():
     """Management page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_index()
 
 @app.route('/categories')
 @app.route('/categories/')
 def categories_page():
     """Categories page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_index()
 
 @app.route('/types')
 @app.route('/types/')
 def types_page():
     """Types page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_index()
 
 @app.route('/brands')
 @app.route('/brands/')
 def brands_page():
     """Brands page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_index()
 
 @app.route('/search')
 @app.route('/search/')
 def search_page():
     """Search page"""
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_index()
 
 # API route for generating dynamic sitemap
 @app.route('/api/sitemap')
@@ -258,6 +408,7 @@ def api_sitemap():
         return jsonify(sitemap_data)
         
     except Exception as e:
+        report_exception(e)
         return jsonify({'error': str(e)}), 500
 
 # Health check endpoint
@@ -271,10 +422,15 @@ def health_check():
     })
 
 # Error handlers
+# Paths of real files, never answered with the single-page app
+NOT_FOUND_PREFIXES = ('/assets/', '/uploads/')
+
 @app.errorhandler(404)
 def not_found(error):
     """404 error handler"""
-    return send_from_directory(app.static_folder, 'index.html')
+    if request.path.startswith(NOT_FOUND_PREFIXES):
+        return error
+    return send_index()
 
 @app.errorhandler(500)
 def internal_error(error):
@@ -0,0 +1,145 @@
+from src.models.user import db
+from src.models.ids import PublicId
+from sqlalchemy.dialects.sqlite import insert
+from datetime import datetime, timedelta
+
+# Bucket sizes from finest to coarsest
+GRANULARITIES = ('hour', 'day', 'month')
+
+# How long buckets are kept before being rolled up into the next size
+HOURLY_RETENTION = timedelta(days=7)
+DAILY_RETENTION = timedelta(days=90)
+
+# SQLite strftime formats matching SQLAlchemy's DateTime storage format
+TRUNCATE_FORMATS = {
+    'day': '%Y-%m-%d 00:00:00.000000',
+    'month': '%Y-%m-01 00:00:00.000000'
+}
+
+def truncate(when, granularity):
+    """Return the start of the bucket of the given size containing when"""
+    if granularity == 'hour':
+        return when.replace(minute=0, second=0, microsecond=0)
+    if granularity == 'day':
+        return when.replace(hour=0, minute=0, second=0, microsecond=0)
+    return when.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+class ContentStatsBucket(db.Model):
+    """Views and likes of one content item within one time bucket"""
+    __tablename__ = 'content_stats_buckets'
+
+    content_id = db.Column(PublicId, primary_key=True)
+    granularity = db.Column(db.String(5), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    # Category at the time of the event, so per-category series need no join
+    category_id = db.Column(PublicId, nullable=False)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    likes = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_stats_buckets_time', 'granularity', 'bucket_start'),
+        db.Index('ix_stats_buckets_category', 'granularity', 'category_id', 'bucket_start'),
+        {'sqlite_with_rowid': False}
+    )
+
+    @staticmethod
+    def record(content, views=0, likes=0, when=None):
+        """Add activity to the hourly bucket of a content item (caller commits)"""
+        statement = insert(ContentStatsBucket).values(
+            content_id=content.id,
+            granularity='hour',
+            bucket_start=truncate(when or datetime.utcnow(), 'hour'),
+            category_id=content.category_id,
+            views=views,
+            likes=likes
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['content_id', 'granularity', 'bucket_start'],
+            set_={
+                'views': ContentStatsBucket.views + statement.excluded.views,
+                'likes': ContentStatsBucket.likes + statement.excluded.likes
+            }
+        )
+        db.session.execute(statement)
+
+    @staticmethod
+    def rollup(source, target, cutoff):
+        """Merge source buckets older than cutoff into target buckets.
+
+        Returns the number of source buckets rolled up.
+        """
+        bucket = ContentStatsBucket
+        truncated = db.func.strftime(TRUNCATE_FORMATS[target], bucket.bucket_start)
+        select = db.select(
+            bucket.content_id,
+            db.literal(target),
+            truncated,
+            db.func.max(bucket.category_id),
+            db.func.sum(bucket.views),
+            db.func.sum(bucket.likes)
+        ).where(
+            bucket.granularity == source,
+            bucket.bucket_start < cutoff
+        ).group_by(bucket.content_id, truncated)
+
+        statement = insert(bucket).from_select(
+            ['content_id', 'granularity', 'bucket_start', 'category_id', 'views', 'likes'], select
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=['content_id', 'granularity', 'bucket_start'],
+            set_={
+                'views': bucket.views + statement.excluded.views,
+                'likes': bucket.likes + statement.excluded.likes
+            }
+        )
+        db.session.execute(statement)
+
+        deleted = bucket.query.filter(
+            bucket.granularity == source,
+            bucket.bucket_start < cutoff
+        ).delete(synchronize_session=False)
+        return deleted
+
+    @staticmethod
+    def rollup_all(now=None):
+        """Roll old hourly buckets into days and old daily buckets into months"""
+        now = now or datetime.utcnow()
+        hours = ContentStatsBucket.rollup('hour', 'day', truncate(now - HOURLY_RETENTION, 'day'))
+        days = ContentStatsBucket.rollup('day', 'month', truncate(now - DAILY_RETENTION, 'month'))
+        db.session.commit()
+        return hours, days
+
+    @staticmethod
+    def series(granularity, start, end, content_id=None, category_id=None):
+        """Return [(bucket_start, views, likes)] at the given size between start and end.
+
+        Buckets finer than the requested size that have not been rolled up
+        yet are merged in, so recent activity is always included.
+        """
+        bucket = ContentStatsBucket
+        included = GRANULARITIES[:GRANULARITIES.index(granularity) + 1]
+
+        query = db.session.query(
+            bucket.bucket_start,
+            db.func.sum(bucket.views),
+            db.func.sum(bucket.likes)
+        ).filter(
+            bucket.granularity.in_(included),
+            bucket.bucket_start >= truncate(start, granularity),
+            bucket.bucket_start < end
+        )
+        if content_id:
+            query = query.filter(bucket.content_id == content_id)
+        if category_id:
+            query = query.filter(bucket.category_id == category_id)
+
+        totals = {}
+        for bucket_start, views, likes in query.group_by(bucket.bucket_start):
+            key = truncate(bucket_start, granularity)
+            previous_views, previous_likes = totals.get(key, (0, 0))
+            totals[key] = (previous_views + views, previous_likes + likes)
+
+        return [(key, views, likes) for key, (views, likes) in sorted(totals.items())]
+
+    def __repr__(self):
+        return f'<ContentStatsBucket {self.content_id} {self.granularity} {self.bucket_start}>'
@@ -1,10 +1,11 @@
 from src.models.user import db
-import uuid
+from src.models.ids import PublicId, new_id
+from src.models.taxonomy import taxonomy_for
 
 class Brand(db.Model):
     __tablename__ = 'brands'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(PublicId, primary_key=True, default=new_id)
     name = db.Column(db.String(100), nullable=False, unique=True)
     logo_url = db.Column(db.String(500), nullable=True)
     website_url = db.Column(db.String(500), nullable=True)
@@ -24,7 +25,7 @@ class Brand(db.Model):
             'logo_url': self.logo_url,
             'website_url': self.website_url,
             'description': self.description,
-            'content_count': len(self.content_items) if hasattr(self, 'content_items') else 0
+            'content_count': taxonomy_for(self).count('brand_id', self.id)
         }
     
     def __repr__(self):
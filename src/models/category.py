@@ -1,10 +1,11 @@
 from src.models.user import db
-import uuid
+from src.models.ids import PublicId, new_id
+from src.models.taxonomy import taxonomy_for
 
 class Category(db.Model):
     __tablename__ = 'categories'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(PublicId, primary_key=True, default=new_id)
     name = db.Column(db.String(100), nullable=False, unique=True)
     description = db.Column(db.Text, nullable=True)
     icon_url = db.Column(db.String(500), nullable=True)
@@ -21,7 +22,7 @@ class Category(db.Model):
             'name': self.name,
             'description': self.description,
             'icon_url': self.icon_url,
-            'content_count': len(self.content_items) if hasattr(self, 'content_items') else 0
+            'content_count': taxonomy_for(self).count('category_id', self.id)
         }
     
     def __repr__(self):
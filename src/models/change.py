@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from src.models.user import db
+from src.models.content import Content
+from src.models.category import Category
+from src.models.type import Type
+from src.models.brand import Brand
+from src.models.settings import Settings
+
+# model -> (entity name in the feed, attribute clients know the row by)
+TRACKED_MODELS = {
+    Content: ('content', 'id'),
+    Category: ('category', 'id'),
+    Type: ('type', 'id'),
+    Brand: ('brand', 'id'),
+    Settings: ('settings', 'key')
+}
+
+# Counters and scores move on every view and like; syncing them is not worth a log row each
+UNTRACKED_COLUMNS = {'views_count', 'likes_count', 'trending_score', 'popular_score', 'updated_at'}
+
+# Deletions are reported this long; clients further behind must resync from scratch
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+class Change(db.Model):
+    """One create, update or delete of a synced row, in commit order.
+
+    Rows are written by a flush hook in the same transaction as the change
+    itself, so a client that has read up to seq has seen every change before
+    it. compact() keeps only the latest change per row and expires old
+    tombstones; the seq of the newest expired one is kept as a 'compacted'
+    marker, below which the feed asks clients for a full resync.
+    """
+    __tablename__ = 'changes'
+
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.String(100), nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # upsert / delete / compacted
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_changes_entity', 'entity', 'entity_id'),
+        # AUTOINCREMENT: never hand out a seq again after compaction deleted it
+        {'sqlite_autoincrement': True},
+    )
+
+    @staticmethod
+    def record(session, rows):
+        """Insert (entity, entity_id, op) rows on the session's connection (caller commits)"""
+        if rows:
+            now = datetime.utcnow()
+            session.connection().execute(Change.__table__.insert(), [
+                {'entity': entity, 'entity_id': entity_id, 'op': op, 'changed_at': now}
+                for entity, entity_id, op in rows
+            ])
+
+    @staticmethod
+    def latest_seq():
+        return db.session.query(func.max(Change.seq)).scalar() or 0
+
+    @staticmethod
+    def horizon():
+        """Oldest seq a client may sync from without missing a deletion"""
+        return db.session.query(func.max(Change.seq)).filter(Change.op == 'compacted').scalar() or 0
+
+    @staticmethod
+    def compact(tombstone_retention=TOMBSTONE_RETENTION):
+        """Drop superseded changes and expired tombstones (caller commits); returns rows removed"""
+        latest = db.select(func.max(Change.seq)).group_by(Change.entity, Change.entity_id)
+        removed = Change.query.filter(Change.op != 'compacted', Change.seq.not_in(latest)) \
+            .delete(synchronize_session=False)
+
+        expired = db.session.query(func.max(Change.seq)).filter(
+            Change.op == 'delete', Change.changed_at < datetime.utcnow() - tombstone_retention
+        ).scalar()
+        if expired is not None:
+            removed += Change.query.filter(Change.op.in_(('delete', 'compacted')), Change.seq < expired) \
+                .delete(synchronize_session=False)
+            Change.query.filter(Change.seq == expired).update(
+                {'entity': '*', 'entity_id': '*', 'op': 'compacted'}, synchronize_session=False
+            )
+        return removed
+
+    def __repr__(self):
+        return f'<Change {self.seq} {self.op} {self.entity}:{self.entity_id}>'
+
+
+class FeedCursor(db.Model):
+    """Seq up to which an internal consumer of the change feed has processed it"""
+    __tablename__ = 'feed_cursors'
+
+    name = db.Column(db.String(50), primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def get(name):
+        """The consumer's seq, or None if it has never run"""
+        cursor = db.session.get(FeedCursor, name)
+        return cursor.seq if cursor else None
+
+    @staticmethod
+    def set(name, seq):
+        """Move the consumer to seq (caller commits)"""
+        db.session.merge(FeedCursor(name=name, seq=seq))
+
+    def __repr__(self):
+        return f'<FeedCursor {self.name} {self.seq}>'
+
+
+def changed_columns(instance):
+    """Names of the column attributes of a flushed instance that this flush changed"""
+    state = inspect(instance)
+    return {column.key for column in state.mapper.column_attrs if state.attrs[column.key].history.has_changes()}
+
+
+@event.listens_for(Session, 'after_flush')
+def record_changes(session, flush_context):
+    """Log the tracked rows this flush wrote; new rows have their ids by now"""
+    rows = []
+    for instances, op, check in ((session.new, 'upsert', False), (session.dirty, 'upsert', True),
+                                 (session.deleted, 'delete', False)):
+        for instance in instances:
+            tracked = TRACKED_MODELS.get(type(instance))
+            if tracked is None or (check and not changed_columns(instance) - UNTRACKED_COLUMNS):
+                continue
+            entity, key = tracked
+            rows.append((entity, getattr(instance, key), op))
+    Change.record(session, rows)
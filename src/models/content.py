@@ -1,38 +1,83 @@
 from src.models.user import db
+from src.models.ids import PublicId, new_id
+from src.models.analytics import ContentStatsBucket
+from src.models.taxonomy import taxonomy_for
 from datetime import datetime
-import uuid
 import json
+import math
+
+# Ranking scores are exponentially time-decayed activity sums kept in log
+# space: log(sum(w * 2 ** (t / half_life))). Ordering by them orders by the
+# decayed score at any moment, and they grow linearly so never overflow.
+RANKING_EPOCH = datetime(2025, 1, 1)
+RANKING_HALF_LIVES = {
+    'trending_score': 24 * 60 * 60,  # one day
+    'popular_score': 30 * 24 * 60 * 60  # one month
+}
+VIEW_WEIGHT = 1.0
+LIKE_WEIGHT = 3.0
+UPLOAD_WEIGHT = 1.0  # new items start as if viewed once, so fresh content surfaces
+
+def ranking_score(weight, when, half_life):
+    """Log-space score of a single event of the given weight"""
+    return (when - RANKING_EPOCH).total_seconds() * math.log(2) / half_life + math.log(weight)
+
+def combine_scores(a, b):
+    """Add two log-space scores"""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
 
 class Content(db.Model):
     __tablename__ = 'content'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(PublicId, primary_key=True, default=new_id)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
     file_url = db.Column(db.String(500), nullable=False)
     thumbnail_url = db.Column(db.String(500), nullable=True)
-    content_type = db.Column(db.Enum('image', 'video', name='content_type_enum'), nullable=False)
+    content_type = db.Column(db.Enum('image', 'video', name='content_type_enum'), nullable=False, index=True)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     views_count = db.Column(db.Integer, default=0)
     likes_count = db.Column(db.Integer, default=0)
+    # NULL until the row has any activity (see add_ranking_activity)
+    trending_score = db.Column(db.Float, nullable=True)
+    popular_score = db.Column(db.Float, nullable=True)
     
     # Foreign Keys
-    category_id = db.Column(db.String(36), db.ForeignKey('categories.id'), nullable=False)
-    type_id = db.Column(db.String(36), db.ForeignKey('types.id'), nullable=True)
-    brand_id = db.Column(db.String(36), db.ForeignKey('brands.id'), nullable=True)
-    uploaded_by = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    category_id = db.Column(PublicId, db.ForeignKey('categories.id'), nullable=False, index=True)
+    type_id = db.Column(PublicId, db.ForeignKey('types.id'), nullable=True, index=True)
+    brand_id = db.Column(PublicId, db.ForeignKey('brands.id'), nullable=True, index=True)
+    uploaded_by = db.Column(PublicId, db.ForeignKey('users.id'), nullable=False)
     
     # Additional fields
     tags = db.Column(db.Text, nullable=True)  # JSON string of tags array
     is_public = db.Column(db.Boolean, default=True)
     content_metadata = db.Column(db.Text, nullable=True)  # JSON string for additional metadata
     
+    # Media details read from the file headers (see src/utils/media_metadata.py)
+    width = db.Column(db.Integer, nullable=True, index=True)
+    height = db.Column(db.Integer, nullable=True, index=True)
+    orientation = db.Column(db.String(10), nullable=True, index=True)  # landscape / portrait / square
+    file_size = db.Column(db.BigInteger, nullable=True)
+    mime_type = db.Column(db.String(100), nullable=True)
+    captured_at = db.Column(db.DateTime, nullable=True, index=True)
+    camera_model = db.Column(db.String(100), nullable=True, index=True)
+    
     # Relationships
     category = db.relationship('Category', backref='content_items')
     type = db.relationship('Type', backref='content_items')
     brand = db.relationship('Brand', backref='content_items')
     uploader = db.relationship('User', backref='uploaded_content')
     
+    # Public listing is always filtered on is_public and ordered by upload date
+    __table_args__ = (
+        db.Index('ix_content_public_upload_date', 'is_public', 'upload_date'),
+        db.Index('ix_content_public_trending', 'is_public', 'trending_score'),
+        db.Index('ix_content_public_popular', 'is_public', 'popular_score'),
+    )
+    
     def __init__(self, title, file_url, content_type, category_id, uploaded_by, **kwargs):
         self.title = title
         self.file_url = file_url
@@ -46,6 +91,10 @@ class Content(db.Model):
         self.type_id = kwargs.get('type_id')
         self.brand_id = kwargs.get('brand_id')
         self.is_public = kwargs.get('is_public', True)
+        self.upload_date = kwargs.get('upload_date', datetime.utcnow())
+        self.trending_score = None
+        self.popular_score = None
+        self.add_ranking_activity(UPLOAD_WEIGHT, self.upload_date)
         
         # Handle tags as JSON
         if 'tags' in kwargs and kwargs['tags']:
@@ -93,18 +142,46 @@ class Content(db.Model):
         else:
             self.content_metadata = None
     
+    def apply_media_metadata(self, metadata):
+        """Store extracted media metadata in the typed columns and the JSON extras"""
+        self.width = metadata.get('width')
+        self.height = metadata.get('height')
+        self.orientation = metadata.get('orientation')
+        self.file_size = metadata.get('file_size')
+        self.mime_type = metadata.get('mime_type')
+        self.captured_at = metadata.get('captured_at')
+        self.camera_model = metadata.get('camera_model')
+        
+        extras = self.get_metadata()
+        for key in ('camera_make', 'duration'):
+            if metadata.get(key) is not None:
+                extras[key] = metadata[key]
+        self.set_metadata(extras)
+    
+    def add_ranking_activity(self, weight, when=None):
+        """Add weighted activity at the given time to the ranking scores"""
+        when = when or datetime.utcnow()
+        for column, half_life in RANKING_HALF_LIVES.items():
+            current = getattr(self, column)
+            setattr(self, column, combine_scores(current, ranking_score(weight, when, half_life)))
+    
     def increment_views(self):
         """Increment the views count"""
         self.views_count += 1
+        self.add_ranking_activity(VIEW_WEIGHT)
+        ContentStatsBucket.record(self, views=1)
         db.session.commit()
     
     def increment_likes(self):
         """Increment the likes count"""
         self.likes_count += 1
+        self.add_ranking_activity(LIKE_WEIGHT)
+        ContentStatsBucket.record(self, likes=1)
         db.session.commit()
     
     def to_dict(self):
         """Convert the content object to a dictionary for JSON serialization"""
+        taxonomy = taxonomy_for(self)
         return {
             'id': self.id,
             'title': self.title,
@@ -116,15 +193,22 @@ class Content(db.Model):
             'views_count': self.views_count,
             'likes_count': self.likes_count,
             'category_id': self.category_id,
-            'category_name': self.category.name if self.category else None,
+            'category_name': taxonomy.category_names.get(self.category_id),
             'type_id': self.type_id,
-            'type_name': self.type.name if self.type else None,
+            'type_name': taxonomy.type_names.get(self.type_id),
             'brand_id': self.brand_id,
-            'brand_name': self.brand.name if self.brand else None,
+            'brand_name': taxonomy.brand_names.get(self.brand_id),
             'uploaded_by': self.uploaded_by,
             'uploader_name': self.uploader.username if self.uploader else None,
             'tags': self.get_tags(),
             'is_public': self.is_public,
+            'width': self.width,
+            'height': self.height,
+            'orientation': self.orientation,
+            'file_size': self.file_size,
+            'mime_type': self.mime_type,
+            'captured_at': self.captured_at.isoformat() if self.captured_at else None,
+            'camera_model': self.camera_model,
             'metadata': self.get_metadata()
         }
     
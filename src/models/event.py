@@ -0,0 +1,19 @@
+from src.models.user import db
+from datetime import datetime
+
+class Event(db.Model):
+    """Live event relayed between worker processes by the database event transport.
+
+    Only recent rows matter: each worker's poller reads the ones after the
+    last it has seen and prunes the table to the newest few thousand.
+    """
+    __tablename__ = 'events'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Event {self.id} {self.kind}>'
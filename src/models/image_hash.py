@@ -0,0 +1,45 @@
+from src.models.user import db
+from src.models.ids import PublicId
+from src.utils.perceptual_hash import BAND_COUNT, band_variants, hamming, split_bands, to_signed
+
+class ImageHash(db.Model):
+    """Perceptual hash of an image, banded for multi-index Hamming search"""
+    __tablename__ = 'image_hashes'
+    
+    content_id = db.Column(PublicId, db.ForeignKey('content.id'), primary_key=True)
+    hash = db.Column(db.BigInteger, nullable=False)
+    band_0 = db.Column(db.Integer, nullable=False, index=True)
+    band_1 = db.Column(db.Integer, nullable=False, index=True)
+    band_2 = db.Column(db.Integer, nullable=False, index=True)
+    band_3 = db.Column(db.Integer, nullable=False, index=True)
+    
+    # Relationship
+    content = db.relationship('Content', backref=db.backref('image_hash', uselist=False, cascade='all, delete-orphan'))
+    
+    def __init__(self, value, content_id=None):
+        self.content_id = content_id
+        self.hash = to_signed(value)
+        for band, band_value in enumerate(split_bands(value)):
+            setattr(self, f'band_{band}', band_value)
+    
+    @staticmethod
+    def find_near_duplicates(value, max_distance, exclude_id=None):
+        """Return [(content_id, distance)] of hashes within max_distance, closest first"""
+        bands = split_bands(value)
+        conditions = [
+            getattr(ImageHash, f'band_{band}').in_(band_variants(bands[band], max_distance))
+            for band in range(BAND_COUNT)
+        ]
+        query = db.session.query(ImageHash.content_id, ImageHash.hash).filter(db.or_(*conditions))
+        if exclude_id:
+            query = query.filter(ImageHash.content_id != exclude_id)
+        
+        matches = []
+        for content_id, candidate in query:
+            distance = hamming(value, candidate)
+            if distance <= max_distance:
+                matches.append((content_id, distance))
+        return sorted(matches, key=lambda match: match[1])
+    
+    def __repr__(self):
+        return f'<ImageHash {self.content_id}>'
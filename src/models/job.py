@@ -0,0 +1,124 @@
+from src.models.user import db
+from src.models.ids import PublicId, new_id
+from datetime import datetime, timedelta
+import json
+import random
+
+# Retry delays double from the base up to the cap, with some jitter
+RETRY_BASE_DELAY = 10
+RETRY_MAX_DELAY = 60 * 60
+
+class Job(db.Model):
+    """Unit of background work, claimed by `flask run-jobs` workers under a lease.
+
+    queued -> running -> done, or back to queued with a delay after a failure,
+    or dead once max_attempts is used up. A running job whose lease expires
+    (its worker died) is claimed again, so handlers must be idempotent.
+    """
+    __tablename__ = 'jobs'
+
+    id = db.Column(PublicId, primary_key=True, default=new_id)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    # Higher runs first
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    leased_until = db.Column(db.DateTime, nullable=True)
+    worker = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_jobs_claim', 'status', 'run_at'),
+        db.Index('ix_jobs_lease', 'status', 'leased_until'),
+    )
+
+    @staticmethod
+    def enqueue(kind, payload=None, priority=0, delay=0, max_attempts=5):
+        """Add a job to the session; it becomes visible to workers when the caller commits"""
+        job = Job(
+            kind=kind,
+            payload=json.dumps(payload or {}),
+            priority=priority,
+            max_attempts=max_attempts,
+            run_at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        db.session.add(job)
+        return job
+
+    @staticmethod
+    def claim(worker, lease_seconds, candidates=10):
+        """Lease the most urgent runnable job to worker, or return None.
+
+        Candidates are read first and then claimed one at a time with a
+        conditional UPDATE, so two workers never get the same job.
+        """
+        now = datetime.utcnow()
+        runnable = db.or_(
+            db.and_(Job.status == 'queued', Job.run_at <= now),
+            db.and_(Job.status == 'running', Job.leased_until < now)
+        )
+        job_ids = [
+            job_id for (job_id,) in
+            db.session.query(Job.id).filter(runnable).order_by(Job.priority.desc(), Job.run_at).limit(candidates)
+        ]
+        for job_id in job_ids:
+            claimed = Job.query.filter(Job.id == job_id, runnable).update({
+                'status': 'running',
+                'worker': worker,
+                'leased_until': now + timedelta(seconds=lease_seconds),
+                'attempts': Job.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+        return None
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
+
+    def finish(self, result=None):
+        """Mark the job done (caller commits)"""
+        self.status = 'done'
+        self.result = json.dumps(result) if result is not None else None
+        self.leased_until = None
+        self.finished_at = datetime.utcnow()
+
+    def fail(self, error):
+        """Schedule a retry with exponential backoff, or dead-letter the job (caller commits)"""
+        self.last_error = error
+        self.leased_until = None
+        if self.attempts >= self.max_attempts:
+            self.status = 'dead'
+            self.finished_at = datetime.utcnow()
+            return
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (self.attempts - 1))
+        self.status = 'queued'
+        self.run_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def to_dict(self):
+        """Convert the job object to a dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'priority': self.priority,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'last_error': self.last_error,
+            'result': self.get_result()
+        }
+
+    def __repr__(self):
+        return f'<Job {self.kind} {self.status}>'
@@ -0,0 +1,43 @@
+from src.models.user import db
+from src.models.ids import PublicId
+
+class ContentTag(db.Model):
+    """Inverted index of tags: one row per (tag, public content item) carrying it.
+
+    Derived from Content.tags by the related-content indexer; there are no
+    foreign keys, since a deleted row is removed from here afterwards.
+    """
+    __tablename__ = 'content_tags'
+
+    tag = db.Column(db.String(100), primary_key=True)
+    content_id = db.Column(PublicId, primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_content_tags_content', 'content_id'),
+        {'sqlite_with_rowid': False}
+    )
+
+    def __repr__(self):
+        return f'<ContentTag {self.tag} {self.content_id}>'
+
+class RelatedContent(db.Model):
+    """Precomputed 'more like this' list of a content item, best match first.
+
+    Keyed by (content_id, rank) without a rowid, so a whole list is one
+    contiguous range of the primary key.
+    """
+    __tablename__ = 'related_content'
+
+    content_id = db.Column(PublicId, primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    related_id = db.Column(PublicId, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        # Whose lists an item appears in, to refresh them when it changes
+        db.Index('ix_related_content_related', 'related_id'),
+        {'sqlite_with_rowid': False}
+    )
+
+    def __repr__(self):
+        return f'<RelatedContent {self.content_id} #{self.rank} {self.related_id}>'
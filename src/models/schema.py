@@ -0,0 +1,84 @@
+from sqlalchemy import inspect, text
+from src.models.user import db
+from src.models.ids import PublicId, compact_id
+
+# PRAGMA user_version once ids are compact, so the tables are scanned only once
+COMPACT_IDS_VERSION = 1
+# PRAGMA user_version once ranking scores are checked for the old 0 default
+RANKINGS_VERSION = 2
+
+
+def upgrade_schema():
+    """Bring an existing database up to date with the models.
+
+    db.create_all() only creates missing tables, so columns and indexes added
+    to existing models later are created here. New columns must be nullable
+    or carry a server_default. Ranking scores are rebuilt when their columns
+    are new, or still hold the 0 that databases upgraded earlier defaulted to.
+    """
+    inspector = inspect(db.engine)
+    added = set()
+    with db.engine.begin() as connection:
+        preparer = connection.dialect.identifier_preparer
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=connection.dialect)
+                statement = f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}'
+                if column.server_default is not None:
+                    statement += f' DEFAULT {column.server_default.arg}'
+                connection.execute(text(statement))
+                added.add((table.name, column.name))
+
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        if connection.dialect.name == 'sqlite':
+            if connection.exec_driver_sql('PRAGMA user_version').scalar() < COMPACT_IDS_VERSION:
+                compact_ids(connection)
+                connection.exec_driver_sql(f'PRAGMA user_version = {COMPACT_IDS_VERSION}')
+
+    stale_rankings = ('content', 'trending_score') in added
+    with db.engine.connect() as connection:
+        checked = connection.dialect.name != 'sqlite' or \
+            connection.exec_driver_sql('PRAGMA user_version').scalar() >= RANKINGS_VERSION
+        if not checked:
+            stale_rankings = stale_rankings or connection.execute(text(
+                'SELECT EXISTS (SELECT 1 FROM content WHERE trending_score = 0 OR popular_score = 0)'
+            )).scalar()
+    if stale_rankings:
+        # Imported here: the ranking utilities import the models
+        from src.utils.ranking import rebuild_rankings
+        rebuild_rankings()
+    if not checked:
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(f'PRAGMA user_version = {RANKINGS_VERSION}')
+
+
+def compact_ids(connection):
+    """Rewrite UUID strings still stored in full in PublicId columns in their 22-character form.
+
+    Databases created before ids were compacted hold 36-character text; the
+    models now look ids up by the compact form, so every row is converted
+    once, in the caller's transaction. Run VACUUM afterwards to return the freed
+    pages to the filesystem.
+    """
+    # Ids that are not canonical UUIDs come back unchanged and stay text, as PublicId binds them
+    connection.connection.driver_connection.create_function('compact_id', 1, compact_id, deterministic=True)
+    preparer = connection.dialect.identifier_preparer
+    converted = 0
+    for table in db.metadata.sorted_tables:
+        for column in table.columns:
+            if not isinstance(column.type, PublicId):
+                continue
+            column_name = preparer.format_column(column)
+            converted += connection.execute(text(
+                f'UPDATE {preparer.format_table(table)} SET {column_name} = compact_id({column_name}) '
+                f"WHERE typeof({column_name}) = 'text' AND length({column_name}) = 36"
+            )).rowcount
+    return converted
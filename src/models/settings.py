@@ -1,11 +1,11 @@
 from src.models.user import db
-import uuid
+from src.models.ids import PublicId, new_id
 import json
 
 class Settings(db.Model):
     __tablename__ = 'settings'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(PublicId, primary_key=True, default=new_id)
     key = db.Column(db.String(100), unique=True, nullable=False)
     value = db.Column(db.Text, nullable=True)
     description = db.Column(db.Text, nullable=True)
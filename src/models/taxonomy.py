@@ -0,0 +1,138 @@
+import hashlib
+import json
+import threading
+import time
+
+from sqlalchemy.orm import object_session
+
+from src.models.user import db
+
+# Other worker processes do not see an invalidation, so snapshots also expire
+SNAPSHOT_TTL = 60
+
+
+class TaxonomySnapshot:
+    """Immutable copy of the categories, types and brands with content counts"""
+
+    def __init__(self, categories, types, brands, counts):
+        self.category_names = {row['id']: row['name'] for row in categories}
+        self.type_names = {row['id']: row['name'] for row in types}
+        self.brand_names = {row['id']: row['name'] for row in brands}
+        self.counts = counts
+        self.built_at = time.monotonic()
+
+        types_by_category = {}
+        for row in types:
+            types_by_category.setdefault(row['category_id'], []).append({
+                'id': row['id'],
+                'name': row['name'],
+                'description': row['description'],
+                'content_count': counts['type_id'].get(row['id'], 0)
+            })
+        self.tree = {
+            'categories': [
+                {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'description': row['description'],
+                    'icon_url': row['icon_url'],
+                    'content_count': counts['category_id'].get(row['id'], 0),
+                    'types': types_by_category.get(row['id'], [])
+                }
+                for row in categories
+            ],
+            'brands': [
+                {
+                    'id': row['id'],
+                    'name': row['name'],
+                    'logo_url': row['logo_url'],
+                    'website_url': row['website_url'],
+                    'description': row['description'],
+                    'content_count': counts['brand_id'].get(row['id'], 0)
+                }
+                for row in brands
+            ]
+        }
+
+        # Derived from the data, so every worker with the same data agrees on it
+        encoded = json.dumps(self.tree, sort_keys=True).encode('utf-8')
+        self.version = hashlib.sha1(encoded).hexdigest()[:16]
+
+    def count(self, column, value):
+        """Content rows with column (category_id, type_id or brand_id) equal to value"""
+        return self.counts[column].get(value, 0)
+
+
+_snapshot = None
+# Bumped by every invalidation, so a build that overlapped one is not kept
+_generation = 0
+# Guards only the swap, never a build: under the async read server the build's
+# queries yield to the event loop, and a blocking lock held across them would
+# freeze every other request on the loop
+_lock = threading.Lock()
+
+
+def _build(session):
+    # Imported here: the content model uses this module for its serializer
+    from src.models.category import Category
+    from src.models.type import Type
+    from src.models.brand import Brand
+    from src.models.content import Content
+
+    categories = [
+        {'id': c.id, 'name': c.name, 'description': c.description, 'icon_url': c.icon_url}
+        for c in session.query(Category.id, Category.name, Category.description, Category.icon_url)
+        .order_by(Category.name)
+    ]
+    types = [
+        {'id': t.id, 'name': t.name, 'category_id': t.category_id, 'description': t.description}
+        for t in session.query(Type.id, Type.name, Type.category_id, Type.description).order_by(Type.name)
+    ]
+    brands = [
+        {'id': b.id, 'name': b.name, 'logo_url': b.logo_url, 'website_url': b.website_url,
+         'description': b.description}
+        for b in session.query(Brand.id, Brand.name, Brand.logo_url, Brand.website_url, Brand.description)
+        .order_by(Brand.name)
+    ]
+    counts = {}
+    for column in ('category_id', 'type_id', 'brand_id'):
+        attribute = getattr(Content, column)
+        counts[column] = dict(
+            session.query(attribute, db.func.count()).filter(attribute.isnot(None)).group_by(attribute)
+        )
+    return TaxonomySnapshot(categories, types, brands, counts)
+
+
+def fresh_taxonomy():
+    """The snapshot if it is current, else None"""
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - snapshot.built_at < SNAPSHOT_TTL:
+        return snapshot
+    return None
+
+
+def get_taxonomy(session=None):
+    """The current snapshot, rebuilt on first use after an invalidation or expiry"""
+    global _snapshot
+    snapshot = fresh_taxonomy()
+    if snapshot is not None:
+        return snapshot
+    generation = _generation
+    snapshot = _build(session or db.session)
+    with _lock:
+        if _generation == generation:
+            _snapshot = snapshot
+    return snapshot
+
+
+def taxonomy_for(instance):
+    """The snapshot, built with instance's session (the async read server has no app context)"""
+    return get_taxonomy(object_session(instance))
+
+
+def invalidate_taxonomy():
+    """Drop the snapshot; call after committing any change to the taxonomy or content"""
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
@@ -1,12 +1,13 @@
 from src.models.user import db
-import uuid
+from src.models.ids import PublicId, new_id
+from src.models.taxonomy import taxonomy_for
 
 class Type(db.Model):
     __tablename__ = 'types'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(PublicId, primary_key=True, default=new_id)
     name = db.Column(db.String(100), nullable=False)
-    category_id = db.Column(db.String(36), db.ForeignKey('categories.id'), nullable=False)
+    category_id = db.Column(PublicId, db.ForeignKey('categories.id'), nullable=False)
     description = db.Column(db.Text, nullable=True)
     
     # Relationship
@@ -22,13 +23,14 @@ class Type(db.Model):
     
     def to_dict(self):
         """Convert the type object to a dictionary for JSON serialization"""
+        taxonomy = taxonomy_for(self)
         return {
             'id': self.id,
             'name': self.name,
             'category_id': self.category_id,
-            'category_name': self.category.name if self.category else None,
+            'category_name': taxonomy.category_names.get(self.category_id),
             'description': self.description,
-            'content_count': len(self.content_items) if hasattr(self, 'content_items') else 0
+            'content_count': taxonomy.count('type_id', self.id)
         }
     
     def __repr__(self):
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
+from src.models.ids import PublicId, new_id
 from datetime import datetime
-import uuid
 import hashlib
 
 db = SQLAlchemy()
@@ -8,7 +8,7 @@ db = SQLAlchemy()
 class User(db.Model):
     __tablename__ = 'users'
     
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(PublicId, primary_key=True, default=new_id)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
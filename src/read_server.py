@@ -0,0 +1,201 @@
+"""Asyncio server for the anonymous read path.
+
+Serves the public listings and uploaded media from one event loop per
+process, so thousands of idle keep-alive connections cost a few kilobytes
+each instead of a worker thread. Everything else (writes, admin, analytics)
+stays on the Flask app; route these paths here in the reverse proxy:
+
+    GET /api/content  /api/categories  /api/types  /api/brands  /api/taxonomy  /uploads/*
+
+Usage:
+    pip install aiohttp aiosqlite
+    python -m src.read_server --port 5001 --workers 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from aiohttp import web
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from werkzeug.datastructures import MultiDict
+
+from src.models.content import Content
+from src.models.category import Category
+from src.models.type import Type
+from src.models.brand import Brand
+from src.models.user import User
+from src.models.taxonomy import fresh_taxonomy, get_taxonomy, SNAPSHOT_TTL
+from src.routes.content import list_content
+from src.utils.storage import LocalStorage, shard_key
+
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
+MEDIA_MAX_AGE = 365 * 24 * 60 * 60
+
+# Async drivers for the synchronous URLs the Flask app is configured with
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg', 'mysql': 'mysql+aiomysql'}
+
+
+def async_database_url(url):
+    scheme, rest = url.split('://', 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def dump_json(payload):
+    # Same encoding as Flask's jsonify, so both servers return identical bodies
+    return json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(',', ':')) + '\n'
+
+
+def json_response(payload, status=200):
+    response = web.Response(text=dump_json(payload), status=status, content_type='application/json')
+    response.enable_compression()
+    return response
+
+
+async def run_read(request, build):
+    """Run build(session) with the models' synchronous API on the async engine.
+
+    run_sync executes the ORM code (including lazy loads in to_dict) in a
+    greenlet, so every query awaits the async driver instead of blocking.
+    """
+    await refresh_taxonomy(request)
+    async with AsyncSession(request.app['engine'], expire_on_commit=False) as session:
+        return await session.run_sync(build)
+
+
+async def refresh_taxonomy(request):
+    """Rebuild an expired taxonomy snapshot once, while concurrent requests wait on the loop"""
+    if fresh_taxonomy() is None:
+        async with request.app['taxonomy_lock']:
+            if fresh_taxonomy() is None:
+                async with AsyncSession(request.app['engine']) as session:
+                    await session.run_sync(get_taxonomy)
+
+
+async def get_all_content(request):
+    args = MultiDict(request.query.items())
+    try:
+        payload = await run_read(request, lambda session: list_content(session.query(Content), args))
+    except ValueError as e:
+        return json_response({'success': False, 'error': str(e)}, 400)
+    return json_response(payload)
+
+
+async def get_all_categories(request):
+    categories = await run_read(
+        request, lambda session: [category.to_dict() for category in session.query(Category).all()]
+    )
+    return json_response({'success': True, 'categories': categories})
+
+
+async def get_all_types(request):
+    category_id = request.query.get('category_id')
+
+    def build(session):
+        query = session.query(Type)
+        if category_id:
+            query = query.filter_by(category_id=category_id)
+        return [type_obj.to_dict() for type_obj in query.all()]
+
+    return json_response({'success': True, 'types': await run_read(request, build)})
+
+
+async def get_all_brands(request):
+    brands = await run_read(request, lambda session: [brand.to_dict() for brand in session.query(Brand).all()])
+    return json_response({'success': True, 'brands': brands})
+
+
+async def get_taxonomy_tree(request):
+    snapshot = await run_read(request, get_taxonomy)
+    etag = f'"{snapshot.version}"'
+    headers = {'ETag': etag, 'Cache-Control': f'public, max-age={SNAPSHOT_TTL}'}
+    if etag in request.headers.get('If-None-Match', ''):
+        return web.Response(status=304, headers=headers)
+    response = json_response({'success': True, 'version': snapshot.version, **snapshot.tree})
+    response.headers.update(headers)
+    return response
+
+
+async def uploaded_file(request):
+    """Media from the local storage backend, mirroring the Flask /uploads route"""
+    key = request.match_info['key']
+    if any(part.startswith('.') or part == '' for part in key.split('/')):
+        raise web.HTTPNotFound()
+
+    storage = request.app['storage']
+    if not storage.exists(key):
+        if '/' not in key and storage.exists(shard_key(key)):
+            raise web.HTTPMovedPermanently(storage.url(shard_key(key)))
+        raise web.HTTPNotFound()
+
+    # FileResponse uses sendfile, keeping the event loop free
+    return web.FileResponse(storage.path(key), headers={
+        'Cache-Control': f'public, max-age={MEDIA_MAX_AGE}, immutable'
+    })
+
+
+async def health_check(request):
+    return json_response({'status': 'healthy', 'server': 'read'})
+
+
+def create_app(database_url=None, upload_folder=UPLOAD_FOLDER):
+    app = web.Application()
+    url = database_url or os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    app['storage'] = LocalStorage(upload_folder)
+    app['taxonomy_lock'] = asyncio.Lock()
+
+    async def engine_context(app):
+        app['engine'] = create_async_engine(async_database_url(url), pool_size=8, max_overflow=8)
+        yield
+        await app['engine'].dispose()
+
+    app.cleanup_ctx.append(engine_context)
+    app.router.add_get('/api/content', get_all_content)
+    app.router.add_get('/api/categories', get_all_categories)
+    app.router.add_get('/api/types', get_all_types)
+    app.router.add_get('/api/brands', get_all_brands)
+    app.router.add_get('/api/taxonomy', get_taxonomy_tree)
+    app.router.add_get('/uploads/{key:.+}', uploaded_file)
+    app.router.add_get('/health', health_check)
+    return app
+
+
+def serve(host, port, database_url=None):
+    # Every worker binds the port with SO_REUSEPORT; the kernel spreads connections
+    web.run_app(create_app(database_url), host=host, port=port, reuse_port=True,
+                access_log=None, print=None, backlog=4096)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Asyncio server for the public read endpoints')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--workers', type=int, default=1, help='Processes, each with its own event loop')
+    parser.add_argument('--database', help='Database URL (default: DATABASE_URL or the app database)')
+    args = parser.parse_args()
+
+    workers = [
+        multiprocessing.Process(target=serve, args=(args.host, args.port, args.database))
+        for _ in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def stop(signum, frame):
+        for worker in workers:
+            worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import hmac
+import tempfile
+from functools import wraps
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from src.models.taxonomy import invalidate_taxonomy
+from src.routes.content import facet_cache
+from src.utils.compression import compress_stream
+from src.utils.metrics import report_exception
+from src.utils.transfer import export_records, import_catalogue, iter_chunks
+
+admin_bp = Blueprint('admin', __name__)
+
+def admin_required(view):
+    """Require the ADMIN_TOKEN bearer token; the endpoints do not exist without one"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('ADMIN_TOKEN')
+        if not token:
+            return jsonify({'success': False, 'error': 'غير متاح'}), 404
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+            return jsonify({'success': False, 'error': 'غير مصرح'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/admin/export', methods=['GET'])
+@admin_required
+def export_catalogue():
+    """Stream the catalogue as NDJSON (gzip when accepted)"""
+    response = Response(
+        stream_with_context(iter_chunks(export_records())),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename="zamzam-catalogue.ndjson"'}
+    )
+    return compress_stream(response)
+
+@admin_bp.route('/admin/import', methods=['POST'])
+@admin_required
+def import_catalogue_upload():
+    """Import an export sent as the 'file' field; large catalogues are better imported with the CLI"""
+    try:
+        if 'file' not in request.files:
+            return jsonify({'success': False, 'error': 'لا يوجد ملف للاستيراد'}), 400
+        
+        # Spooled to disk so the tar reader and gzip detection can peek at it
+        with tempfile.TemporaryFile() as upload:
+            request.files['file'].save(upload)
+            upload.seek(0)
+            report = import_catalogue(upload)
+        facet_cache.clear()
+        invalidate_taxonomy()
+        
+        return jsonify({'success': True, 'report': report})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
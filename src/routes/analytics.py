@@ -0,0 +1,81 @@
+from flask import Blueprint, request, jsonify
+from src.models.analytics import ContentStatsBucket, GRANULARITIES
+from src.models.content import Content
+from src.models.category import Category
+from datetime import datetime, timedelta
+from src.utils.metrics import report_exception
+
+analytics_bp = Blueprint('analytics', __name__)
+
+# Default look-back window per granularity
+DEFAULT_RANGES = {
+    'hour': timedelta(days=2),
+    'day': timedelta(days=30),
+    'month': timedelta(days=365)
+}
+
+def get_series_params():
+    """Read granularity, start and end from the query string"""
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError('دقة زمنية غير مدعومة')
+    
+    end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else datetime.utcnow()
+    start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else end - DEFAULT_RANGES[granularity]
+    return granularity, start, end
+
+def series_response(granularity, start, end, **filters):
+    """Build the JSON response for a time series"""
+    series = ContentStatsBucket.series(granularity, start, end, **filters)
+    return jsonify({
+        'success': True,
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': [
+            {'bucket': bucket_start.isoformat(), 'views': views, 'likes': likes}
+            for bucket_start, views, likes in series
+        ],
+        'totals': {
+            'views': sum(views for _, views, _ in series),
+            'likes': sum(likes for _, _, likes in series)
+        }
+    })
+
+@analytics_bp.route('/analytics/content/<content_id>', methods=['GET'])
+def get_content_analytics(content_id):
+    """Get the views and likes time series of a content item"""
+    try:
+        granularity, start, end = get_series_params()
+        Content.query.get_or_404(content_id)
+        return series_response(granularity, start, end, content_id=content_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/analytics/categories/<category_id>', methods=['GET'])
+def get_category_analytics(category_id):
+    """Get the views and likes time series of a category"""
+    try:
+        granularity, start, end = get_series_params()
+        Category.query.get_or_404(category_id)
+        return series_response(granularity, start, end, category_id=category_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@analytics_bp.route('/analytics/site', methods=['GET'])
+def get_site_analytics():
+    """Get the site-wide views and likes time series"""
+    try:
+        granularity, start, end = get_series_params()
+        return series_response(granularity, start, end)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
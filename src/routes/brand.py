@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from src.models.brand import Brand, db
+from src.models.taxonomy import invalidate_taxonomy
+from src.routes.content import facet_cache
+from src.utils.metrics import report_exception
 
 brand_bp = Blueprint('brand', __name__)
 
@@ -13,6 +16,7 @@ def get_all_brands():
             'brands': [brand.to_dict() for brand in brands]
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @brand_bp.route('/brands/<brand_id>', methods=['GET'])
@@ -25,6 +29,7 @@ def get_brand(brand_id):
             'brand': brand.to_dict()
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @brand_bp.route('/brands', methods=['POST'])
@@ -50,6 +55,8 @@ def create_brand():
         
         db.session.add(brand)
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -59,6 +66,7 @@ def create_brand():
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @brand_bp.route('/brands/<brand_id>', methods=['PUT'])
@@ -88,6 +96,8 @@ def update_brand(brand_id):
             brand.description = data['description']
         
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -97,6 +107,7 @@ def update_brand(brand_id):
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @brand_bp.route('/brands/<brand_id>', methods=['DELETE'])
@@ -114,6 +125,8 @@ def delete_brand(brand_id):
         
         db.session.delete(brand)
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -122,5 +135,6 @@ def delete_brand(brand_id):
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from src.models.category import Category, db
+from src.models.taxonomy import invalidate_taxonomy
+from src.routes.content import facet_cache
+from src.utils.metrics import report_exception
 
 category_bp = Blueprint('category', __name__)
 
@@ -13,6 +16,7 @@ def get_all_categories():
             'categories': [category.to_dict() for category in categories]
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @category_bp.route('/categories/<category_id>', methods=['GET'])
@@ -25,6 +29,7 @@ def get_category(category_id):
             'category': category.to_dict()
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @category_bp.route('/categories', methods=['POST'])
@@ -49,6 +54,8 @@ def create_category():
         
         db.session.add(category)
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -58,6 +65,7 @@ def create_category():
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @category_bp.route('/categories/<category_id>', methods=['PUT'])
@@ -85,6 +93,8 @@ def update_category(category_id):
             category.icon_url = data['icon_url']
         
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -94,6 +104,7 @@ def update_category(category_id):
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @category_bp.route('/categories/<category_id>', methods=['DELETE'])
@@ -111,6 +122,8 @@ def delete_category(category_id):
         
         db.session.delete(category)
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -119,5 +132,6 @@ def delete_category(category_id):
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
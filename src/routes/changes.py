@@ -0,0 +1,82 @@
+from flask import Blueprint, request, jsonify
+from src.models.change import Change, TRACKED_MODELS
+from src.models.content import Content
+from src.routes.content import LISTING_RELATIONSHIPS
+from src.utils.metrics import report_exception
+
+changes_bp = Blueprint('changes', __name__)
+
+MAX_PAGE_SIZE = 1000
+
+ENTITY_MODELS = {entity: (model, key) for model, (entity, key) in TRACKED_MODELS.items()}
+
+
+def _load(entity, entity_ids):
+    """entity_id -> current dict for the rows that still exist and are visible"""
+    model, key = ENTITY_MODELS[entity]
+    query = model.query.filter(getattr(model, key).in_(entity_ids))
+    if model is Content:
+        query = query.filter(Content.is_public == True).options(*LISTING_RELATIONSHIPS)
+    return {getattr(item, key): item.to_dict() for item in query}
+
+
+@changes_bp.route('/changes', methods=['GET'])
+def get_changes():
+    """Content, taxonomy and settings changed after the since cursor, oldest first.
+
+    Without since, or when since is older than the compaction horizon, the
+    response has reset=true: the client reloads everything through the list
+    endpoints and continues from next. Each changed row appears once, with
+    its current data, or as a tombstone (op=delete, data=null) when it was
+    deleted or made private.
+    """
+    try:
+        since = request.args.get('since', type=int)
+        limit = min(max(request.args.get('limit', 500, type=int), 1), MAX_PAGE_SIZE)
+
+        if since is None or since < Change.horizon():
+            return jsonify({
+                'success': True,
+                'reset': True,
+                'changes': [],
+                'next': Change.latest_seq(),
+                'has_more': False
+            })
+
+        rows = Change.query.filter(Change.seq > since).order_by(Change.seq).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        # A row changed several times in the page is reported once, at its last change
+        latest = {}
+        for row in rows:
+            latest.pop((row.entity, row.entity_id), None)
+            latest[(row.entity, row.entity_id)] = row
+
+        current = {}
+        for entity in ENTITY_MODELS:
+            entity_ids = [entity_id for kind, entity_id in latest if kind == entity]
+            if entity_ids:
+                current[entity] = _load(entity, entity_ids)
+
+        changes = []
+        for (entity, entity_id), row in latest.items():
+            data = current.get(entity, {}).get(entity_id)
+            changes.append({
+                'seq': row.seq,
+                'entity': entity,
+                'id': entity_id,
+                'op': 'upsert' if data is not None else 'delete',
+                'data': data
+            })
+
+        return jsonify({
+            'success': True,
+            'reset': False,
+            'changes': changes,
+            'next': rows[-1].seq if rows else since,
+            'has_more': has_more
+        })
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,12 +1,27 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, send_file, stream_with_context
 from src.models.content import Content, db
 from src.models.category import Category
 from src.models.type import Type
 from src.models.brand import Brand
 from src.models.user import User
+from src.models.image_hash import ImageHash
+from src.models.job import Job
+from src.models.related import RelatedContent
+from src.models.taxonomy import get_taxonomy, invalidate_taxonomy
+import math
 import os
 import uuid
+from urllib.parse import quote
+from sqlalchemy.orm import selectinload
 from werkzeug.utils import secure_filename
+from src.utils.cache import TTLCache
+from src.utils.perceptual_hash import DEFAULT_MAX_DISTANCE, MAX_DISTANCE_LIMIT
+from src.utils.media_metadata import extract_metadata
+from src.utils.metrics import report_exception
+from src.utils.storage import get_storage, save_upload, commit_upload, resolve_url
+from src.utils.archive import archive_name, stream_zip
+from src.utils.images import get_image_cache, parse_variant, render_variant
+from src.utils.related import RELATED_LIMIT
 
 content_bp = Blueprint('content', __name__)
 
@@ -16,54 +31,197 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov', 'avi', 'webm'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Columns that can be filtered on exactly; also the facet dimensions
+FACET_COLUMNS = ('category_id', 'type_id', 'brand_id', 'content_type')
+
+# Listing orders; ranked sorts use the precomputed, indexed scores
+SORT_ORDERS = {
+    'newest': (Content.upload_date.desc(),),
+    'trending': (Content.trending_score.desc(), Content.upload_date.desc()),
+    'popular': (Content.popular_score.desc(), Content.upload_date.desc())
+}
+
+# Uploader names shown in every listed item, loaded with one IN query instead of per row;
+# category, type and brand names come from the taxonomy snapshot
+LISTING_RELATIONSHIPS = (
+    selectinload(Content.uploader),
+)
+
+# Items per ZIP download, and rows read per query while it streams
+MAX_ARCHIVE_ITEMS = 10000
+ARCHIVE_BATCH_SIZE = 500
+
+# Facet counts per filter combination, cleared whenever content or taxonomy changes.
+# The cache is per process: other workers drop stale counts when the TTL expires,
+# which matches the max-age clients cache the response for anyway
+facet_cache = TTLCache(maxsize=512, ttl=60, name='facets')
+
+def get_content_filters(args):
+    """Read the listing filters from the query string"""
+    filters = {column: args.get(column) for column in FACET_COLUMNS}
+    filters['search'] = args.get('search')
+    filters['orientation'] = args.get('orientation')
+    filters['min_width'] = args.get('min_width', type=int)
+    filters['min_height'] = args.get('min_height', type=int)
+    return filters
+
+def apply_content_filters(query, filters, exclude=None):
+    """Apply the public listing filters, optionally skipping one facet column"""
+    query = query.filter(Content.is_public == True)
+    
+    for column in FACET_COLUMNS:
+        if column != exclude and filters.get(column):
+            query = query.filter(getattr(Content, column) == filters[column])
+    if filters.get('search'):
+        query = query.filter(Content.title.contains(filters['search']))
+    if filters.get('orientation'):
+        query = query.filter(Content.orientation == filters['orientation'])
+    if filters.get('min_width'):
+        query = query.filter(Content.width >= filters['min_width'])
+    if filters.get('min_height'):
+        query = query.filter(Content.height >= filters['min_height'])
+    
+    return query
+
+def list_content(query, args):
+    """Build the GET /content payload from a base Content query.
+    
+    Shared with the async read server, which passes a query from its own
+    session. Raises ValueError for an unsupported sort.
+    """
+    filters = get_content_filters(args)
+    page = int(args.get('page', 1))
+    per_page = int(args.get('per_page', 20))
+    sort = args.get('sort', 'newest')
+    
+    if sort not in SORT_ORDERS:
+        raise ValueError('ترتيب غير مدعوم')
+    
+    # Build query
+    query = apply_content_filters(query, filters)
+    
+    # Paginate (out-of-range values fall back like Flask-SQLAlchemy's paginate)
+    current_page = max(page, 1)
+    page_size = per_page if per_page > 0 else 20
+    total = query.order_by(None).count()
+    pages = math.ceil(total / page_size)
+    content_items = (
+        query.order_by(*SORT_ORDERS[sort])
+        .options(*LISTING_RELATIONSHIPS)
+        .offset((current_page - 1) * page_size)
+        .limit(page_size)
+        .all()
+    )
+    
+    return {
+        'success': True,
+        'content': [item.to_dict() for item in content_items],
+        'pagination': {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': pages,
+            'has_next': current_page < pages,
+            'has_prev': current_page > 1
+        },
+        'sort': sort
+    }
+
 @content_bp.route('/content', methods=['GET'])
 def get_all_content():
     """Get all content with optional filtering"""
     try:
-        # Get query parameters
-        category_id = request.args.get('category_id')
-        type_id = request.args.get('type_id')
-        brand_id = request.args.get('brand_id')
-        content_type = request.args.get('content_type')
-        search = request.args.get('search')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        
-        # Build query
-        query = Content.query.filter_by(is_public=True)
-        
-        if category_id:
-            query = query.filter_by(category_id=category_id)
-        if type_id:
-            query = query.filter_by(type_id=type_id)
-        if brand_id:
-            query = query.filter_by(brand_id=brand_id)
-        if content_type:
-            query = query.filter_by(content_type=content_type)
-        if search:
-            query = query.filter(Content.title.contains(search))
-        
-        # Order by upload date (newest first)
-        query = query.order_by(Content.upload_date.desc())
-        
-        # Paginate
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-        content_items = pagination.items
+        return jsonify(list_content(Content.query, request.args))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@content_bp.route('/content/facets', methods=['GET'])
+def get_content_facets():
+    """Count matching content per category, type, brand and content type.
+    
+    Each facet is counted with the other filters applied but not its own, so
+    the counts show how many items each option would match.
+    """
+    try:
+        filters = get_content_filters(request.args)
+        cache_key = tuple(sorted((key, value) for key, value in filters.items() if value))
         
-        return jsonify({
-            'success': True,
-            'content': [item.to_dict() for item in content_items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
-        })
+        result = facet_cache.get(cache_key)
+        if result is None:
+            facets = {}
+            for column_name in FACET_COLUMNS:
+                column = getattr(Content, column_name)
+                query = db.session.query(column, db.func.count()).select_from(Content)
+                query = apply_content_filters(query, filters, exclude=column_name)
+                rows = query.filter(column.isnot(None)).group_by(column).all()
+                facets[column_name] = {value: count for value, count in rows}
+            
+            total = apply_content_filters(Content.query, filters).count()
+            result = {'facets': facets, 'total': total}
+            facet_cache.set(cache_key, result)
+        
+        response = jsonify({'success': True, **result})
+        response.cache_control.public = True
+        response.cache_control.max_age = 60
+        response.add_etag()
+        return response.make_conditional(request)
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@content_bp.route('/content/archive', methods=['GET'])
+def download_archive():
+    """Download the listed content (same filters as GET /content), or ?ids=a,b,c, as one ZIP.
+    
+    The archive is built while it is sent, straight from storage, so memory
+    stays flat whatever its size; admission control limits how many run at once.
+    """
+    try:
+        filters = get_content_filters(request.args)
+        ids = [content_id for content_id in request.args.get('ids', '').split(',') if content_id]
+        if len(ids) > MAX_ARCHIVE_ITEMS:
+            return jsonify({'success': False, 'error': f'الحد الأقصى {MAX_ARCHIVE_ITEMS} عنصر في الملف الواحد'}), 400
+        
+        query = apply_content_filters(db.session.query(
+            Content.id, Content.title, Content.file_url, Content.file_size, Content.upload_date, Content.category_id
+        ), filters)
+        if ids:
+            query = query.filter(Content.id.in_(ids))
+        total = query.order_by(None).count()
+        if total == 0:
+            return jsonify({'success': False, 'error': 'لا يوجد محتوى للتنزيل'}), 404
+        if total > MAX_ARCHIVE_ITEMS:
+            return jsonify({'success': False, 'error': f'الحد الأقصى {MAX_ARCHIVE_ITEMS} عنصر في الملف الواحد'}), 400
+        
+        taxonomy = get_taxonomy()
+        filename = archive_name(taxonomy.category_names.get(filters['category_id']), 'zamzam-gallery') + '.zip'
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
+    
+    def entries():
+        last_id = ''
+        while True:
+            batch = query.filter(Content.id > last_id).order_by(Content.id).limit(ARCHIVE_BATCH_SIZE).all()
+            db.session.rollback()  # Do not hold a read transaction open for the whole download
+            for row in batch:
+                backend, key = resolve_url(row.file_url)
+                if backend is None:
+                    continue
+                folder = archive_name(taxonomy.category_names.get(row.category_id), 'other')
+                name = f'{folder}/{archive_name(row.title, "untitled")}-{row.id}.{key.rsplit(".", 1)[-1]}'
+                date_time = row.upload_date.timetuple()[:6] if row.upload_date else (1980, 1, 1, 0, 0, 0)
+                yield name, backend, key, row.file_size, date_time
+            if len(batch) < ARCHIVE_BATCH_SIZE:
+                return
+            last_id = batch[-1].id
+    
+    response = Response(stream_with_context(stream_zip(entries())), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f"attachment; filename=\"archive.zip\"; filename*=UTF-8''{quote(filename)}"
+    return response
 
 @content_bp.route('/content/<content_id>', methods=['GET'])
 def get_content(content_id):
@@ -79,11 +237,14 @@ def get_content(content_id):
             'content': content.to_dict()
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @content_bp.route('/content', methods=['POST'])
 def create_content():
     """Create new content (upload files)"""
+    storage = get_storage()
+    temp_paths, stored_keys = [], []
     try:
         # Check if files are present
         if 'files' not in request.files:
@@ -116,19 +277,15 @@ def create_content():
                 # Generate unique filename
                 unique_filename = f"{uuid.uuid4()}.{file_extension}"
                 
-                # Create uploads directory if it doesn't exist
-                upload_dir = os.path.join(os.path.dirname(__file__), '..', 'static', 'uploads')
-                os.makedirs(upload_dir, exist_ok=True)
-                
-                # Save file
-                file_path = os.path.join(upload_dir, unique_filename)
-                file.save(file_path)
+                # Save to a scratch file first so the headers can be read locally
+                key, file_path = save_upload(file, unique_filename)
+                temp_paths.append(file_path)
                 
                 # Determine content type
                 content_type = 'image' if file_extension in ['png', 'jpg', 'jpeg', 'gif'] else 'video'
                 
-                # Create file URL (relative to static folder)
-                file_url = f"/uploads/{unique_filename}"
+                # Create file URL (served by the storage backend)
+                file_url = storage.url(key)
                 
                 # For videos, we'll use the same file as thumbnail for now
                 # In a real application, you'd generate a thumbnail
@@ -148,19 +305,45 @@ def create_content():
                     tags=tags
                 )
                 
+                # Dimensions, dates and camera details from the file headers
+                content.apply_media_metadata(extract_metadata(file_path))
+                
+                # Move the file into storage before its row becomes visible
+                commit_upload(file_path, key)
+                stored_keys.append(key)
+                
                 db.session.add(content)
                 uploaded_content.append(content)
         
+        # Hashing and the near-duplicate search run in `flask run-jobs`;
+        # poll GET /api/jobs/<id> for the matches
+        db.session.flush()
+        jobs = {
+            item.id: Job.enqueue('process-media', {'content_id': item.id})
+            for item in uploaded_content if item.content_type == 'image'
+        }
+        
         db.session.commit()
+        stored_keys.clear()  # The rows own the files now
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
             'message': f'تم رفع {len(uploaded_content)} ملف بنجاح',
-            'content': [item.to_dict() for item in uploaded_content]
+            'content': [item.to_dict() for item in uploaded_content],
+            'jobs': {content_id: job.id for content_id, job in jobs.items()}
         })
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
+        # Files saved before the failure have no rows; `flask reconcile-uploads` catches any left behind
+        for path in temp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        for key in stored_keys:
+            storage.delete(key)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @content_bp.route('/content/<content_id>', methods=['PUT'])
@@ -187,6 +370,8 @@ def update_content(content_id):
             content.is_public = data['is_public']
         
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -196,6 +381,7 @@ def update_content(content_id):
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @content_bp.route('/content/<content_id>', methods=['DELETE'])
@@ -203,23 +389,25 @@ def delete_content(content_id):
     """Delete content"""
     try:
         content = Content.query.get_or_404(content_id)
+        file_urls = sorted({url for url in (content.file_url, content.thumbnail_url) if url})
         
-        # Delete file from filesystem
-        if content.file_url:
-            file_path = os.path.join(os.path.dirname(__file__), '..', 'static', content.file_url.lstrip('/'))
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        
+        # The files are deleted by a job committed with the row's removal,
+        # so a failed commit leaves nothing dangling and a slow backend doesn't block
         db.session.delete(content)
+        job = Job.enqueue('delete-files', {'urls': file_urls}, priority=-1)
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
-            'message': 'تم حذف المحتوى بنجاح'
+            'message': 'تم حذف المحتوى بنجاح',
+            'job_id': job.id
         })
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @content_bp.route('/content/<content_id>/like', methods=['POST'])
@@ -236,7 +424,105 @@ def like_content(content_id):
         })
         
     except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@content_bp.route('/content/<content_id>/near-duplicates', methods=['GET'])
+def get_near_duplicates(content_id):
+    """Find images that look like this one (resized or re-encoded copies)"""
+    try:
+        content = Content.query.get_or_404(content_id)
+        max_distance = int(request.args.get('max_distance', DEFAULT_MAX_DISTANCE))
+        
+        if not 0 <= max_distance <= MAX_DISTANCE_LIMIT:
+            return jsonify({'success': False, 'error': f'يجب أن تكون المسافة بين 0 و{MAX_DISTANCE_LIMIT}'}), 400
+        if not content.image_hash:
+            return jsonify({'success': False, 'error': 'لا توجد بصمة لهذا المحتوى'}), 404
+        
+        matches = ImageHash.find_near_duplicates(content.image_hash.hash, max_distance, exclude_id=content.id)
+        items = {item.id: item for item in Content.query.filter(Content.id.in_([m[0] for m in matches]))}
+        
+        return jsonify({
+            'success': True,
+            'near_duplicates': [
+                {'distance': distance, 'content': items[match_id].to_dict()}
+                for match_id, distance in matches if match_id in items
+            ]
+        })
+        
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@content_bp.route('/content/<content_id>/related', methods=['GET'])
+def get_related_content(content_id):
+    """Items like this one, best match first, from the lists kept by `flask update-related`"""
+    limit = request.args.get('limit', str(RELATED_LIMIT))
+    if not limit.isdigit() or not 1 <= int(limit) <= RELATED_LIMIT:
+        return jsonify({'success': False, 'error': f'يجب أن يكون الحد بين 1 و{RELATED_LIMIT}'}), 400
+    
+    try:
+        items = Content.query.options(*LISTING_RELATIONSHIPS) \
+            .join(RelatedContent, RelatedContent.related_id == Content.id) \
+            .filter(RelatedContent.content_id == content_id, Content.is_public.is_(True)) \
+            .order_by(RelatedContent.rank) \
+            .limit(int(limit)) \
+            .all()
+        if not items:
+            content = db.session.get(Content, content_id)
+            if content is None or not content.is_public:
+                return jsonify({'success': False, 'error': 'المحتوى غير موجود'}), 404
+        
+        return jsonify({
+            'success': True,
+            'related': [item.to_dict() for item in items]
+        })
+        
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@content_bp.route('/content/<content_id>/image', methods=['GET'])
+def get_content_image(content_id):
+    """A resized copy of an image: ?w= and/or ?h=, ?fit=contain|cover and ?format=jpeg|webp.
+    
+    Variants are rendered on first request and kept in the disk cache; the
+    URL always yields the same bytes, so clients and CDNs may cache it for good.
+    """
+    try:
+        variant = parse_variant(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        content = db.session.get(Content, content_id)
+        if content is None or not content.is_public or content.content_type != 'image':
+            return jsonify({'success': False, 'error': 'الصورة غير موجودة'}), 404
+        file_url = content.file_url
+        backend, key = resolve_url(file_url)
+        if backend is None:
+            return jsonify({'success': False, 'error': 'الصورة غير موجودة'}), 404
+        db.session.rollback()  # Rendering can take a while; do not hold the read transaction
+        
+        def render(target):
+            if not backend.exists(key):
+                raise FileNotFoundError(key)
+            with backend.local_file(key) as path:
+                render_variant(path, target, variant)
+        
+        name = variant.cache_name(file_url)
+        handle = get_image_cache().get(name, render)
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'الصورة غير موجودة'}), 404
+    except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
+    
+    response = send_file(handle, mimetype=variant.mimetype, etag=name.rsplit('/', 1)[-1],
+                         max_age=current_app.config['ASSETS_MAX_AGE'], conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @content_bp.route('/content/stats', methods=['GET'])
 def get_content_stats():
@@ -260,5 +546,6 @@ def get_content_stats():
         })
         
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -0,0 +1,57 @@
+import time
+
+from flask import Blueprint, Response, current_app, request, jsonify
+
+events_bp = Blueprint('events', __name__)
+
+# Sent first and after a reset; the browser waits this long before reconnecting
+RECONNECT_DELAY_MS = 3000
+
+
+@events_bp.route('/events', methods=['GET'])
+def stream_events():
+    """Server-Sent Events: content, counters, settings and taxonomy changes as they happen.
+
+    EventSource reconnects with Last-Event-ID (or ?last_event_id= on the
+    first connection) and gets the events it missed; a reset event means
+    they are gone and the client should resync through /api/changes.
+    """
+    broker = current_app.extensions['events']
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = -1  # Unknown cursor: reset
+
+    subscriber, missed = broker.subscribe(last_event_id)
+    if subscriber is None:
+        response = jsonify({'success': False, 'error': 'الخادم مشغول حالياً، حاول مرة أخرى بعد قليل'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(RECONNECT_DELAY_MS // 1000)
+        return response
+    heartbeat = current_app.config['EVENTS_HEARTBEAT']
+
+    def generate():
+        try:
+            yield f'retry: {RECONNECT_DELAY_MS}\n\n'
+            if missed:
+                yield 'event: reset\ndata: {}\n\n'
+            idle_since = time.monotonic()
+            while True:
+                events, overflowed = subscriber.get(heartbeat)
+                if overflowed:
+                    yield 'event: reset\ndata: {}\n\n'
+                if events:
+                    yield ''.join(text for _, text in events)
+                elif not overflowed and time.monotonic() - idle_since >= heartbeat:
+                    yield ': keepalive\n\n'  # Also how a closed connection is noticed
+                else:
+                    continue
+                idle_since = time.monotonic()
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Keep nginx from holding events back
+    })
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+from src.models.job import Job, db
+from src.utils.metrics import report_exception
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of a background job, with its result once done"""
+    try:
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'المهمة غير موجودة'}), 404
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        })
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.settings import Settings
+from src.utils.metrics import report_exception
 
 settings_bp = Blueprint('settings', __name__)
 
@@ -14,6 +15,7 @@ def get_all_settings():
             'settings': [setting.to_dict() for setting in settings]
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/<key>', methods=['GET'])
@@ -32,6 +34,7 @@ def get_setting(key):
                 'error': 'الإعداد غير موجود'
             }), 404
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/<key>', methods=['POST', 'PUT'])
@@ -53,6 +56,7 @@ def set_setting(key):
             'setting': setting.to_dict()
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/<key>', methods=['DELETE'])
@@ -73,6 +77,7 @@ def delete_setting(key):
                 'error': 'الإعداد غير موجود'
             }), 404
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/theme', methods=['GET'])
@@ -85,6 +90,7 @@ def get_theme_settings():
             'theme': theme_settings
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/theme', methods=['POST'])
@@ -117,6 +123,7 @@ def update_theme_settings():
             'theme': updated_settings
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/social-media', methods=['GET'])
@@ -129,6 +136,7 @@ def get_social_media_settings():
             'social_media': social_links
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/social-media', methods=['POST'])
@@ -151,6 +159,7 @@ def update_social_media_settings():
             'social_media': updated_links
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/seo', methods=['GET'])
@@ -163,6 +172,7 @@ def get_seo_settings():
             'seo': seo_settings
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/seo', methods=['POST'])
@@ -198,6 +208,7 @@ def update_seo_settings():
             'seo': updated_settings
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/developer-mode', methods=['GET'])
@@ -210,6 +221,7 @@ def get_developer_mode_status():
             'developer_mode_enabled': is_enabled
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @settings_bp.route('/settings/developer-mode', methods=['POST'])
@@ -227,5 +239,6 @@ def toggle_developer_mode():
             'developer_mode_enabled': enabled
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
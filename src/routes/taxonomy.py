@@ -0,0 +1,23 @@
+from flask import Blueprint, request, jsonify
+from src.models.taxonomy import get_taxonomy, SNAPSHOT_TTL
+from src.utils.metrics import report_exception
+
+taxonomy_bp = Blueprint('taxonomy', __name__)
+
+@taxonomy_bp.route('/taxonomy', methods=['GET'])
+def get_taxonomy_tree():
+    """Categories with their types, and brands, each with a content count.
+    
+    The ETag is the snapshot version, so clients can keep the tree and
+    revalidate it for free until an admin changes something.
+    """
+    try:
+        snapshot = get_taxonomy()
+        response = jsonify({'success': True, 'version': snapshot.version, **snapshot.tree})
+        response.cache_control.public = True
+        response.cache_control.max_age = SNAPSHOT_TTL
+        response.set_etag(snapshot.version)
+        return response.make_conditional(request)
+    except Exception as e:
+        report_exception(e)
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from src.models.type import Type, db
 from src.models.category import Category
+from src.models.taxonomy import invalidate_taxonomy
+from src.routes.content import facet_cache
+from src.utils.metrics import report_exception
 
 type_bp = Blueprint('type', __name__)
 
@@ -20,6 +23,7 @@ def get_all_types():
             'types': [type_obj.to_dict() for type_obj in types]
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @type_bp.route('/types/<type_id>', methods=['GET'])
@@ -32,6 +36,7 @@ def get_type(type_id):
             'type': type_obj.to_dict()
         })
     except Exception as e:
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @type_bp.route('/types', methods=['POST'])
@@ -64,6 +69,8 @@ def create_type():
         
         db.session.add(type_obj)
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -73,6 +80,7 @@ def create_type():
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @type_bp.route('/types/<type_id>', methods=['PUT'])
@@ -117,6 +125,8 @@ def update_type(type_id):
             type_obj.description = data['description']
         
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -126,6 +136,7 @@ def update_type(type_id):
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @type_bp.route('/types/<type_id>', methods=['DELETE'])
@@ -143,6 +154,8 @@ def delete_type(type_id):
         
         db.session.delete(type_obj)
         db.session.commit()
+        facet_cache.clear()
+        invalidate_taxonomy()
         
         return jsonify({
             'success': True,
@@ -151,5 +164,6 @@ def delete_type(type_id):
         
     except Exception as e:
         db.session.rollback()
+        report_exception(e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
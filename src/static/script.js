@@ -13,6 +13,14 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeApp();
 });
 
+// Register the service worker for offline support
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', function() {
+        navigator.serviceWorker.register('/sw.js')
+            .catch(error => console.error('Error registering service worker:', error));
+    });
+}
+
 // Initialize application
 async function initializeApp() {
     try {
@@ -1115,10 +1123,15 @@ function openContentModal(item) {
                 <span><i class="fas fa-eye"></i> ${(item.views || 0) + 1} مشاهدة</span>
                 <span><i class="fas fa-calendar"></i> ${new Date(item.created_at).toLocaleDateString('ar-SA')}</span>
             </div>
+            <div class="related-content" style="display: none; margin-top: 20px;">
+                <h4 style="margin-bottom: 10px;">محتوى مشابه</h4>
+                <div class="related-items" style="display: flex; gap: 10px; overflow-x: auto;"></div>
+            </div>
         </div>
     `;
     
     document.body.appendChild(modal);
+    loadRelatedContent(modal, item);
     
     // Close modal when clicking outside
     modal.addEventListener('click', (e) => {
@@ -1128,3 +1141,42 @@ function openContentModal(item) {
     });
 }
 
+// "More like this" strip under the content modal
+async function loadRelatedContent(modal, item) {
+    try {
+        const response = await fetch(`${API_BASE}/api/content/${item.id}/related?limit=6`);
+        const data = await response.json();
+        if (!data.success || data.related.length === 0) return;
+        
+        const container = modal.querySelector('.related-items');
+        data.related.forEach(related => {
+            const thumbnail = document.createElement('div');
+            thumbnail.style.cssText = 'flex: 0 0 120px; cursor: pointer; text-align: center;';
+            thumbnail.title = related.title;
+            if (related.content_type === 'image') {
+                const image = document.createElement('img');
+                image.src = `${API_BASE}/api/content/${encodeURIComponent(related.id)}/image?w=160&h=160&fit=cover`;
+                image.alt = related.title;
+                image.loading = 'lazy';
+                image.style.cssText = 'width: 120px; height: 120px; object-fit: cover; border-radius: 8px;';
+                thumbnail.appendChild(image);
+            } else {
+                const placeholder = document.createElement('div');
+                placeholder.style.cssText = 'width: 120px; height: 120px; display: flex; align-items: center; justify-content: center; border-radius: 8px; background: var(--light-color);';
+                const icon = document.createElement('i');
+                icon.className = 'fas fa-video';
+                placeholder.appendChild(icon);
+                thumbnail.appendChild(placeholder);
+            }
+            thumbnail.onclick = () => {
+                modal.remove();
+                openContentModal({ ...related, file_path: related.file_url });
+            };
+            container.appendChild(thumbnail);
+        });
+        modal.querySelector('.related-content').style.display = 'block';
+    } catch (error) {
+        console.error('Error loading related content:', error);
+    }
+}
+
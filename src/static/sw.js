@@ -0,0 +1,143 @@
+// Service Worker - معرض زمزم
+// BUILD_VERSION and PRECACHE_URLS are rewritten by `flask build-assets`
+const BUILD_VERSION = 'dev';
+const PRECACHE_URLS = ['/', '/script.js', '/manifest.json', '/favicon.ico'];
+
+const SHELL_CACHE = `zamzam-shell-${BUILD_VERSION}`;
+const API_CACHE = `zamzam-api-${BUILD_VERSION}`;
+// Uploaded media never changes under the same URL, so it survives new builds (v2 drops
+// HTML error pages that v1 could have stored as media)
+const MEDIA_CACHE = 'zamzam-media-v2';
+
+const MAX_API_ENTRIES = 60;
+const MAX_MEDIA_ENTRIES = 300;
+
+// List endpoints served stale-while-revalidate
+const API_LIST_PATTERN = /^\/api\/(content|content\/stats|categories|types|brands|settings)$/;
+// Fingerprinted build assets
+const ASSET_PATTERN = /^\/assets\//;
+// Uploaded images and thumbnails (UUID file names)
+const MEDIA_PATTERN = /^\/(uploads|media)\/.+\.(png|jpe?g|gif|webp|avif)$/i;
+// Content types worth caching per kind; anything else (an HTML error page) is passed through uncached
+const ASSET_TYPES = /^(application\/(javascript|json|manifest\+json)|text\/(javascript|css))\b/;
+const MEDIA_TYPES = /^image\//;
+// Navigations to real resources (downloads, files, server pages), never answered with the app shell
+const NON_SHELL_PATTERN = /^\/(api|uploads|media|assets)\/|^\/(metrics|health)$/;
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    const keep = [SHELL_CACHE, API_CACHE, MEDIA_CACHE];
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(
+                names.filter(name => name.startsWith('zamzam-') && !keep.includes(name))
+                    .map(name => caches.delete(name))
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (request.mode === 'navigate') {
+        if (!NON_SHELL_PATTERN.test(url.pathname)) {
+            event.respondWith(networkFirstShell(request, url));
+        }
+    } else if (ASSET_PATTERN.test(url.pathname)) {
+        event.respondWith(cacheFirst(SHELL_CACHE, request, null, ASSET_TYPES));
+    } else if (MEDIA_PATTERN.test(url.pathname)) {
+        event.respondWith(cacheFirst(MEDIA_CACHE, request, MAX_MEDIA_ENTRIES, MEDIA_TYPES));
+    } else if (API_LIST_PATTERN.test(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event, API_CACHE, MAX_API_ENTRIES));
+    } else if (PRECACHE_URLS.includes(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event, SHELL_CACHE, null));
+    }
+});
+
+// Serve from cache, fall back to the network and remember the response if its type is expected
+async function cacheFirst(cacheName, request, maxEntries, contentTypes) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    if (cached) {
+        if (maxEntries) await touch(cache, request, cached);
+        return cached;
+    }
+
+    const response = await fetch(request);
+    const contentType = response.headers.get('Content-Type') || '';
+    if (response.ok && response.status === 200 && contentTypes.test(contentType)) {
+        await cache.put(request, response.clone());
+        if (maxEntries) await trimCache(cache, maxEntries);
+    }
+    return response;
+}
+
+// Load the page from the network; offline, fall back to the cached app shell
+async function networkFirstShell(request, url) {
+    const cache = await caches.open(SHELL_CACHE);
+    try {
+        const response = await fetch(request);
+        const isHtml = (response.headers.get('Content-Type') || '').startsWith('text/html');
+        if (url.pathname === '/' && response.ok && response.status === 200 && isHtml) {
+            await cache.put('/', response.clone());
+        }
+        return response;
+    } catch (error) {
+        const shell = await cache.match('/');
+        if (shell) return shell;
+        throw error;
+    }
+}
+
+// Serve from cache immediately and refresh the entry in the background
+async function staleWhileRevalidate(event, cacheName, maxEntries) {
+    const request = event.request;
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+
+    const network = fetch(request)
+        .then(async response => {
+            if (response.ok && response.status === 200) {
+                await cache.put(request, response.clone());
+                if (maxEntries) await trimCache(cache, maxEntries);
+            }
+            return response;
+        })
+        .catch(error => {
+            if (cached) return cached;
+            throw error;
+        });
+
+    if (cached) {
+        // The refresh re-inserts the entry, which also marks it recently used
+        event.waitUntil(network.catch(() => {}));
+        return cached;
+    }
+    return network;
+}
+
+// Cache keys keep insertion order, so re-inserting an entry marks it most recently used
+async function touch(cache, request, response) {
+    await cache.delete(request);
+    await cache.put(request, response.clone());
+}
+
+// Evict least recently used entries beyond the limit
+async function trimCache(cache, maxEntries) {
+    const keys = await cache.keys();
+    for (let i = 0; i < keys.length - maxEntries; i++) {
+        await cache.delete(keys[i]);
+    }
+}
@@ -0,0 +1,203 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+
+from src.utils.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTIONS
+
+# pool: (concurrent requests, requests allowed to wait for a slot).
+# A waiting request holds a worker thread too, so keep the write, upload and archive
+# totals below the server's thread count; the rest is left for reads.
+DEFAULT_POOLS = {
+    'read': (32, 64),
+    'write': (4, 8),
+    'upload': (2, 2),
+    'archive': (2, 2)
+}
+
+# pool: (requests per minute per client, burst); reads are not rate limited
+DEFAULT_RATE_LIMITS = {
+    'write': (120, 30),
+    'upload': (20, 5),
+    'archive': (10, 3)
+}
+
+# Endpoints with a pool of their own; a ZIP download holds its slot until fully sent
+ENDPOINT_POOLS = {
+    'content.create_content': 'upload',
+    'content.download_archive': 'archive'
+}
+
+# Probes and static assets bypass admission so a saturated app still reports its state.
+# Event streams stay open indefinitely; the event broker caps them instead.
+EXEMPT_ENDPOINTS = {'health_check', 'metrics', 'static', 'hashed_asset', 'events.stream_events'}
+
+# Clients tracked by the rate limiter; the least recently seen are forgotten first
+MAX_TRACKED_CLIENTS = 10000
+
+
+class AdmissionPool:
+    """Concurrency limit with a bounded, time-limited wait queue"""
+
+    def __init__(self, name, limit, queue_size, timeout):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def _report(self):
+        ADMISSION_IN_FLIGHT.set(self.active, self.name)
+        ADMISSION_QUEUED.set(self.waiting, self.name)
+
+    def acquire(self):
+        """Take a slot, waiting up to timeout; False if the pool is saturated"""
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                self._report()
+                return True
+            if self.waiting >= self.queue_size:
+                return False
+
+            self.waiting += 1
+            self._report()
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+                self._report()
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._report()
+            self._condition.notify()
+
+
+class RateLimiter:
+    """Token bucket per client: rate per minute, up to burst requests at once"""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """Spend a token; returns 0, or the seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+def request_pool_name():
+    """The pool the current request belongs to, or None if exempt"""
+    if request.method == 'OPTIONS' or request.endpoint in EXEMPT_ENDPOINTS:
+        return None
+    if request.endpoint in ENDPOINT_POOLS:
+        return ENDPOINT_POOLS[request.endpoint]
+    if request.method in ('GET', 'HEAD'):
+        return 'read'
+    return 'write'
+
+
+def _rejection(pool, reason, retry_after):
+    ADMISSION_REJECTIONS.inc(pool, reason)
+    if reason == 'rate_limited':
+        response = jsonify({'success': False, 'error': 'طلبات كثيرة، حاول مرة أخرى بعد قليل'})
+        response.status_code = 429
+    else:
+        response = jsonify({'success': False, 'error': 'الخادم مشغول حالياً، حاول مرة أخرى بعد قليل'})
+        response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def _parse_rate_limits(value):
+    # "off" disables rate limiting; otherwise "pool=per_minute/burst,..."
+    if value is None:
+        return dict(DEFAULT_RATE_LIMITS)
+    if value.strip().lower() in ('', '0', 'off'):
+        return {}
+    limits = {}
+    for item in value.split(','):
+        name, spec = item.split('=')
+        per_minute, burst = spec.split('/')
+        limits[name.strip()] = (float(per_minute), int(burst))
+    return limits
+
+
+def init_admission(app):
+    """Limit concurrent requests per pool (read, write, upload, archive) and rate limit clients.
+
+    Requests over a pool's limit wait in its queue for up to
+    ADMISSION_QUEUE_TIMEOUT seconds; when the queue is full or the wait runs
+    out they get 503 with Retry-After, and clients over their rate get 429.
+    Call after init_metrics so rejected requests are still counted and timed.
+    """
+    app.config.setdefault('ADMISSION_ENABLED', os.environ.get('ADMISSION_ENABLED', '1') != '0')
+    app.config.setdefault('ADMISSION_POOLS', {
+        name: (int(os.environ.get(f'ADMISSION_{name.upper()}_LIMIT', limit)),
+               int(os.environ.get(f'ADMISSION_{name.upper()}_QUEUE', queue_size)))
+        for name, (limit, queue_size) in DEFAULT_POOLS.items()
+    })
+    app.config.setdefault('ADMISSION_QUEUE_TIMEOUT', float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5)))
+    app.config.setdefault('ADMISSION_RATE_LIMITS', _parse_rate_limits(os.environ.get('ADMISSION_RATE_LIMITS')))
+    if not app.config['ADMISSION_ENABLED']:
+        return
+
+    pools = {
+        name: AdmissionPool(name, limit, queue_size, app.config['ADMISSION_QUEUE_TIMEOUT'])
+        for name, (limit, queue_size) in app.config['ADMISSION_POOLS'].items()
+    }
+    limiters = {
+        name: RateLimiter(per_minute, burst)
+        for name, (per_minute, burst) in app.config['ADMISSION_RATE_LIMITS'].items()
+    }
+
+    @app.before_request
+    def admit_request():
+        name = request_pool_name()
+        if name is None:
+            return None
+
+        limiter = limiters.get(name)
+        if limiter is not None:
+            wait = limiter.take(request.remote_addr)
+            if wait:
+                return _rejection(name, 'rate_limited', wait)
+
+        pool = pools[name]
+        if not pool.acquire():
+            return _rejection(name, 'saturated', pool.timeout)
+        g.admission_pool = pool
+        return None
+
+    @app.teardown_request
+    def release_slot(exception=None):
+        pool = g.pop('admission_pool', None)
+        if pool is not None:
+            pool.release()
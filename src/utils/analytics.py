@@ -0,0 +1,12 @@
+import click
+from flask.cli import with_appcontext
+
+from src.models.analytics import ContentStatsBucket
+
+
+@click.command('rollup-analytics')
+@with_appcontext
+def rollup_analytics_command():
+    """Roll old hourly analytics buckets into daily and monthly ones."""
+    hours, days = ContentStatsBucket.rollup_all()
+    click.echo(f'تم دمج {hours} سجل ساعي و{days} سجل يومي')
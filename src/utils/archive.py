@@ -0,0 +1,74 @@
+import re
+import zipfile
+from contextlib import closing
+
+# Read from storage and handed to the socket in pieces of about this size
+ARCHIVE_CHUNK_SIZE = 64 * 1024
+
+# Entries at least this large get ZIP64 headers up front; the size is checked before writing
+ZIP64_THRESHOLD = zipfile.ZIP64_LIMIT
+
+_UNSAFE_NAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+def archive_name(text, fallback):
+    """text made safe for use as a file or folder name inside a ZIP"""
+    name = _UNSAFE_NAME.sub('_', text or '').strip(' .')
+    return name[:100] or fallback
+
+
+class _Sink:
+    """Write-only, unseekable file object collecting what zipfile writes until drained"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.offset = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts, self.size = [], 0
+        return data
+
+
+def stream_zip(entries):
+    """Yield a ZIP archive of entries piece by piece, holding one chunk in memory.
+
+    entries yields (name, backend, key, size, date_time). Media is already
+    compressed, so files are stored as they are; CRCs and sizes follow each
+    file in a data descriptor since the output cannot seek back. Files
+    missing from storage are left out.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, backend, key, size, date_time in entries:
+            try:
+                source = backend.open(key)
+            except FileNotFoundError:
+                continue
+            info = zipfile.ZipInfo(name, date_time=max(date_time, (1980, 1, 1, 0, 0, 0)))
+            info.compress_type = zipfile.ZIP_STORED
+            info.external_attr = 0o644 << 16
+            with closing(source), archive.open(info, 'w', force_zip64=size is None or size >= ZIP64_THRESHOLD) as target:
+                while True:
+                    chunk = source.read(ARCHIVE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    if sink.size >= ARCHIVE_CHUNK_SIZE:
+                        yield sink.drain()
+            if sink.size:
+                yield sink.drain()
+    yield sink.drain()
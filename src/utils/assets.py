@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import re
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from src.utils.compression import ENCODING_SUFFIXES, precompress_directory
+
+# URL prefix under which fingerprinted assets are served
+ASSETS_URL_PREFIX = '/assets/'
+
+# Name of the mapping file written next to the built assets
+ASSET_MANIFEST = 'asset-manifest.json'
+
+# Mappings of the latest builds; their hashed files are kept, since open pages
+# and cached copies of an older index.html still reference them
+ASSET_HISTORY = 'asset-history.json'
+KEEP_BUILDS = 5
+
+WORD_CHARS = re.compile(r'[A-Za-z0-9_$]')
+REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void', 'throw'}
+STYLE_BLOCK = re.compile(r'<style>(.*?)</style>\s*', re.S)
+
+
+def minify_js(source):
+    """Strip comments and redundant whitespace from JavaScript.
+
+    Newlines are kept (collapsed) so automatic semicolon insertion still
+    works; strings, template literals and regex literals are copied verbatim.
+    """
+    out = []
+    template_depth = []  # brace depth of each open ${ ... } expression
+    i = 0
+    n = len(source)
+
+    def last_significant():
+        for char in reversed(out):
+            if not char.isspace():
+                return char
+        return ''
+
+    def last_word():
+        match = re.search(r'([A-Za-z_$][\w$]*)\s*$', ''.join(out[-20:]))
+        return match.group(1) if match else ''
+
+    def copy_template(start):
+        # Copy a template literal body until the closing backtick or ${
+        j = start
+        while j < n:
+            if source[j] == '\\':
+                j += 2
+                continue
+            if source[j] == '`':
+                out.append(source[start:j + 1])
+                return j + 1, False
+            if source.startswith('${', j):
+                out.append(source[start:j + 2])
+                return j + 2, True
+            j += 1
+        out.append(source[start:])
+        return n, False
+
+    while i < n:
+        char = source[i]
+
+        if char in '"\'':
+            j = i + 1
+            while j < n and source[j] != char:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif char == '`':
+            out.append('`')
+            i, opened = copy_template(i + 1)
+            if opened:
+                template_depth.append(0)
+        elif char == '}' and template_depth and template_depth[-1] == 0:
+            template_depth.pop()
+            out.append('}')
+            i, opened = copy_template(i + 1)
+            if opened:
+                template_depth.append(0)
+        elif source.startswith('//', i):
+            while i < n and source[i] != '\n':
+                i += 1
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = n if end == -1 else end + 2
+        elif char == '/' and (last_significant() in REGEX_PRECEDERS or last_significant() == ''
+                              or last_word() in REGEX_KEYWORDS):
+            j = i + 1
+            in_class = False
+            while j < n and (source[j] != '/' or in_class):
+                if source[j] == '\\':
+                    j += 1
+                elif source[j] == '[':
+                    in_class = True
+                elif source[j] == ']':
+                    in_class = False
+                j += 1
+            j += 1
+            while j < n and source[j].isalpha():
+                j += 1
+            out.append(source[i:j])
+            i = j
+        elif char.isspace():
+            j = i
+            while j < n and source[j].isspace():
+                j += 1
+            previous = out[-1][-1] if out and out[-1] else ''
+            following = source[j] if j < n else ''
+            if '\n' in source[i:j]:
+                if previous and previous != '\n':
+                    out.append('\n')
+            elif (WORD_CHARS.match(previous) and WORD_CHARS.match(following)) or \
+                    (previous in '+-' and previous == following and previous):
+                out.append(' ')
+            i = j
+        else:
+            if template_depth:
+                if char == '{':
+                    template_depth[-1] += 1
+                elif char == '}':
+                    template_depth[-1] -= 1
+            out.append(char)
+            i += 1
+
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(source):
+    """Strip comments and redundant whitespace from CSS"""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};,])\s*', r'\1', source)
+    source = re.sub(r':\s+', ':', source)
+    source = source.replace(';}', '}')
+    return source.strip()
+
+
+def minify_json(source):
+    """Re-serialise JSON without whitespace"""
+    return json.dumps(json.loads(source), ensure_ascii=False, separators=(',', ':'))
+
+
+def fingerprint(filename, data):
+    """Return filename with a content hash inserted before the extension"""
+    stem, extension = os.path.splitext(filename)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return f'{stem}.{digest}{extension}'
+
+
+def build_assets(static_folder, output_folder):
+    """Minify and fingerprint the front-end assets and rewrite index.html.
+
+    Returns the mapping of logical asset names to their hashed URLs. Hashed
+    files of the previous KEEP_BUILDS - 1 builds stay; older ones are pruned.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    def emit(logical_name, text):
+        data = text.encode('utf-8')
+        hashed_name = fingerprint(logical_name, data)
+        with open(os.path.join(output_folder, hashed_name), 'wb') as f:
+            f.write(data)
+        return ASSETS_URL_PREFIX + hashed_name
+
+    with open(os.path.join(static_folder, 'index.html'), encoding='utf-8') as f:
+        html = f.read()
+
+    mapping = {}
+
+    # Move the inline stylesheet into a cacheable file
+    styles = STYLE_BLOCK.findall(html)
+    if styles:
+        mapping['styles.css'] = emit('styles.css', minify_css('\n'.join(styles)))
+        link = f'<link rel="stylesheet" href="{mapping["styles.css"]}">\n    '
+        replacements = iter([link])
+        html = STYLE_BLOCK.sub(lambda match: next(replacements, ''), html)
+
+    with open(os.path.join(static_folder, 'script.js'), encoding='utf-8') as f:
+        mapping['script.js'] = emit('script.js', minify_js(f.read()))
+    html = re.sub(r'src="/?script\.js"', f'src="{mapping["script.js"]}"', html)
+
+    with open(os.path.join(static_folder, 'manifest.json'), encoding='utf-8') as f:
+        mapping['manifest.json'] = emit('manifest.json', minify_json(f.read()))
+    html = re.sub(r'href="/?manifest\.json"', f'href="{mapping["manifest.json"]}"', html)
+
+    with open(os.path.join(output_folder, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(html)
+    with open(os.path.join(output_folder, ASSET_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(mapping, f, indent=2)
+
+    build_service_worker(static_folder, output_folder, mapping)
+    prune_assets(output_folder, mapping)
+    return mapping
+
+
+def prune_assets(output_folder, mapping):
+    """Record mapping as the latest build and delete hashed files no recent build references"""
+    history_path = os.path.join(output_folder, ASSET_HISTORY)
+    try:
+        with open(history_path, encoding='utf-8') as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        history = []
+    history = ([mapping] + [build for build in history if build != mapping])[:KEEP_BUILDS]
+    with open(history_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+    keep = {'index.html', 'sw.js', ASSET_MANIFEST, ASSET_HISTORY}
+    keep.update(url[len(ASSETS_URL_PREFIX):] for build in history for url in build.values())
+    for entry in os.scandir(output_folder):
+        name = entry.name
+        for suffix in ENCODING_SUFFIXES.values():
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+        if entry.is_file() and name not in keep:
+            os.remove(entry.path)
+
+
+def build_service_worker(static_folder, output_folder, mapping):
+    """Write sw.js stamped with the build version and the hashed app shell"""
+    version = hashlib.sha256(json.dumps(mapping, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    precache_urls = ['/'] + sorted(mapping.values()) + ['/favicon.ico']
+
+    with open(os.path.join(static_folder, 'sw.js'), encoding='utf-8') as f:
+        source = f.read()
+    source = re.sub(r"const BUILD_VERSION = .*?;", f"const BUILD_VERSION = '{version}';", source, count=1)
+    source = re.sub(r"const PRECACHE_URLS = \[.*?\];", f"const PRECACHE_URLS = {json.dumps(precache_urls)};",
+                    source, count=1)
+
+    with open(os.path.join(output_folder, 'sw.js'), 'w', encoding='utf-8') as f:
+        f.write(minify_js(source))
+    return version
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Minify, fingerprint and precompress the front-end assets."""
+    static_folder = current_app.static_folder
+    output_folder = current_app.config['ASSETS_FOLDER']
+
+    mapping = build_assets(static_folder, output_folder)
+    for logical_name, url in mapping.items():
+        click.echo(f'{logical_name} -> {url}')
+
+    min_size = current_app.config['COMPRESS_MIN_SIZE']
+    precompress_directory(output_folder, min_size)
+    precompress_directory(static_folder, min_size)
+    click.echo(f'تم بناء الملفات في {output_folder}')
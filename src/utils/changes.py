@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from src.models.change import Change, TOMBSTONE_RETENTION, db
+
+
+@click.command('compact-changes')
+@click.option('--tombstone-days', default=TOMBSTONE_RETENTION.days, show_default=True,
+              help='Days deletions stay in the change feed')
+@with_appcontext
+def compact_changes_command(tombstone_days):
+    """Shrink the change feed to the latest change per row.
+
+    Clients whose cursor is older than the expired deletions are asked to
+    resync from scratch. Run daily.
+    """
+    removed = Change.compact(timedelta(days=tombstone_days))
+    db.session.commit()
+    click.echo(f'تم حذف {removed} تغيير؛ أقدم مؤشر صالح {Change.horizon()}')
@@ -0,0 +1,178 @@
+import gzip
+import mimetypes
+import os
+import zlib
+
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Media types worth compressing; images and videos are already compressed
+COMPRESSIBLE_MIMETYPES = {
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/xml',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/manifest+json',
+    'application/xml',
+    'image/svg+xml',
+    'image/vnd.microsoft.icon',
+}
+
+# Static files that get .gz/.br siblings from the build step
+PRECOMPRESS_EXTENSIONS = {'.html', '.js', '.css', '.json', '.xml', '.txt', '.svg', '.ico'}
+
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def available_encodings():
+    """Return the encodings this server can produce, preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress_bytes(data, encoding, level=None):
+    """Compress data with the given encoding"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=level if level is not None else 5)
+    return gzip.compress(data, compresslevel=level if level is not None else 6, mtime=0)
+
+
+def send_precompressed(directory, filename, mimetype=None, **kwargs):
+    """Send a static file, preferring a fresh .br/.gz sibling the client accepts"""
+    if mimetype is None:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    source_path = os.path.join(directory, filename)
+    candidates = []
+    if os.path.isfile(source_path):
+        source_mtime = os.path.getmtime(source_path)
+        for encoding in available_encodings():
+            sibling = source_path + ENCODING_SUFFIXES[encoding]
+            # Ignore siblings left over from an older build
+            if os.path.isfile(sibling) and os.path.getmtime(sibling) >= source_mtime:
+                candidates.append(encoding)
+
+    encoding = request.accept_encodings.best_match(candidates) if candidates else None
+    if encoding:
+        response = send_from_directory(
+            directory, filename + ENCODING_SUFFIXES[encoding], mimetype=mimetype, **kwargs
+        )
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype, **kwargs)
+
+    if candidates:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def compress_stream(response, level=None):
+    """Gzip a streamed response on the fly when the client accepts it.
+
+    The after_request hook leaves streams alone because it would have to
+    buffer them; this compresses chunk by chunk instead.
+    """
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip'] <= 0:
+        return response
+    compressor = zlib.compressobj(level or current_app.config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    chunks = response.response
+
+    def generate():
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    response.response = generate()
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def init_compression(app):
+    """Compress dynamic responses according to the client's Accept-Encoding"""
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+
+    @app.after_request
+    def compress_response(response):
+        # File responses are served as-is (see send_precompressed)
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if 'Content-Encoding' in response.headers:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if not encoding:
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        level = app.config['COMPRESS_BROTLI_QUALITY' if encoding == 'br' else 'COMPRESS_GZIP_LEVEL']
+        compressed = compress_bytes(data, encoding, level)
+        if len(compressed) >= len(data):
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        if response.get_etag()[0]:
+            response.set_etag(f'{response.get_etag()[0]}-{encoding}', weak=True)
+        return response
+
+
+def precompress_directory(directory, min_size=0):
+    """Write .gz and .br siblings for every compressible file in directory (not recursive)"""
+    written = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        root, extension = os.path.splitext(name)
+        if not os.path.isfile(path) or extension.lower() not in PRECOMPRESS_EXTENSIONS:
+            continue
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < min_size:
+            continue
+
+        for encoding in available_encodings():
+            level = 11 if encoding == 'br' else 9
+            compressed = compress_bytes(data, encoding, level)
+            sibling = path + ENCODING_SUFFIXES[encoding]
+            if len(compressed) >= len(data):
+                # Not worth it; make sure a stale sibling is not served
+                if os.path.exists(sibling):
+                    os.remove(sibling)
+                continue
+            with open(sibling, 'wb') as f:
+                f.write(compressed)
+            written.append((sibling, len(data), len(compressed)))
+    return written
+
+
+@click.command('precompress-static')
+@with_appcontext
+def precompress_command():
+    """Write .gz/.br siblings for the static files."""
+    if brotli is None:
+        click.echo('brotli غير مثبت، سيتم إنشاء ملفات gzip فقط')
+    written = precompress_directory(current_app.static_folder, current_app.config['COMPRESS_MIN_SIZE'])
+    for path, original_size, compressed_size in written:
+        click.echo(f'{os.path.basename(path)}: {original_size} -> {compressed_size} bytes')
@@ -0,0 +1,114 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import click
+from flask.cli import with_appcontext
+
+from src.models.content import Content, db
+from src.models.image_hash import ImageHash
+from src.utils.perceptual_hash import HashIndex, DEFAULT_MAX_DISTANCE, MAX_DISTANCE_LIMIT, dhash
+from src.utils.storage import resolve_url
+
+
+def _hash_file(path):
+    """Worker: hash one file, returning None when it cannot be decoded"""
+    if path is None:
+        return None
+    try:
+        return dhash(path)
+    except Exception:
+        # Pillow also raises SyntaxError, ValueError and DecompressionBombError on bad files;
+        # letting them out of the pool would abort the whole backfill
+        return None
+
+
+def backfill_hashes(batch_size=500, workers=None):
+    """Hash every image that has no perceptual hash yet. Returns the count hashed."""
+    hashed = 0
+    last_id = ''
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = (
+                Content.query
+                .outerjoin(ImageHash, ImageHash.content_id == Content.id)
+                .filter(Content.content_type == 'image', ImageHash.content_id.is_(None))
+                .filter(Content.id > last_id)
+                .order_by(Content.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+
+            with ExitStack() as stack:
+                # Remote backends download each file to a temporary path for the batch
+                paths = []
+                for item in batch:
+                    backend, key = resolve_url(item.file_url)
+                    paths.append(stack.enter_context(backend.local_file(key)) if backend else None)
+                for item, value in zip(batch, executor.map(_hash_file, paths, chunksize=16)):
+                    # Undecodable files are skipped and reported by the count only
+                    if value is not None:
+                        db.session.add(ImageHash(value, content_id=item.id))
+                        hashed += 1
+            last_id = batch[-1].id
+            db.session.commit()
+    return hashed
+
+
+def cluster_duplicates(max_distance):
+    """Group all hashed images into clusters of near duplicates.
+
+    Uses an in-memory multi-index hash table, so each image is compared only
+    with candidates sharing a band instead of with every other image.
+    """
+    index = HashIndex()
+    content_ids = []
+    for content_id, value in db.session.query(ImageHash.content_id, ImageHash.hash).yield_per(10000):
+        index.add(value)
+        content_ids.append(content_id)
+
+    # Union-find over positions
+    parents = list(range(len(content_ids)))
+
+    def find(position):
+        while parents[position] != position:
+            parents[position] = parents[parents[position]]
+            position = parents[position]
+        return position
+
+    for position, value in enumerate(index.hashes):
+        for match, _ in index.search(value, max_distance):
+            if match > position:
+                root_a, root_b = find(position), find(match)
+                if root_a != root_b:
+                    parents[root_b] = root_a
+
+    clusters = {}
+    for position, content_id in enumerate(content_ids):
+        clusters.setdefault(find(position), []).append(content_id)
+    return sorted((ids for ids in clusters.values() if len(ids) > 1), key=len, reverse=True)
+
+
+@click.command('find-duplicates')
+@click.option('--max-distance', default=DEFAULT_MAX_DISTANCE, show_default=True,
+              type=click.IntRange(0, MAX_DISTANCE_LIMIT), help='Maximum Hamming distance')
+@click.option('--backfill/--no-backfill', default=True, show_default=True,
+              help='Hash images uploaded before hashing existed')
+@click.option('--workers', default=None, type=int, help='Hashing processes (default: CPU count)')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Write clusters as JSON')
+@with_appcontext
+def find_duplicates_command(max_distance, backfill, workers, output):
+    """Cluster near-duplicate images across the library."""
+    if backfill:
+        hashed = backfill_hashes(workers=workers)
+        click.echo(f'تم حساب بصمة {hashed} صورة')
+
+    clusters = cluster_duplicates(max_distance)
+    duplicates = sum(len(ids) - 1 for ids in clusters)
+    click.echo(f'{len(clusters)} مجموعة متشابهة، {duplicates} نسخة مكررة')
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(clusters, f, indent=2)
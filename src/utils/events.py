@@ -0,0 +1,293 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.orm import Session
+
+from src.models.user import db
+from src.models.content import Content
+from src.models.settings import Settings
+from src.models.event import Event
+from src.models.change import TRACKED_MODELS, changed_columns
+
+# View and like counts are merged per content item and published at most this often
+COUNTER_INTERVAL = 1.0
+
+# Rows the database transport keeps; a worker further behind than this resets its clients
+EVENT_TABLE_SIZE = 5000
+
+COUNTER_COLUMNS = {'views_count', 'likes_count'}
+SUMMARY_COLUMNS = ('title', 'thumbnail_url', 'content_type', 'category_id', 'type_id', 'brand_id')
+
+
+class Subscriber:
+    """One stream's pending events, bounded: a client that falls behind gets a reset instead"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.events = deque()
+        self.overflowed = False
+        self._condition = threading.Condition()
+
+    def put(self, item):
+        with self._condition:
+            if len(self.events) >= self.capacity:
+                self.events.clear()
+                self.overflowed = True
+            else:
+                self.events.append(item)
+            self._condition.notify()
+
+    def get(self, timeout):
+        """(events, overflowed) waiting up to timeout for something to send"""
+        with self._condition:
+            if not self.events and not self.overflowed:
+                self._condition.wait(timeout)
+            events, overflowed = list(self.events), self.overflowed
+            self.events.clear()
+            self.overflowed = False
+            return events, overflowed
+
+
+class LocalTransport:
+    """Delivers events to the publishing process only; enough for a single worker.
+
+    Ids start from the clock so they keep increasing across restarts, and a
+    client resuming with an id from before a restart is told to reset.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(int(time.time() * 1000))
+        self._lock = threading.Lock()
+        self.broker = None
+
+    def attach(self, broker):
+        self.broker = broker
+        self.first_id = next(self._ids)
+
+    def start(self):
+        pass
+
+    def publish(self, kind, data):
+        with self._lock:
+            self.broker.deliver(next(self._ids), kind, data)
+
+
+class DatabaseTransport:
+    """Relays events between worker processes through the events table.
+
+    Publishing inserts a row; every subscribed worker polls for rows after
+    the last one it delivered, so ids agree across workers and a client can
+    resume on any of them.
+    """
+
+    def __init__(self, engine, poll_interval=0.5):
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.broker = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def attach(self, broker):
+        self.broker = broker
+        self.first_id = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                with self.engine.connect() as connection:
+                    self.last_id = connection.scalar(select(func.max(Event.id))) or 0
+                self.first_id = self.last_id + 1
+                self._thread = threading.Thread(target=self._poll, name='event-poller', daemon=True)
+                self._thread.start()
+
+    def publish(self, kind, data):
+        with self.engine.begin() as connection:
+            connection.execute(insert(Event), {'kind': kind, 'data': json.dumps(data, ensure_ascii=False)})
+
+    def _poll(self):
+        polls = 0
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                with self.engine.begin() as connection:
+                    rows = connection.execute(
+                        select(Event.id, Event.kind, Event.data).where(Event.id > self.last_id).order_by(Event.id)
+                    ).all()
+                    polls += 1
+                    if rows and polls % 100 == 0:
+                        connection.execute(Event.__table__.delete().where(Event.id <= rows[-1].id - EVENT_TABLE_SIZE))
+                for row in rows:
+                    self.broker.deliver(row.id, row.kind, json.loads(row.data))
+                    self.last_id = row.id
+            except Exception:
+                pass  # Database busy or restarting; try again on the next poll
+
+
+class EventBroker:
+    """Fans published events out to the subscribed streams of this process.
+
+    Events are serialized once and kept in a short history, so a client
+    reconnecting with Last-Event-ID gets what it missed, or a reset event
+    when that is no longer available.
+    """
+
+    def __init__(self, transport, buffer_size=256, history_size=1000, max_subscribers=200):
+        self.transport = transport
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._counter_thread = None
+        transport.attach(self)
+
+    def publish(self, kind, data):
+        self.transport.publish(kind, data)
+
+    def publish_counters(self, content_id, counts):
+        """Queue new view/like counts; merged with others and published once per COUNTER_INTERVAL"""
+        with self._lock:
+            self._counters[content_id] = counts
+            if self._counter_thread is None:
+                self._counter_thread = threading.Thread(target=self._flush_counters, name='event-counters', daemon=True)
+                self._counter_thread.start()
+
+    def _flush_counters(self):
+        while True:
+            time.sleep(COUNTER_INTERVAL)
+            with self._lock:
+                counters, self._counters = self._counters, {}
+            if counters:
+                try:
+                    self.publish('counters', counters)
+                except Exception:
+                    pass  # Counts are also in the next update; losing one batch is harmless
+
+    def deliver(self, event_id, kind, data):
+        """Called by the transport with each event, in id order"""
+        item = (event_id, f'id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n')
+        with self._lock:
+            self.history.append(item)
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.put(item)
+
+    def subscribe(self, last_event_id=None):
+        """(subscriber, whether the client missed events), or (None, False) when full"""
+        self.transport.start()
+        with self._lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None, False
+            subscriber = Subscriber(self.buffer_size)
+            missed = False
+            if last_event_id is not None:
+                oldest = self.history[0][0] if self.history else self.transport.first_id
+                latest = self.history[-1][0] if self.history else last_event_id
+                missed = last_event_id < oldest - 1 or last_event_id > latest
+                if not missed:
+                    replay = [item for item in self.history if item[0] > last_event_id]
+                    missed = len(replay) > self.buffer_size
+                    subscriber.events.extend(replay[-self.buffer_size:])
+            self.subscribers.add(subscriber)
+            return subscriber, missed
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+
+def _content_summary(content):
+    summary = {'id': content.id}
+    summary.update((column, getattr(content, column)) for column in SUMMARY_COLUMNS)
+    return summary
+
+
+@event.listens_for(Session, 'after_flush')
+def collect_events(session, flush_context):
+    """Queue events for the rows this flush wrote; they are published after commit"""
+    pending = session.info.setdefault('pending_events', [])
+    for instances, op in ((session.new, 'created'), (session.dirty, 'updated'), (session.deleted, 'deleted')):
+        for instance in instances:
+            tracked = TRACKED_MODELS.get(type(instance))
+            if tracked is None:
+                continue
+            changed = changed_columns(instance) if op == 'updated' else None
+            if isinstance(instance, Content):
+                if op == 'updated' and changed & COUNTER_COLUMNS:
+                    pending.append(('counters', instance.id, {
+                        'views_count': instance.views_count, 'likes_count': instance.likes_count
+                    }))
+                if op == 'updated' and not changed - COUNTER_COLUMNS - {'trending_score', 'popular_score'}:
+                    continue
+                if op == 'deleted' or not instance.is_public:
+                    # Made private: gone as far as the gallery is concerned
+                    pending.append(('content', None, {'op': 'deleted', 'id': instance.id}))
+                else:
+                    pending.append(('content', None, {'op': op, **_content_summary(instance)}))
+            elif isinstance(instance, Settings):
+                if op == 'updated' and not changed - {'updated_at'}:
+                    continue
+                pending.append(('settings', None, {
+                    'op': op, 'key': instance.key, 'value': instance.get_value() if op != 'deleted' else None
+                }))
+            else:
+                entity, key = tracked
+                pending.append(('taxonomy', None, {'op': op, 'entity': entity, 'id': getattr(instance, key)}))
+
+
+@event.listens_for(Session, 'after_commit')
+def publish_events(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending or not has_app_context():
+        return
+    broker = current_app.extensions.get('events')
+    if broker is None:
+        return
+    for kind, content_id, data in pending:
+        try:
+            if kind == 'counters':
+                broker.publish_counters(content_id, data)
+            else:
+                broker.publish(kind, data)
+        except Exception as e:
+            current_app.logger.warning('Could not publish %s event', kind, exc_info=e)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_events(session):
+    session.info.pop('pending_events', None)
+
+
+def init_events(app):
+    """Set up the live event broker behind GET /api/events.
+
+    EVENTS_TRANSPORT is 'local' (one worker process) or 'database' (several
+    workers sharing the database); each stream buffers at most
+    EVENTS_BUFFER_SIZE events before its client is sent a reset.
+    """
+    app.config.setdefault('EVENTS_TRANSPORT', os.environ.get('EVENTS_TRANSPORT', 'local'))
+    app.config.setdefault('EVENTS_BUFFER_SIZE', int(os.environ.get('EVENTS_BUFFER_SIZE', 256)))
+    app.config.setdefault('EVENTS_HISTORY', int(os.environ.get('EVENTS_HISTORY', 1000)))
+    app.config.setdefault('EVENTS_MAX_SUBSCRIBERS', int(os.environ.get('EVENTS_MAX_SUBSCRIBERS', 200)))
+    app.config.setdefault('EVENTS_HEARTBEAT', float(os.environ.get('EVENTS_HEARTBEAT', 15)))
+
+    if app.config['EVENTS_TRANSPORT'] == 'database':
+        with app.app_context():
+            transport = DatabaseTransport(db.engine)
+    elif app.config['EVENTS_TRANSPORT'] == 'local':
+        transport = LocalTransport()
+    else:
+        raise ValueError(f'Unknown EVENTS_TRANSPORT {app.config["EVENTS_TRANSPORT"]!r}')
+    app.extensions['events'] = EventBroker(
+        transport,
+        buffer_size=app.config['EVENTS_BUFFER_SIZE'],
+        history_size=app.config['EVENTS_HISTORY'],
+        max_subscribers=app.config['EVENTS_MAX_SUBSCRIBERS']
+    )
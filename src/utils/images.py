@@ -0,0 +1,248 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+from src.utils.cache import CACHES
+
+# The only sizes, fits and formats served; anything else is rejected, so the
+# cache holds a few variants per image rather than one per requested pixel
+VARIANT_SIZES = (160, 320, 480, 640, 960, 1280, 1920)
+VARIANT_FITS = ('contain', 'cover')
+VARIANT_FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'progressive': True}),
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4})
+}
+
+# A cache hit refreshes the file's mtime at most this often; the mtimes order the LRU after a restart
+TOUCH_INTERVAL = 60
+
+# How long a request waits for another request rendering the same variant
+RENDER_WAIT_TIMEOUT = 30
+
+# A render's temp file older than this was left by an interrupted render; younger ones may
+# belong to a render in progress in another worker sharing the directory
+STALE_RENDER_AGE = 10 * RENDER_WAIT_TIMEOUT
+
+
+class Variant:
+    """Requested rendition of an image: bounding box, fit and output format"""
+
+    def __init__(self, width, height, fit, output_format):
+        self.width = width
+        self.height = height
+        self.fit = fit
+        self.format = output_format
+
+    @property
+    def mimetype(self):
+        return VARIANT_FORMATS[self.format][1]
+
+    def cache_name(self, source_url):
+        """Cache file name; the source URL is part of it, so a new file never reuses an old variant"""
+        digest = hashlib.sha1(source_url.encode('utf-8')).hexdigest()[:20]
+        return f'{digest[:2]}/{digest}-{self.width or 0}x{self.height or 0}-{self.fit}.{self.format}'
+
+
+def parse_variant(args):
+    """Variant from ?w=, ?h=, ?fit= and ?format=; raises ValueError for values off the lists"""
+    sizes = []
+    for name in ('w', 'h'):
+        value = args.get(name)
+        if value is None:
+            sizes.append(None)
+        elif not value.isdigit() or int(value) not in VARIANT_SIZES:
+            raise ValueError(f'المقاسات المتاحة: {", ".join(map(str, VARIANT_SIZES))}')
+        else:
+            sizes.append(int(value))
+    if sizes == [None, None]:
+        raise ValueError('يجب تحديد العرض أو الارتفاع')
+
+    fit = args.get('fit', 'contain')
+    if fit not in VARIANT_FITS:
+        raise ValueError(f'طرق الاحتواء المتاحة: {", ".join(VARIANT_FITS)}')
+    output_format = args.get('format', 'jpeg')
+    if output_format not in VARIANT_FORMATS:
+        raise ValueError(f'الصيغ المتاحة: {", ".join(VARIANT_FORMATS)}')
+    return Variant(sizes[0], sizes[1], fit, output_format)
+
+
+def render_variant(source_path, target, variant):
+    """Write variant of the image at source_path to the file object target.
+
+    Images are never enlarged: 'contain' fits inside the box, 'cover' fills
+    it and crops the overflow, shrinking the box to the image when smaller.
+    """
+    pillow_format, _, options = VARIANT_FORMATS[variant.format]
+    with Image.open(source_path) as image:
+        # JPEGs decode straight at a reduced scale no smaller than the box
+        largest = max(variant.width or 0, variant.height or 0)
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha and pillow_format != 'JPEG' else 'RGB')
+
+        if variant.fit == 'cover' and variant.width and variant.height:
+            scale = min(1.0, image.width / variant.width, image.height / variant.height)
+            size = (max(1, round(variant.width * scale)), max(1, round(variant.height * scale)))
+            image = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        else:
+            image.thumbnail((variant.width or image.width, variant.height or image.height), Image.Resampling.LANCZOS)
+        image.save(target, pillow_format, **options)
+
+
+class VariantCache:
+    """Rendered variants on disk, bounded to max_bytes by evicting the least recently used.
+
+    Concurrent requests for a variant that is not cached yet share one
+    render: the first renders it while the others wait for the file.
+    Renders are also limited to render_limit at a time, since each holds
+    a decoded image in memory. Worker processes sharing the directory each
+    keep their own index; a file another worker evicted is rendered again.
+    """
+
+    def __init__(self, directory, max_bytes, render_limit=2, name='images'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        self._index = None  # name -> (size, last touched)
+        self._lock = threading.Lock()
+        self._rendering = {}
+        self._render_slots = threading.BoundedSemaphore(render_limit)
+        if name:
+            CACHES[name] = self
+
+    def __len__(self):
+        return len(self._index or ())
+
+    def _load(self):
+        """Index the files already on disk, oldest first; called with the lock held"""
+        entries = []
+        os.makedirs(self.directory, exist_ok=True)
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                    if entry.name.startswith('.'):
+                        if time.time() - stat.st_mtime > STALE_RENDER_AGE:
+                            os.remove(entry.path)
+                        continue
+                except FileNotFoundError:
+                    continue  # Renamed or evicted by another worker meanwhile
+                entries.append((stat.st_mtime, f'{shard.name}/{entry.name}', stat.st_size))
+        self._index = OrderedDict()
+        for mtime, name, size in sorted(entries):
+            self._index[name] = (size, mtime)
+            self.size += size
+
+    def _path(self, name):
+        return os.path.join(self.directory, *name.split('/'))
+
+    def _open(self, name):
+        """Open a cached file, or None; called with the lock held"""
+        path = self._path(name)
+        try:
+            handle = open(path, 'rb')
+        except FileNotFoundError:
+            if name in self._index:
+                self.size -= self._index.pop(name)[0]
+            return None
+        entry = self._index.pop(name, None)
+        if entry is None:
+            # Rendered by another worker
+            entry = (os.fstat(handle.fileno()).st_size, 0)
+            self.size += entry[0]
+        size, touched = entry
+        now = time.time()
+        if now - touched >= TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass  # Evicted by another worker since; the open handle still reads it
+            touched = now
+        self._index[name] = (size, touched)
+        return handle
+
+    def _add(self, name, size):
+        """Record a new file and evict old ones down to max_bytes; called with the lock held"""
+        self._index[name] = (size, time.time())
+        self.size += size
+        while self.size > self.max_bytes and len(self._index) > 1:
+            evicted, (evicted_size, _) = self._index.popitem(last=False)
+            self.size -= evicted_size
+            try:
+                os.remove(self._path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def get(self, name, render):
+        """Binary file object for the variant called name, rendered with render(target) when missing"""
+        deadline = time.monotonic() + RENDER_WAIT_TIMEOUT
+        while True:
+            with self._lock:
+                if self._index is None:
+                    self._load()
+                handle = self._open(name)
+                if handle is not None:
+                    self.hits += 1
+                    return handle
+                done = self._rendering.get(name)
+                if done is None:
+                    done = self._rendering[name] = threading.Event()
+                    self.misses += 1
+                    break
+            # Someone else is rendering it; take their file, or the render over if theirs failed
+            if not done.wait(max(0.0, deadline - time.monotonic())):
+                raise TimeoutError('Timed out waiting for an image variant to render')
+
+        try:
+            path = self._path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._render_slots:
+                handle, temp_path = tempfile.mkstemp(prefix='.', dir=os.path.dirname(path))
+                try:
+                    with os.fdopen(handle, 'wb') as target:
+                        render(target)
+                    os.replace(temp_path, path)
+                except BaseException:
+                    os.remove(temp_path)
+                    raise
+            result = open(path, 'rb')
+            with self._lock:
+                self._add(name, os.fstat(result.fileno()).st_size)
+            return result
+        finally:
+            with self._lock:
+                self._rendering.pop(name).set()
+
+
+def get_image_cache():
+    """The variant cache of the current app"""
+    return current_app.extensions['image_cache']
+
+
+def init_images(app):
+    """Configure the variant cache behind GET /api/content/<id>/image.
+
+    IMAGE_CACHE_FOLDER holds the rendered files (default: instance/image-cache)
+    and IMAGE_CACHE_SIZE_MB bounds their total size.
+    """
+    app.config.setdefault('IMAGE_CACHE_FOLDER', os.environ.get(
+        'IMAGE_CACHE_FOLDER', os.path.join(app.instance_path, 'image-cache')
+    ))
+    app.config.setdefault('IMAGE_CACHE_SIZE_MB', int(os.environ.get('IMAGE_CACHE_SIZE_MB', 1024)))
+    app.config.setdefault('IMAGE_RENDER_CONCURRENCY', int(os.environ.get('IMAGE_RENDER_CONCURRENCY', os.cpu_count() or 2)))
+    app.extensions['image_cache'] = VariantCache(
+        app.config['IMAGE_CACHE_FOLDER'],
+        app.config['IMAGE_CACHE_SIZE_MB'] * 1024 * 1024,
+        render_limit=app.config['IMAGE_RENDER_CONCURRENCY']
+    )
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from src.models.user import User
+from src.models.content import Content, db
+from src.models.category import Category
+from src.models.type import Type
+from src.models.brand import Brand
+from src.models.image_hash import ImageHash
+from src.models.ids import derived_id
+from src.routes.content import ALLOWED_EXTENSIONS
+from src.utils.media_metadata import extract_metadata
+from src.utils.perceptual_hash import dhash
+from src.utils.storage import get_storage, shard_key
+
+# What the leading folder levels under the root stand for; deeper folders become tags
+LAYOUTS = {
+    'category': ('category',),
+    'category/type': ('category', 'type'),
+    'category/brand': ('category', 'brand'),
+    'category/type/brand': ('category', 'type', 'brand')
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _inspect(path):
+    """Worker: content hash, sniffed metadata and perceptual hash of one file"""
+    try:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        metadata = extract_metadata(path)
+        image_hash = None
+        if metadata['mime_type'].startswith('image/'):
+            try:
+                image_hash = dhash(path)
+            except Exception:
+                pass  # Not decodable (or a decompression bomb); ingested without a perceptual hash
+        return {'sha256': digest.hexdigest(), 'metadata': metadata, 'image_hash': image_hash}
+    except Exception as e:
+        # Recorded as failed in the manifest and retried on the next run, instead of ending this one
+        return {'error': f'{type(e).__name__}: {e}'}
+
+
+def scan_directory(root):
+    """Yield (relative_path, size, mtime_ns) of every allowed file under root, in a stable order"""
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if not name.startswith('.'))
+        for filename in sorted(filenames):
+            extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+            if filename.startswith('.') or extension not in ALLOWED_EXTENSIONS:
+                continue
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            yield os.path.relpath(path, root).replace(os.sep, '/'), stat.st_size, stat.st_mtime_ns
+
+
+class Ingest:
+    """Loads a directory tree into the library in batches, resumable through a manifest.
+
+    Every processed file gets a manifest line once its batch is committed. Row
+    ids are derived from the file's path, size and mtime, so a file whose
+    batch was committed just before an interruption is recognised on resume
+    even if its manifest line was never written.
+    """
+
+    def __init__(self, root, layout, manifest_path, uploaded_by, default_category=None, workers=None):
+        self.root = os.path.abspath(root)
+        self.levels = LAYOUTS[layout]
+        self.manifest_path = manifest_path
+        self.uploaded_by = uploaded_by
+        self.default_category = default_category
+        self.workers = workers or os.cpu_count()
+        self.storage = get_storage()
+        self.taxonomy = {}
+        self.stats = {'ingested': 0, 'duplicates': 0, 'invalid': 0, 'bytes': 0}
+
+    def load_manifest(self):
+        """(done file keys, sha256 -> content id) from a previous run"""
+        done, hashes = set(), {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if 'error' not in entry:  # Failed files are tried again
+                        done.add((entry['path'], entry['size'], entry['mtime_ns']))
+                    if entry.get('sha256') and entry.get('id'):
+                        hashes[entry['sha256']] = entry['id']
+        return done, hashes
+
+    def content_id(self, path, size, mtime_ns):
+        """Deterministic for resuming, and ordered by the file's mtime so inserts stay near the index end"""
+        return derived_id(mtime_ns // 1_000_000, f'zamzam-ingest:{self.root}:{path}:{size}:{mtime_ns}')
+
+    def _taxonomy_id(self, level, name, category_id=None):
+        cache_key = (level, category_id, name)
+        if cache_key not in self.taxonomy:
+            if level == 'category':
+                item = Category.query.filter_by(name=name).first() or Category(name=name)
+            elif level == 'type':
+                item = Type.query.filter_by(name=name, category_id=category_id).first() or Type(name=name, category_id=category_id)
+            else:
+                item = Brand.query.filter_by(name=name).first() or Brand(name=name)
+            db.session.add(item)
+            db.session.flush()
+            self.taxonomy[cache_key] = item.id
+        return self.taxonomy[cache_key]
+
+    def classify(self, path):
+        """(category_id, type_id, brand_id, tags) from the folders of path"""
+        folders = path.split('/')[:-1]
+        names = dict(zip(self.levels, folders))
+        tags = folders[len(self.levels):]
+
+        category_name = names.get('category', self.default_category)
+        if category_name is None:
+            raise ValueError('no category folder (use --category for files at the top level)')
+        category_id = self._taxonomy_id('category', category_name)
+        type_id = self._taxonomy_id('type', names['type'], category_id) if 'type' in names else None
+        brand_id = self._taxonomy_id('brand', names['brand']) if 'brand' in names else None
+        return category_id, type_id, brand_id, tags
+
+    def process_batch(self, batch, inspections, hashes, manifest):
+        """Copy the new files of a batch into storage, commit their rows, then record them"""
+        entries, rows = [], []
+        existing = {
+            content_id for (content_id,) in
+            db.session.query(Content.id).filter(Content.id.in_([self.content_id(*item) for item in batch]))
+        }
+
+        for (path, size, mtime_ns), inspection in zip(batch, inspections):
+            entry = {'path': path, 'size': size, 'mtime_ns': mtime_ns}
+            entries.append(entry)
+            content_id = self.content_id(path, size, mtime_ns)
+            try:
+                if 'error' in inspection:
+                    raise ValueError(inspection['error'])
+                metadata = inspection['metadata']
+                content_type = metadata['mime_type'].split('/')[0]
+                if content_type not in ('image', 'video'):
+                    raise ValueError(f'not an image or video ({metadata["mime_type"]})')
+                category_id, type_id, brand_id, tags = self.classify(path)
+            except ValueError as e:
+                entry['error'] = str(e)
+                self.stats['invalid'] += 1
+                continue
+
+            entry['sha256'] = inspection['sha256']
+            if content_id in existing:
+                entry['id'] = hashes[inspection['sha256']] = content_id
+                continue  # Committed before an interruption
+            if inspection['sha256'] in hashes:
+                entry['duplicate_of'] = hashes[inspection['sha256']]
+                self.stats['duplicates'] += 1
+                continue
+            entry['id'] = hashes[inspection['sha256']] = content_id
+
+            filename = path.rsplit('/', 1)[-1]
+            key = shard_key(f'{content_id}.{filename.rsplit(".", 1)[1].lower()}')
+            file_url = self.storage.url(key)
+            content = Content(
+                title=filename.rsplit('.', 1)[0],
+                file_url=file_url,
+                thumbnail_url=file_url if content_type == 'image' else None,
+                content_type=content_type,
+                category_id=category_id,
+                type_id=type_id,
+                brand_id=brand_id,
+                uploaded_by=self.uploaded_by,
+                tags=tags
+            )
+            content.id = content_id
+            content.apply_media_metadata(metadata)
+            if inspection['image_hash'] is not None:
+                content.image_hash = ImageHash(inspection['image_hash'])
+            rows.append((content, os.path.join(self.root, path), key))
+
+        # Copies are I/O bound, so threads overlap them; files land before their rows commit
+        with ThreadPoolExecutor(max_workers=self.workers) as copier:
+            list(copier.map(lambda row: self.storage.save_file(row[1], row[2]), rows))
+        db.session.add_all(content for content, _, _ in rows)
+        db.session.commit()
+
+        self.stats['ingested'] += len(rows)
+        self.stats['bytes'] += sum(size for _, size, _ in batch)
+        for entry in entries:
+            manifest.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        manifest.flush()
+
+    def run(self, batch_size, echo):
+        done, hashes = self.load_manifest()
+        pending = [item for item in scan_directory(self.root) if item not in done]
+        echo(f'{len(pending)} ملف للاستيراد ({len(done)} تم سابقاً)')
+
+        started = time.monotonic()
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path, 'a', encoding='utf-8') as manifest, \
+                ProcessPoolExecutor(max_workers=self.workers) as executor:
+            processed = 0
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                paths = [os.path.join(self.root, path) for path, _, _ in batch]
+                inspections = list(executor.map(_inspect, paths, chunksize=8))
+                self.process_batch(batch, inspections, hashes, manifest)
+
+                processed += len(batch)
+                elapsed = time.monotonic() - started
+                echo(f'{processed}/{len(pending)} ملف، {processed / elapsed:.1f} ملف/ث، '
+                     f'{self.stats["bytes"] / elapsed / (1024 * 1024):.1f} MB/ث، '
+                     f'{self.stats["duplicates"]} مكرر، {self.stats["invalid"]} غير صالح')
+        return self.stats
+
+
+@click.command('ingest-media')
+@click.argument('root', type=click.Path(exists=True, file_okay=False))
+@click.option('--layout', type=click.Choice(list(LAYOUTS)), default='category/type', show_default=True,
+              help='What the folder levels under ROOT stand for')
+@click.option('--category', 'default_category', help='Category for files not inside a category folder')
+@click.option('--uploaded-by', 'username', help='Username recorded as uploader (default: first admin)')
+@click.option('--manifest', type=click.Path(dir_okay=False), help='Progress file (default: under instance/ingest)')
+@click.option('--workers', default=None, type=int, help='Hashing processes and copy threads (default: CPU count)')
+@click.option('--batch-size', default=500, show_default=True, help='Files per transaction')
+@with_appcontext
+def ingest_media_command(root, layout, default_category, username, manifest, workers, batch_size):
+    """Import a directory of photos and videos, mapping folders to the taxonomy.
+
+    Re-running with the same ROOT resumes where an interrupted run stopped.
+    """
+    user = User.query.filter_by(username=username).first() if username else \
+        User.query.filter_by(role='admin').order_by(User.created_at).first()
+    if user is None:
+        raise click.ClickException(f'User {username or "(admin)"} not found')
+    if manifest is None:
+        name = hashlib.md5(os.path.abspath(root).encode('utf-8')).hexdigest()[:12]
+        manifest = os.path.join(current_app.instance_path, 'ingest', f'{name}.jsonl')
+
+    ingest = Ingest(root, layout, manifest, user.id, default_category, workers)
+    started = time.monotonic()
+    stats = ingest.run(batch_size, click.echo)
+    click.echo(f'تم استيراد {stats["ingested"]} ملف ({stats["bytes"] / (1024 * 1024):.1f} MB) '
+               f'في {time.monotonic() - started:.1f} ثانية؛ السجل في {manifest}')
@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from src.models.content import Content, db
+from src.models.image_hash import ImageHash
+from src.models.job import Job
+from src.utils.perceptual_hash import DEFAULT_MAX_DISTANCE, dhash
+from src.utils.storage import resolve_url
+
+# Finished jobs are kept this long for status polling, then pruned by the worker
+JOB_RETENTION = timedelta(days=7)
+PRUNE_INTERVAL = 60 * 60
+
+# kind -> function(payload) returning a JSON-serializable result
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register the decorated function as the handler for jobs of kind"""
+    def register(function):
+        JOB_HANDLERS[kind] = function
+        return function
+    return register
+
+
+@job_handler('process-media')
+def process_media(payload):
+    """Perceptual hash of an uploaded image, and the near duplicates it has"""
+    content = db.session.get(Content, payload['content_id'])
+    if content is None or content.content_type != 'image':
+        return None
+
+    if content.image_hash is None:
+        backend, key = resolve_url(content.file_url)
+        if backend is None:
+            return None
+        with backend.local_file(key) as path:
+            try:
+                value = dhash(path)
+            except Exception:
+                return None  # Not decodable (corrupt, truncated or a decompression bomb); the file is still stored
+        content.image_hash = ImageHash(value)
+        db.session.commit()
+
+    matches = ImageHash.find_near_duplicates(content.image_hash.hash, DEFAULT_MAX_DISTANCE, exclude_id=content.id)
+    return {'near_duplicates': [{'id': content_id, 'distance': distance} for content_id, distance in matches]}
+
+
+@job_handler('delete-files')
+def delete_files(payload):
+    """Remove the stored files of deleted content"""
+    deleted = 0
+    for url in payload['urls']:
+        backend, key = resolve_url(url)
+        if backend:
+            backend.delete(key)
+            deleted += 1
+    return {'deleted': deleted}
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome"""
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler for job kind {job.kind!r}')
+        if job.attempts > job.max_attempts:
+            raise RuntimeError('Lease expired during the last attempt')
+        job.finish(handler(job.get_payload()))
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning('Job %s (%s) failed on attempt %d', job.id, job.kind, job.attempts, exc_info=e)
+        job.fail(f'{type(e).__name__}: {e}')
+    db.session.commit()
+
+
+def prune_jobs():
+    """Delete finished jobs older than JOB_RETENTION; dead jobs are kept for inspection"""
+    cutoff = datetime.utcnow() - JOB_RETENTION
+    pruned = Job.query.filter(Job.status == 'done', Job.finished_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return pruned
+
+
+def work(app, name, lease_seconds, poll_interval, stop, once=False):
+    """Worker process: claim and run jobs until stop is set"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent sets stop; finish the current job first
+    with app.app_context():
+        db.engine.dispose(close=False)  # Do not reuse connections inherited from the parent
+        while not stop.is_set():
+            job = Job.claim(name, lease_seconds)
+            if job is None:
+                if once:
+                    break
+                stop.wait(poll_interval)
+                continue
+            run_job(job)
+        db.session.remove()
+
+
+@click.command('run-jobs')
+@click.option('--processes', default=2, show_default=True, help='Worker processes')
+@click.option('--lease', 'lease_seconds', default=600, show_default=True,
+              help='Seconds a job may run before another worker may take it over')
+@click.option('--poll-interval', default=1.0, show_default=True, help='Seconds between polls when idle')
+@click.option('--once', is_flag=True, help='Exit when the queue is empty')
+@with_appcontext
+def run_jobs_command(processes, lease_seconds, poll_interval, once):
+    """Run background jobs in a pool of worker processes."""
+    app = current_app._get_current_object()
+    stop = multiprocessing.Event()
+    prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+    def start(index):
+        process = multiprocessing.Process(
+            target=work, args=(app, f'{prefix}/{index}', lease_seconds, poll_interval, stop, once)
+        )
+        process.start()
+        return process
+
+    def shutdown(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    db.session.remove()
+    db.engine.dispose()
+    workers = [start(index) for index in range(processes)]
+    click.echo(f'{processes} عامل يعمل على المهام')
+
+    last_prune = 0.0
+    while any(worker.is_alive() for worker in workers):
+        if not stop.is_set() and time.monotonic() - last_prune > PRUNE_INTERVAL:
+            prune_jobs()
+            last_prune = time.monotonic()
+        for index, worker in enumerate(workers):
+            worker.join(timeout=poll_interval / len(workers))
+            # Replace workers that crashed; the lease returns their job to the queue
+            if not worker.is_alive() and worker.exitcode != 0 and not stop.is_set() and not once:
+                click.echo(f'العامل {index} توقف برمز {worker.exitcode}، إعادة التشغيل')
+                workers[index] = start(index)
+
+
+@click.command('requeue-jobs')
+@click.option('--kind', help='Only jobs of this kind')
+@with_appcontext
+def requeue_jobs_command(kind):
+    """Give dead-lettered jobs a fresh set of attempts."""
+    query = Job.query.filter(Job.status == 'dead')
+    if kind:
+        query = query.filter(Job.kind == kind)
+    requeued = query.update({
+        'status': 'queued',
+        'attempts': 0,
+        'run_at': datetime.utcnow(),
+        'finished_at': None
+    }, synchronize_session=False)
+    db.session.commit()
+    click.echo(f'تمت إعادة {requeued} مهمة إلى الطابور')
@@ -0,0 +1,333 @@
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+
+from src.models.content import Content, db
+from src.utils.storage import resolve_url
+
+# Largest moov atom we are willing to read (it holds only the index, not media)
+MAX_MOOV_SIZE = 32 * 1024 * 1024
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+EXIF_ORIENTATION = 0x0112
+EXIF_MAKE = 0x010F
+EXIF_MODEL = 0x0110
+EXIF_DATETIME = 0x0132
+EXIF_IFD_POINTER = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+
+QUICKTIME_EPOCH = datetime(1904, 1, 1)
+# Creation times outside this range are unset or corrupt clocks
+QUICKTIME_MIN_CREATED = int((datetime(1970, 1, 1) - QUICKTIME_EPOCH).total_seconds())
+QUICKTIME_MAX_CREATED = int((datetime(9999, 12, 31) - QUICKTIME_EPOCH).total_seconds())
+
+
+def extract_metadata(path):
+    """Read media metadata from the file headers only, never decoding pixels.
+
+    Returns a dict with mime_type, file_size and, when found, width, height,
+    orientation, captured_at, camera_make, camera_model and duration.
+    """
+    metadata = {'file_size': os.path.getsize(path)}
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        f.seek(0)
+        try:
+            if head.startswith(b'\xff\xd8\xff'):
+                metadata['mime_type'] = 'image/jpeg'
+                metadata.update(_parse_jpeg(f))
+            elif head.startswith(b'\x89PNG\r\n\x1a\n'):
+                metadata['mime_type'] = 'image/png'
+                metadata['width'], metadata['height'] = struct.unpack('>II', head[16:24])
+            elif head[:6] in (b'GIF87a', b'GIF89a'):
+                metadata['mime_type'] = 'image/gif'
+                metadata['width'], metadata['height'] = struct.unpack('<HH', head[6:10])
+            elif head[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip'):
+                metadata['mime_type'] = 'video/quicktime' if head[8:10] == b'qt' else 'video/mp4'
+                metadata.update(_parse_quicktime(f, metadata['file_size']))
+            elif head.startswith(b'RIFF') and head[8:12] == b'AVI ':
+                metadata['mime_type'] = 'video/x-msvideo'
+                metadata.update(_parse_avi(f))
+            elif head.startswith(b'\x1a\x45\xdf\xa3'):
+                metadata['mime_type'] = 'video/webm'
+            else:
+                metadata['mime_type'] = 'application/octet-stream'
+        except (struct.error, ValueError, IndexError, OverflowError):
+            pass  # Truncated or unusual headers; keep what was found
+
+    if metadata.get('width') and metadata.get('height'):
+        if metadata['width'] > metadata['height']:
+            metadata['orientation'] = 'landscape'
+        elif metadata['width'] < metadata['height']:
+            metadata['orientation'] = 'portrait'
+        else:
+            metadata['orientation'] = 'square'
+    return metadata
+
+
+def _parse_jpeg(f):
+    """Walk JPEG segments up to the frame header, reading EXIF on the way"""
+    result = {}
+    exif_orientation = 1
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            break
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, os.SEEK_CUR)  # fill byte
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):
+            break  # end of image or start of scan: no more headers
+
+        length = struct.unpack('>H', f.read(2))[0]
+        segment_start = f.tell()
+        if code == 0xE1 and length > 8:
+            data = f.read(length - 2)
+            if data.startswith(b'Exif\x00\x00'):
+                exif = _parse_exif(data[6:])
+                exif_orientation = exif.pop('exif_orientation', 1)
+                result.update(exif)
+        elif code in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>xHH', f.read(5))
+            # EXIF orientations 5-8 are rotated by 90 degrees when displayed
+            if exif_orientation in (5, 6, 7, 8):
+                width, height = height, width
+            result['width'], result['height'] = width, height
+            break
+        f.seek(segment_start + length - 2)
+    return result
+
+
+def _parse_exif(tiff):
+    """Read orientation, camera and capture date from a TIFF/EXIF block"""
+    endian = '<' if tiff[:2] == b'II' else '>'
+
+    def read_ifd(offset):
+        entries = {}
+        count = struct.unpack(endian + 'H', tiff[offset:offset + 2])[0]
+        for i in range(count):
+            entry = offset + 2 + i * 12
+            tag, kind, size = struct.unpack(endian + 'HHI', tiff[entry:entry + 8])
+            value = tiff[entry + 8:entry + 12]
+            if kind == 2:  # ASCII
+                if size > 4:
+                    start = struct.unpack(endian + 'I', value)[0]
+                    value = tiff[start:start + size]
+                entries[tag] = value[:size].split(b'\x00', 1)[0].decode('utf-8', 'replace').strip()
+            elif kind == 3:  # SHORT
+                entries[tag] = struct.unpack(endian + 'H', value[:2])[0]
+            elif kind == 4:  # LONG
+                entries[tag] = struct.unpack(endian + 'I', value)[0]
+        return entries
+
+    ifd0 = read_ifd(struct.unpack(endian + 'I', tiff[4:8])[0])
+    exif_ifd = read_ifd(ifd0[EXIF_IFD_POINTER]) if EXIF_IFD_POINTER in ifd0 else {}
+
+    result = {'exif_orientation': ifd0.get(EXIF_ORIENTATION, 1)}
+    if ifd0.get(EXIF_MAKE):
+        result['camera_make'] = ifd0[EXIF_MAKE]
+    if ifd0.get(EXIF_MODEL):
+        result['camera_model'] = ifd0[EXIF_MODEL]
+    taken = exif_ifd.get(EXIF_DATETIME_ORIGINAL) or ifd0.get(EXIF_DATETIME)
+    if taken:
+        try:
+            result['captured_at'] = datetime.strptime(taken, '%Y:%m:%d %H:%M:%S')
+        except ValueError:
+            pass
+    return result
+
+
+def _iter_atoms(data, start=0, end=None):
+    """Yield (type, payload_start, payload_end) for the atoms in data[start:end]"""
+    end = len(data) if end is None else end
+    position = start
+    while position + 8 <= end:
+        size, kind = struct.unpack('>I4s', data[position:position + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[position + 8:position + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header:
+            break
+        yield kind, position + header, min(position + size, end)
+        position += size
+
+
+def _parse_quicktime(f, file_size):
+    """Find the moov atom by seeking over top-level atoms and parse it"""
+    position = 0
+    moov = None
+    while position + 8 <= file_size:
+        f.seek(position)
+        header = f.read(16)
+        size, kind = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - position
+        if size < header_size:
+            break
+        if kind == b'moov':
+            if size > MAX_MOOV_SIZE:
+                break
+            f.seek(position + header_size)
+            moov = f.read(size - header_size)
+            break
+        position += size
+
+    if moov is None:
+        return {}
+
+    result = {}
+    for kind, start, end in _iter_atoms(moov):
+        if kind == b'mvhd':
+            version = moov[start]
+            if version == 1:
+                created, _, timescale, duration = struct.unpack('>QQIQ', moov[start + 4:start + 32])
+            else:
+                created, _, timescale, duration = struct.unpack('>IIII', moov[start + 4:start + 20])
+            if timescale:
+                result['duration'] = round(duration / timescale, 3)
+            if QUICKTIME_MIN_CREATED <= created <= QUICKTIME_MAX_CREATED:
+                result['captured_at'] = QUICKTIME_EPOCH + timedelta(seconds=created)
+        elif kind == b'trak' and 'width' not in result:
+            dimensions = _parse_track(moov, start, end)
+            if dimensions:
+                result['width'], result['height'] = dimensions
+        elif kind in (b'udta', b'meta'):
+            result.update(_parse_quicktime_tags(moov, start, end, kind))
+    return result
+
+
+def _parse_track(moov, start, end):
+    """Return the displayed (width, height) of a video track, or None"""
+    dimensions = None
+    is_video = False
+    for kind, child_start, child_end in _iter_atoms(moov, start, end):
+        if kind == b'tkhd':
+            version = moov[child_start]
+            matrix_offset = child_start + (52 if version == 1 else 40)
+            matrix = struct.unpack('>9i', moov[matrix_offset:matrix_offset + 36])
+            width, height = struct.unpack('>II', moov[matrix_offset + 36:matrix_offset + 44])
+            width, height = width >> 16, height >> 16
+            # A 90/270 degree rotation matrix has zero a and d coefficients
+            if matrix[0] == 0 and matrix[4] == 0:
+                width, height = height, width
+            if width and height:
+                dimensions = (width, height)
+        elif kind == b'mdia':
+            for mdia_kind, mdia_start, _ in _iter_atoms(moov, child_start, child_end):
+                if mdia_kind == b'hdlr' and moov[mdia_start + 8:mdia_start + 12] == b'vide':
+                    is_video = True
+    return dimensions if is_video else None
+
+
+def _parse_quicktime_tags(moov, start, end, kind):
+    """Read make/model from udta (©mak/©mod) or Apple mdta keys in meta"""
+    result = {}
+    if kind == b'udta':
+        for tag, tag_start, tag_end in _iter_atoms(moov, start, end):
+            if tag in (b'\xa9mak', b'\xa9mod') and tag_end - tag_start > 4:
+                length = struct.unpack('>H', moov[tag_start:tag_start + 2])[0]
+                text = moov[tag_start + 4:tag_start + 4 + length].decode('utf-8', 'replace').strip()
+                result['camera_make' if tag == b'\xa9mak' else 'camera_model'] = text
+        return result
+
+    # ISO meta atoms carry version/flags before their children, QuickTime ones do not
+    if moov[start + 8:start + 12] == b'hdlr':
+        start += 4
+
+    keys = []
+    values = {}
+    for child, child_start, child_end in _iter_atoms(moov, start, end):
+        if child == b'keys':
+            for key_kind, key_start, key_end in _iter_atoms(moov, child_start + 8, child_end):
+                keys.append(moov[key_start:key_end].decode('utf-8', 'replace'))
+        elif child == b'ilst':
+            for index, item_start, item_end in _iter_atoms(moov, child_start, child_end):
+                for data_kind, data_start, data_end in _iter_atoms(moov, item_start, item_end):
+                    if data_kind == b'data':
+                        number = struct.unpack('>I', index)[0]
+                        values[number] = moov[data_start + 8:data_end].decode('utf-8', 'replace').strip()
+
+    for number, key in enumerate(keys, start=1):
+        if number not in values:
+            continue
+        if key == 'com.apple.quicktime.make':
+            result['camera_make'] = values[number]
+        elif key == 'com.apple.quicktime.model':
+            result['camera_model'] = values[number]
+        elif key == 'com.apple.quicktime.creationdate':
+            try:
+                taken = datetime.fromisoformat(values[number])
+                result['captured_at'] = taken.replace(tzinfo=None) - (taken.utcoffset() or timedelta(0))
+            except (ValueError, OverflowError):
+                pass
+    return result
+
+
+def _parse_avi(f):
+    """Read the frame size from the AVI main header"""
+    f.seek(12)
+    header = f.read(60)
+    if header[0:4] != b'LIST' or header[8:12] != b'hdrl' or header[12:16] != b'avih':
+        return {}
+    width, height = struct.unpack('<II', header[52:60])
+    return {'width': width, 'height': height}
+
+
+def backfill_metadata(batch_size=500, workers=8, refresh=False):
+    """Fill the media columns of existing content. Returns the count updated."""
+    updated = 0
+    last_id = ''
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            query = Content.query.filter(Content.id > last_id)
+            if not refresh:
+                query = query.filter(Content.mime_type.is_(None))
+            batch = query.order_by(Content.id).limit(batch_size).all()
+            if not batch:
+                break
+
+            def read(location):
+                backend, key = location
+                if backend is None:
+                    return None
+                try:
+                    with backend.local_file(key) as path:
+                        return extract_metadata(path)
+                except OSError:
+                    return None
+
+            # Resolved here: the reader threads have no app context
+            locations = [resolve_url(item.file_url) for item in batch]
+            for item, metadata in zip(batch, executor.map(read, locations)):
+                if metadata is not None:
+                    item.apply_media_metadata(metadata)
+                    updated += 1
+            last_id = batch[-1].id
+            db.session.commit()
+    return updated
+
+
+@click.command('extract-metadata')
+@click.option('--refresh', is_flag=True, help='Re-read files that already have metadata')
+@click.option('--workers', default=8, show_default=True, help='Parallel file readers')
+@with_appcontext
+def extract_metadata_command(refresh, workers):
+    """Read dimensions, dates and camera details from media headers."""
+    updated = backfill_metadata(workers=workers, refresh=refresh)
+    click.echo(f'تم تحديث بيانات {updated} ملف')
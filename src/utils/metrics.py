@@ -0,0 +1,271 @@
+import cProfile
+import hmac
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from src.utils.cache import CACHES
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}'
+
+
+class Gauge:
+    """Current value with labels"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}'
+
+
+class Histogram:
+    """Cumulative histogram with labels, in the Prometheus layout"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            counts, total = self._values.get(label_values, (None, 0))
+            if counts is None:
+                counts = [0] * len(self.buckets)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[label_values] = (counts, total + value)
+
+    def collect(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for label_values, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, ('le', _format_number(bound)))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_number(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+REQUESTS = Counter('zamzam_requests_total', 'HTTP requests by endpoint and status',
+                   ('endpoint', 'method', 'status'))
+REQUEST_DURATION = Histogram('zamzam_request_duration_seconds', 'Request duration',
+                             ('endpoint', 'method'))
+REQUEST_SQL_STATEMENTS = Histogram('zamzam_request_sql_statements', 'SQL statements per request',
+                                   ('endpoint',), SQL_COUNT_BUCKETS)
+REQUEST_SQL_DURATION = Histogram('zamzam_request_sql_seconds', 'Time spent in SQL per request',
+                                 ('endpoint',))
+RESPONSE_SIZE = Histogram('zamzam_response_size_bytes', 'Response body size (after compression)',
+                          ('endpoint',), SIZE_BUCKETS)
+SLOW_QUERIES = Counter('zamzam_slow_queries_total', 'SQL statements slower than SLOW_QUERY_THRESHOLD',
+                       ('endpoint',))
+EXCEPTIONS = Counter('zamzam_exceptions_total', 'Exceptions caught by route handlers',
+                     ('endpoint', 'exception'))
+ADMISSION_IN_FLIGHT = Gauge('zamzam_admission_in_flight', 'Requests holding an admission slot', ('pool',))
+ADMISSION_QUEUED = Gauge('zamzam_admission_queued', 'Requests waiting for an admission slot', ('pool',))
+ADMISSION_REJECTIONS = Counter('zamzam_admission_rejections_total', 'Requests turned away by admission control',
+                               ('pool', 'reason'))
+
+METRICS = [REQUESTS, REQUEST_DURATION, REQUEST_SQL_STATEMENTS, REQUEST_SQL_DURATION,
+           RESPONSE_SIZE, SLOW_QUERIES, EXCEPTIONS, ADMISSION_IN_FLIGHT, ADMISSION_QUEUED,
+           ADMISSION_REJECTIONS]
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def report_exception(error):
+    """Log an exception a route turned into an error response, and count it"""
+    endpoint = _endpoint() if has_request_context() else 'none'
+    EXCEPTIONS.inc(endpoint, type(error).__name__)
+    current_app.logger.error('Error in %s', endpoint, exc_info=error)
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.collect())
+
+    # Cache counters are read from the caches themselves at scrape time
+    for name, kind, documentation, read in (
+        ('zamzam_cache_hits_total', 'counter', 'Cache hits', lambda cache: cache.hits),
+        ('zamzam_cache_misses_total', 'counter', 'Cache misses', lambda cache: cache.misses),
+        ('zamzam_cache_entries', 'gauge', 'Entries currently cached', len),
+    ):
+        lines.append(f'# HELP {name} {documentation}')
+        lines.append(f'# TYPE {name} {kind}')
+        for cache_name, cache in sorted(CACHES.items()):
+            lines.append(f'{name}{{cache="{_escape(cache_name)}"}} {read(cache)}')
+    return '\n'.join(lines) + '\n'
+
+
+# Clients allowed to read /metrics when no METRICS_TOKEN is configured
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+
+def _token_matches(supplied, token):
+    return hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8'))
+
+
+def init_metrics(app):
+    """Record per-request timings, SQL usage and response sizes, and serve /metrics.
+
+    Call before init_compression so response sizes are measured after compression.
+    """
+    app.config.setdefault('SLOW_QUERY_THRESHOLD', float(os.environ.get('SLOW_QUERY_THRESHOLD', 0.25)))
+    app.config.setdefault('PROFILER_TOKEN', os.environ.get('PROFILER_TOKEN'))
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('METRICS_TOKEN'))
+    app.config.setdefault('PROFILE_FOLDER', os.path.join(app.instance_path, 'profiles'))
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        if not has_request_context() or 'sql_statements' not in g:
+            return
+        g.sql_statements += 1
+        g.sql_duration += elapsed
+        if elapsed >= app.config['SLOW_QUERY_THRESHOLD']:
+            SLOW_QUERIES.inc(_endpoint())
+            app.logger.warning('Slow query (%.3fs) in %s: %s %r',
+                               elapsed, _endpoint(), ' '.join(statement.split()), parameters)
+
+    @event.listens_for(Engine, 'handle_error')
+    def discard_query_timer(exception_context):
+        if exception_context.connection is not None:
+            timers = exception_context.connection.info.get('query_start')
+            if timers:
+                timers.pop()
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_duration = 0.0
+
+        # Opt-in profiling: send X-Profile with the configured token
+        token = app.config['PROFILER_TOKEN']
+        if token and _token_matches(request.headers.get('X-Profile', ''), token):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request(response):
+        if 'request_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_start
+        endpoint = _endpoint()
+
+        REQUESTS.inc(endpoint, request.method, str(response.status_code))
+        REQUEST_DURATION.observe(elapsed, endpoint, request.method)
+        REQUEST_SQL_STATEMENTS.observe(g.sql_statements, endpoint)
+        REQUEST_SQL_DURATION.observe(g.sql_duration, endpoint)
+        if response.content_length is not None:
+            RESPONSE_SIZE.observe(response.content_length, endpoint)
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(app.config['PROFILE_FOLDER'], exist_ok=True)
+            filename = f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{endpoint}.prof'
+            profiler.dump_stats(os.path.join(app.config['PROFILE_FOLDER'], filename))
+            response.headers['X-Profile-File'] = filename
+            response.headers['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={g.sql_duration * 1000:.1f};desc="{g.sql_statements} queries"'
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus metrics for this process.
+
+        With METRICS_TOKEN set, scrapers send it as a bearer token; without
+        one, only requests from this host are answered.
+        """
+        token = app.config['METRICS_TOKEN']
+        if token:
+            if not _token_matches(request.headers.get('Authorization', '').removeprefix('Bearer '), token):
+                abort(401)
+        elif request.remote_addr not in LOCAL_ADDRESSES:
+            abort(403)
+        return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
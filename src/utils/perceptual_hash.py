@@ -0,0 +1,98 @@
+from itertools import combinations
+
+from PIL import Image
+
+# 64-bit hashes are split into four 16-bit bands for multi-index hashing:
+# two hashes within distance d share at least one band within d // 4 bits.
+HASH_BITS = 64
+BAND_COUNT = 4
+BAND_BITS = HASH_BITS // BAND_COUNT
+BAND_MASK = (1 << BAND_BITS) - 1
+
+DEFAULT_MAX_DISTANCE = 6
+MAX_DISTANCE_LIMIT = 11
+
+
+def dhash(path, size=8):
+    """Return the 64-bit difference hash of an image file.
+
+    JPEGs are decoded at reduced scale through draft mode, so even large
+    photos are cheap to hash.
+    """
+    with Image.open(path) as image:
+        image.draft('L', (size * 8, size * 8))
+        image = image.convert('L').resize((size + 1, size), Image.Resampling.LANCZOS)
+        pixels = list(image.getdata())
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for column in range(size):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return value
+
+
+def to_signed(value):
+    """Map an unsigned 64-bit hash to the signed range SQLite integers hold"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value):
+    """Inverse of to_signed"""
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(to_unsigned(a) ^ to_unsigned(b)).count('1')
+
+
+def split_bands(value):
+    """Split a hash into BAND_COUNT integers, most significant first"""
+    value = to_unsigned(value)
+    return [
+        (value >> (BAND_BITS * (BAND_COUNT - 1 - band))) & BAND_MASK
+        for band in range(BAND_COUNT)
+    ]
+
+
+def band_variants(band_value, max_distance):
+    """Every band value a near duplicate within max_distance may have in some band"""
+    radius = max_distance // BAND_COUNT
+    variants = [band_value]
+    for flipped in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), flipped):
+            variant = band_value
+            for bit in bits:
+                variant ^= 1 << bit
+            variants.append(variant)
+    return variants
+
+
+class HashIndex:
+    """In-memory multi-index hash table for batch near-duplicate search"""
+
+    def __init__(self):
+        self.hashes = []
+        self.bands = [{} for _ in range(BAND_COUNT)]
+
+    def add(self, value):
+        """Add a hash and return its position"""
+        position = len(self.hashes)
+        self.hashes.append(value)
+        for band, band_value in enumerate(split_bands(value)):
+            self.bands[band].setdefault(band_value, []).append(position)
+        return position
+
+    def search(self, value, max_distance):
+        """Yield (position, distance) of indexed hashes within max_distance"""
+        seen = set()
+        for band, band_value in enumerate(split_bands(value)):
+            for variant in band_variants(band_value, max_distance):
+                for position in self.bands[band].get(variant, ()):
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    distance = hamming(value, self.hashes[position])
+                    if distance <= max_distance:
+                        yield position, distance
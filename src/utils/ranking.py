@@ -0,0 +1,57 @@
+import click
+from flask.cli import with_appcontext
+
+from src.models.analytics import ContentStatsBucket
+from src.models.content import Content, UPLOAD_WEIGHT, VIEW_WEIGHT, LIKE_WEIGHT, db
+
+
+def rebuild_rankings(batch_size=1000):
+    """Recompute every ranking score from the analytics buckets.
+
+    Activity is placed at the start of its bucket; views and likes older than
+    the analytics store are placed at the upload date. Returns the number of
+    rows updated.
+    """
+    updated = 0
+    last_id = ''
+    while True:
+        # Keyset pagination keeps memory flat on large tables
+        batch = Content.query.filter(Content.id > last_id).order_by(Content.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        buckets = {}
+        rows = ContentStatsBucket.query.filter(ContentStatsBucket.content_id.in_([c.id for c in batch]))
+        for bucket in rows:
+            buckets.setdefault(bucket.content_id, []).append(bucket)
+
+        for content in batch:
+            content.trending_score = None
+            content.popular_score = None
+
+            bucketed_views = bucketed_likes = 0
+            for bucket in buckets.get(content.id, []):
+                bucketed_views += bucket.views
+                bucketed_likes += bucket.likes
+                weight = VIEW_WEIGHT * bucket.views + LIKE_WEIGHT * bucket.likes
+                if weight > 0:
+                    content.add_ranking_activity(weight, bucket.bucket_start)
+
+            untracked_views = max((content.views_count or 0) - bucketed_views, 0)
+            untracked_likes = max((content.likes_count or 0) - bucketed_likes, 0)
+            weight = UPLOAD_WEIGHT + VIEW_WEIGHT * untracked_views + LIKE_WEIGHT * untracked_likes
+            content.add_ranking_activity(weight, content.upload_date)
+
+        db.session.commit()
+        updated += len(batch)
+        last_id = batch[-1].id
+    return updated
+
+
+@click.command('update-rankings')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per transaction')
+@with_appcontext
+def update_rankings_command(batch_size):
+    """Recompute the trending and popular scores."""
+    updated = rebuild_rankings(batch_size)
+    click.echo(f'تم تحديث ترتيب {updated} عنصر')
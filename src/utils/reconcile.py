@@ -0,0 +1,128 @@
+import json
+import time
+
+import click
+from flask.cli import with_appcontext
+
+from src.models.content import Content, db
+from src.utils.storage import get_storage, resolve_url
+
+# Files younger than this may belong to an upload whose commit is still running
+DEFAULT_GRACE_PERIOD = 24 * 60 * 60
+
+# Paths and ids listed in a report; the counts cover everything
+REPORT_LIMIT = 1000
+
+
+def _referenced_urls(urls):
+    """The subset of urls referenced by any content row"""
+    referenced = set()
+    for file_url, thumbnail_url in db.session.query(Content.file_url, Content.thumbnail_url).filter(
+        db.or_(Content.file_url.in_(urls), Content.thumbnail_url.in_(urls))
+    ):
+        referenced.add(file_url)
+        referenced.add(thumbnail_url)
+    return referenced
+
+
+def find_orphans(storage, batch_size=500):
+    """Yield (key, size, mtime) for stored files that no content row references.
+
+    The listing is checked against the database one batch at a time, so memory
+    stays bounded however many files there are.
+    """
+    batch = []
+
+    def flush():
+        urls = [storage.url(key) for key, _, _ in batch]
+        referenced = _referenced_urls(urls)
+        for url, item in zip(urls, batch):
+            if url not in referenced:
+                yield item
+        batch.clear()
+
+    for item in storage.iter_files():
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+
+def find_dangling(batch_size=1000):
+    """Yield (content_id, missing_urls) for rows whose files are gone from storage"""
+    last_id = ''
+    while True:
+        rows = (
+            db.session.query(Content.id, Content.file_url, Content.thumbnail_url)
+            .filter(Content.id > last_id)
+            .order_by(Content.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        for content_id, file_url, thumbnail_url in rows:
+            missing = []
+            for url in dict.fromkeys((file_url, thumbnail_url)):
+                if not url:
+                    continue
+                backend, key = resolve_url(url)
+                if backend is None or not backend.exists(key):
+                    missing.append(url)
+            if missing:
+                yield content_id, missing
+        last_id = rows[-1][0]
+
+
+def reconcile_uploads(storage, grace_period=DEFAULT_GRACE_PERIOD, delete=False):
+    """Compare the stored files with the content table.
+
+    Orphaned files older than grace_period are removed when delete is set;
+    younger ones are only reported. Rows pointing at missing files are reported.
+    """
+    cutoff = time.time() - grace_period
+    report = {'orphan_count': 0, 'orphan_bytes': 0, 'recent_orphans': 0, 'deleted': 0,
+              'dangling_count': 0, 'orphans': [], 'dangling': []}
+
+    for key, size, mtime in find_orphans(storage):
+        if mtime > cutoff:
+            report['recent_orphans'] += 1
+            continue
+        report['orphan_count'] += 1
+        report['orphan_bytes'] += size
+        if len(report['orphans']) < REPORT_LIMIT:
+            report['orphans'].append(storage.url(key))
+        if delete:
+            storage.delete(key)
+            report['deleted'] += 1
+
+    for content_id, missing in find_dangling():
+        report['dangling_count'] += 1
+        if len(report['dangling']) < REPORT_LIMIT:
+            report['dangling'].append({'id': content_id, 'missing': missing})
+    return report
+
+
+@click.command('reconcile-uploads')
+@click.option('--grace-hours', default=DEFAULT_GRACE_PERIOD / 3600, show_default=True, type=float,
+              help='Leave orphaned files younger than this alone')
+@click.option('--delete', is_flag=True, help='Remove orphaned files (otherwise only report)')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='Write the report as JSON')
+@with_appcontext
+def reconcile_uploads_command(grace_hours, delete, output):
+    """Find stored files without content rows, and rows without files."""
+    report = reconcile_uploads(get_storage(), grace_period=grace_hours * 3600, delete=delete)
+
+    megabytes = report['orphan_bytes'] / (1024 * 1024)
+    click.echo(f'{report["orphan_count"]} ملف يتيم ({megabytes:.1f} MB)، '
+               f'{report["recent_orphans"]} ملف حديث ضمن فترة السماح')
+    if delete:
+        click.echo(f'تم حذف {report["deleted"]} ملف')
+    click.echo(f'{report["dangling_count"]} عنصر يشير إلى ملفات مفقودة')
+    for item in report['dangling'][:20]:
+        click.echo(f'  {item["id"]}: {", ".join(item["missing"])}')
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
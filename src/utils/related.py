@@ -0,0 +1,318 @@
+import json
+import math
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, select
+
+from src.models.content import Content, db
+from src.models.change import Change, FeedCursor
+from src.models.related import ContentTag, RelatedContent
+
+# Items kept in each precomputed list
+RELATED_LIMIT = 12
+
+# A shared tag adds its inverse document frequency, so rare tags weigh more than
+# common ones; a shared type, brand or category adds a fixed weight
+TYPE_WEIGHT = 2.0
+BRAND_WEIGHT = 1.5
+CATEGORY_WEIGHT = 1.0
+
+# Candidates read from each posting list (a tag, type, brand or category), newest first
+POSTING_LIMIT = 200
+
+# Longest tag indexed; longer ones are cut
+MAX_TAG_LENGTH = 100
+
+# The indexer's position in the change feed
+CURSOR_NAME = 'related-content'
+
+# Ids per IN (...) list, well below SQLite's variable limit
+CHUNK_SIZE = 500
+
+# Candidate rows kept in memory during a run
+ROW_MEMO_LIMIT = 50000
+
+ROW_COLUMNS = (Content.id, Content.category_id, Content.type_id, Content.brand_id, Content.tags,
+               Content.is_public, Content.popular_score)
+
+
+def normalize_tags(tags):
+    """The distinct tags of a content row's JSON tags column, as indexed"""
+    try:
+        values = json.loads(tags) if tags else []
+    except json.JSONDecodeError:
+        return set()
+    if not isinstance(values, list):
+        return set()
+    return {str(tag).strip().lower()[:MAX_TAG_LENGTH] for tag in values if str(tag).strip()}
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+class RelatedIndex:
+    """Scores related content through the inverted indexes and writes the top lists.
+
+    Candidates for an item come from the posting lists of its tags
+    (content_tags) and of its type, brand and category (the indexes on those
+    content columns); only they are scored, never the whole table. Posting
+    lists, tag frequencies and candidate rows are memoized for the lifetime
+    of the object, so use one per run.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.total = session.scalar(select(func.count()).select_from(Content).where(Content.is_public.is_(True)))
+        self._postings = {}
+        self._frequencies = {}
+        self._rows = {}
+
+    def rows(self, ids):
+        """{id: row} of the given content ids that still exist"""
+        rows = {}
+        for chunk in _chunks(ids):
+            statement = select(*ROW_COLUMNS).where(Content.id.in_(chunk))
+            rows.update((row.id, row) for row in self.session.execute(statement))
+        return rows
+
+    def _candidate_rows(self, ids):
+        """{id: (row, tags)} of candidates, memoized: a rebuild meets each row again in many lists"""
+        missing = [content_id for content_id in ids if content_id not in self._rows]
+        if missing:
+            if len(self._rows) + len(missing) > ROW_MEMO_LIMIT:
+                self._rows.clear()
+            for row in self.rows(missing).values():
+                self._rows[row.id] = (row, normalize_tags(row.tags))
+        return {content_id: self._rows[content_id] for content_id in ids if content_id in self._rows}
+
+    def index_tags(self, ids, rows):
+        """Replace the postings of ids with the tags of those in rows that are public"""
+        for chunk in _chunks(ids):
+            self.session.execute(delete(ContentTag).where(ContentTag.content_id.in_(chunk)))
+        postings = [
+            {'tag': tag, 'content_id': row.id}
+            for row in rows.values() if row.is_public for tag in normalize_tags(row.tags)
+        ]
+        if postings:
+            self.session.execute(insert(ContentTag), postings)
+        self._postings.clear()
+        self._frequencies.clear()
+        self._rows.clear()
+
+    def _posting(self, key, statement):
+        if key not in self._postings:
+            self._postings[key] = self.session.scalars(statement.limit(POSTING_LIMIT)).all()
+        return self._postings[key]
+
+    def candidates(self, row, tags):
+        """Ids sharing at least one tag, the type, the brand or the category with row"""
+        found = set()
+        for tag in tags:
+            found.update(self._posting(('tag', tag), select(ContentTag.content_id).where(
+                ContentTag.tag == tag
+            ).order_by(ContentTag.content_id.desc())))
+        for column in ('type_id', 'brand_id', 'category_id'):
+            value = getattr(row, column)
+            if value is not None:
+                # Secondary index entries end in the rowid, so this reads the index backwards without sorting
+                found.update(self._posting((column, value), select(Content.id).where(
+                    getattr(Content, column) == value, Content.is_public.is_(True)
+                ).order_by(db.literal_column('content.rowid').desc())))
+        found.discard(row.id)
+        return found
+
+    def idf(self, tags):
+        """{tag: inverse document frequency} for tags"""
+        missing = [tag for tag in tags if tag not in self._frequencies]
+        if missing:
+            counts = dict(self.session.execute(
+                select(ContentTag.tag, func.count()).where(ContentTag.tag.in_(missing)).group_by(ContentTag.tag)
+            ).all())
+            for tag in missing:
+                self._frequencies[tag] = math.log(1 + self.total / max(counts.get(tag, 0), 1))
+        return {tag: self._frequencies[tag] for tag in tags}
+
+    def score(self, row):
+        """[(score, popularity, id)] of every candidate for row, best first"""
+        if not row.is_public:
+            return []
+        tags = normalize_tags(row.tags)
+        candidates = self.candidates(row, tags)
+        if not candidates:
+            return []
+
+        weights = self.idf(tags) if tags else {}
+        scored = []
+        for candidate, candidate_tags in self._candidate_rows(candidates).values():
+            if not candidate.is_public:
+                continue
+            score = sum(weights[tag] for tag in tags & candidate_tags)
+            if row.type_id is not None and candidate.type_id == row.type_id:
+                score += TYPE_WEIGHT
+            if row.brand_id is not None and candidate.brand_id == row.brand_id:
+                score += BRAND_WEIGHT
+            if candidate.category_id == row.category_id:
+                score += CATEGORY_WEIGHT
+            if score > 0:
+                scored.append((round(score, 6), candidate.popular_score or 0.0, candidate.id))
+        scored.sort(reverse=True)
+        return scored
+
+    def write_lists(self, lists):
+        """Replace the lists of the given {content_id: [(score, popularity, id)]}"""
+        for chunk in _chunks(lists):
+            self.session.execute(delete(RelatedContent).where(RelatedContent.content_id.in_(chunk)))
+        rows = [
+            {'content_id': content_id, 'rank': rank, 'related_id': related_id, 'score': score}
+            for content_id, entries in lists.items()
+            for rank, (score, _, related_id) in enumerate(entries[:RELATED_LIMIT])
+        ]
+        if rows:
+            self.session.execute(insert(RelatedContent), rows)
+
+    def reindex(self, ids):
+        """Bring the lists up to date after the content rows ids changed (created, edited or deleted).
+
+        Lists of the changed items, and lists they appear in, are recomputed;
+        a changed item then joins any other list it now scores high enough for.
+        Returns the number of lists written.
+        """
+        ids = set(ids)
+        rows = self.rows(ids)
+        self.index_tags(ids, rows)
+
+        owners = set()
+        for chunk in _chunks(ids):
+            owners.update(self.session.scalars(
+                select(RelatedContent.content_id).where(RelatedContent.related_id.in_(chunk))
+            ))
+        rows.update(self.rows(owners - ids))
+        affected = ids | owners
+
+        lists, offers = {}, {}
+        for content_id in affected:
+            row = rows.get(content_id)
+            lists[content_id] = self.score(row) if row is not None else []
+            if content_id in ids:
+                for score, _, candidate_id in lists[content_id]:
+                    if candidate_id not in affected:
+                        offers.setdefault(candidate_id, []).append((score, row.popular_score or 0.0, content_id))
+
+        # Scores are symmetric: an item joins a list when it beats that list's last entry
+        current = {}
+        for chunk in _chunks(offers):
+            for content_id, score, popularity, related_id in self.session.execute(select(
+                RelatedContent.content_id, RelatedContent.score, Content.popular_score, RelatedContent.related_id
+            ).join(Content, Content.id == RelatedContent.related_id).where(RelatedContent.content_id.in_(chunk))):
+                current.setdefault(content_id, []).append((score, popularity or 0.0, related_id))
+        for content_id, entries in offers.items():
+            existing = sorted(current.get(content_id, []), reverse=True)
+            if len(existing) >= RELATED_LIMIT and max(entries) <= existing[RELATED_LIMIT - 1]:
+                continue
+            lists[content_id] = sorted(existing + entries, reverse=True)
+
+        self.write_lists(lists)
+        return len(lists)
+
+
+def rebuild_related(batch_size=500, echo=None):
+    """Rebuild the tag index and every related list from scratch; returns the number of lists.
+
+    Lists are replaced batch by batch, so the endpoint keeps serving the old
+    ones until their new versions are written.
+    """
+    session = db.session
+    session.execute(delete(ContentTag))
+
+    last_id = ''
+    while True:
+        batch = session.execute(select(Content.id, Content.tags).where(
+            Content.is_public.is_(True), Content.id > last_id
+        ).order_by(Content.id).limit(batch_size)).all()
+        if not batch:
+            break
+        postings = [{'tag': tag, 'content_id': row.id} for row in batch for tag in normalize_tags(row.tags)]
+        if postings:
+            session.execute(insert(ContentTag), postings)
+        last_id = batch[-1].id
+    session.commit()
+
+    index = RelatedIndex(session)
+    # Every frequency at once rather than per tag
+    counts = session.execute(select(ContentTag.tag, func.count()).group_by(ContentTag.tag)).all()
+    index._frequencies = {tag: math.log(1 + index.total / count) for tag, count in counts}
+
+    written = 0
+    last_id = ''
+    while True:
+        batch = session.execute(select(*ROW_COLUMNS).where(
+            Content.is_public.is_(True), Content.id > last_id
+        ).order_by(Content.id).limit(batch_size)).all()
+        if not batch:
+            break
+        index.write_lists({row.id: index.score(row) for row in batch})
+        session.commit()
+        written += len(batch)
+        last_id = batch[-1].id
+        if echo:
+            echo(f'{written} قائمة')
+
+    # Lists of items deleted or made private since the last run
+    session.execute(delete(RelatedContent).where(RelatedContent.content_id.not_in(
+        select(Content.id).where(Content.is_public.is_(True))
+    )))
+    session.commit()
+    return written
+
+
+def update_related(batch_size=500, echo=None, rebuild=False):
+    """Apply the content changes logged since the last run; returns the number of lists written.
+
+    The first run, any run after the change feed was compacted past the
+    indexer's position, and rebuild=True rebuild everything instead.
+    """
+    cursor = FeedCursor.get(CURSOR_NAME)
+    if rebuild or cursor is None or cursor < Change.horizon():
+        # Changes made while rebuilding are applied by the next run
+        latest = Change.latest_seq()
+        written = rebuild_related(batch_size, echo)
+        FeedCursor.set(CURSOR_NAME, latest)
+        db.session.commit()
+        return written
+
+    written = 0
+    while True:
+        changes = db.session.execute(select(Change.seq, Change.entity_id).where(
+            Change.entity == 'content', Change.seq > cursor
+        ).order_by(Change.seq).limit(batch_size)).all()
+        if not changes:
+            break
+        written += RelatedIndex(db.session).reindex({change.entity_id for change in changes})
+        cursor = changes[-1].seq
+        FeedCursor.set(CURSOR_NAME, cursor)
+        db.session.commit()
+    return written
+
+
+@click.command('update-related')
+@click.option('--rebuild', is_flag=True, help='Recompute every list instead of applying the latest changes')
+@click.option('--interval', type=float, help='Keep running, applying changes every INTERVAL seconds')
+@click.option('--batch-size', default=500, show_default=True, help='Items per transaction')
+@with_appcontext
+def update_related_command(rebuild, interval, batch_size):
+    """Update the precomputed related-content lists from the change feed."""
+    if rebuild:
+        written = update_related(batch_size, click.echo, rebuild=True)
+        click.echo(f'تمت إعادة بناء {written} قائمة')
+    while True:
+        written = update_related(batch_size)
+        if written or interval is None:
+            click.echo(f'تم تحديث {written} قائمة')
+        if interval is None:
+            break
+        time.sleep(interval)
@@ -0,0 +1,321 @@
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from src.models.content import Content, db
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 is only needed for the S3 backend
+    boto3 = None
+
+# Uploads are named by uuid and never change, so clients and CDNs may cache forever
+MEDIA_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def shard_key(filename):
+    """Storage key for filename under a hashed two-level fan-out (ab/cd/filename).
+
+    256 * 256 directories keep each one small even with millions of files, and
+    the key depends only on the name, so it can be recomputed from a legacy URL.
+    """
+    digest = hashlib.md5(filename.encode('utf-8')).hexdigest()
+    return f'{digest[0:2]}/{digest[2:4]}/{filename}'
+
+
+class LocalStorage:
+    """Files under a local directory, served by the app at base_url"""
+
+    name = 'local'
+
+    def __init__(self, root, base_url='/uploads'):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def url(self, key):
+        return f'{self.base_url}/{key}'
+
+    def key_for_url(self, url):
+        """The key behind a URL this backend produced, or None"""
+        prefix = self.base_url + '/'
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    def save_file(self, source_path, key, move=False):
+        """Store the file at source_path under key"""
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if move:
+            shutil.move(source_path, target)
+        else:
+            # A hard link shares the data, so migrating within one disk costs no space
+            try:
+                os.link(source_path, target)
+            except OSError:
+                shutil.copy2(source_path, target)
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    @contextmanager
+    def local_file(self, key):
+        """A filesystem path with the file's contents"""
+        yield self.path(key)
+
+    def open(self, key):
+        """Binary file object for reading; raises FileNotFoundError"""
+        return open(self.path(key), 'rb')
+
+    def temp_dir(self):
+        """Scratch directory on the same disk, so saving an upload is a rename"""
+        path = os.path.join(self.root, '.tmp')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def iter_files(self):
+        """Yield (key, size, mtime) for every stored file without listing them all at once"""
+        pending = [self.root]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        key = os.path.relpath(entry.path, self.root).replace(os.sep, '/')
+                        yield key, stat.st_size, stat.st_mtime
+
+
+class S3Storage:
+    """Files in an S3-compatible bucket (AWS, MinIO, R2...), served from public_url"""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', public_url=None, endpoint_url=None, region=None):
+        if boto3 is None:
+            raise RuntimeError('The S3 storage backend requires boto3 (pip install boto3)')
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+        if public_url is None:
+            public_url = f'{endpoint_url.rstrip("/")}/{bucket}' if endpoint_url else f'https://{bucket}.s3.amazonaws.com'
+        self.base_url = public_url.rstrip('/')
+
+    def object_name(self, key):
+        return self.prefix + key
+
+    def url(self, key):
+        return f'{self.base_url}/{self.object_name(key)}'
+
+    def key_for_url(self, url):
+        prefix = f'{self.base_url}/{self.prefix}'
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    def save_file(self, source_path, key, move=False):
+        content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        self.client.upload_file(source_path, self.bucket, self.object_name(key), ExtraArgs={
+            'ContentType': content_type,
+            'CacheControl': MEDIA_CACHE_CONTROL
+        })
+        if move:
+            os.remove(source_path)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_name(key))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_name(key))
+
+    @contextmanager
+    def local_file(self, key):
+        """Download the object to a temporary file for the duration of the block"""
+        handle, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        os.close(handle)
+        try:
+            self.client.download_file(self.bucket, self.object_name(key), path)
+            yield path
+        finally:
+            os.remove(path)
+
+    def open(self, key):
+        """Streaming body of the object, read as it is consumed; raises FileNotFoundError"""
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.object_name(key))['Body']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def temp_dir(self):
+        return None  # System temp directory
+
+    def iter_files(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['Size'], item['LastModified'].timestamp()
+
+
+def create_storage(app, backend=None):
+    """Build the storage backend named backend (default: STORAGE_BACKEND)"""
+    backend = backend or app.config['STORAGE_BACKEND']
+    if backend == 'local':
+        return LocalStorage(app.config['UPLOAD_FOLDER'], app.config['UPLOAD_URL'])
+    if backend == 's3':
+        return S3Storage(
+            app.config['S3_BUCKET'],
+            prefix=app.config['S3_PREFIX'],
+            public_url=app.config['S3_PUBLIC_URL'],
+            endpoint_url=app.config['S3_ENDPOINT_URL'],
+            region=app.config['S3_REGION']
+        )
+    raise ValueError(f'Unknown storage backend: {backend}')
+
+
+def init_storage(app):
+    """Configure the upload storage backend from the environment"""
+    app.config.setdefault('STORAGE_BACKEND', os.environ.get('STORAGE_BACKEND', 'local'))
+    app.config.setdefault('UPLOAD_URL', '/uploads')
+    app.config.setdefault('S3_BUCKET', os.environ.get('S3_BUCKET'))
+    app.config.setdefault('S3_PREFIX', os.environ.get('S3_PREFIX', 'uploads'))
+    app.config.setdefault('S3_PUBLIC_URL', os.environ.get('S3_PUBLIC_URL'))
+    app.config.setdefault('S3_ENDPOINT_URL', os.environ.get('S3_ENDPOINT_URL'))
+    app.config.setdefault('S3_REGION', os.environ.get('S3_REGION'))
+    app.extensions['storage'] = create_storage(app)
+
+
+def get_storage():
+    """The storage backend of the current app"""
+    return current_app.extensions['storage']
+
+
+def resolve_url(url):
+    """(backend, key) for a stored file URL, whichever backend produced it.
+
+    Rows keep their URL until `flask migrate-storage` moves them, so during a
+    migration some URLs still belong to the previous backend.
+    """
+    storage = get_storage()
+    key = storage.key_for_url(url)
+    if key is not None:
+        return storage, key
+    if storage.name != 'local':
+        local = create_storage(current_app, 'local')
+        key = local.key_for_url(url)
+        if key is not None:
+            return local, key
+    return None, None
+
+
+def save_upload(file, filename):
+    """Save an uploaded file, returning (key, local_path_for_inspection).
+
+    The upload is written to a scratch file first so the caller can read its
+    headers; call commit_upload to move it into storage.
+    """
+    storage = get_storage()
+    handle, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1], dir=storage.temp_dir())
+    os.close(handle)
+    file.save(path)
+    return shard_key(filename), path
+
+
+def commit_upload(path, key):
+    """Move a scratch file from save_upload into storage under key"""
+    get_storage().save_file(path, key, move=True)
+
+
+def migrate_files(source, target, batch_size=200, remove_source=True, echo=None):
+    """Move every file referenced by content rows from source to target.
+
+    Each file is copied first, then its row is switched to the new URL, and
+    only then is the old copy removed, so every URL a client may hold keeps
+    working throughout. Returns (rows_updated, files_moved).
+    """
+    rows_updated = files_moved = 0
+    last_id = ''
+    while True:
+        batch = Content.query.filter(Content.id > last_id).order_by(Content.id).limit(batch_size).all()
+        if not batch:
+            break
+
+        superseded = []
+        for content in batch:
+            urls = {}
+            for url in {content.file_url, content.thumbnail_url}:
+                key = source.key_for_url(url)
+                if key is None:
+                    continue  # Not on the source backend (already migrated)
+                new_key = shard_key(key.rsplit('/', 1)[-1])
+                if target is source and key == new_key:
+                    continue
+                if not target.exists(new_key):
+                    if not source.exists(key):
+                        continue  # Dangling row; left for `flask reconcile-uploads`
+                    with source.local_file(key) as path:
+                        target.save_file(path, new_key)
+                    files_moved += 1
+                urls[url] = target.url(new_key)
+                superseded.append(key)
+
+            if urls:
+                content.file_url = urls.get(content.file_url, content.file_url)
+                content.thumbnail_url = urls.get(content.thumbnail_url, content.thumbnail_url)
+                rows_updated += 1
+
+        db.session.commit()
+        if remove_source:
+            for key in superseded:
+                source.delete(key)
+        last_id = batch[-1].id
+        if echo:
+            echo(f'  {rows_updated} عنصر، {files_moved} ملف')
+    return rows_updated, files_moved
+
+
+@click.command('migrate-storage')
+@click.option('--source', 'source_name', type=click.Choice(['local', 's3']), default='local', show_default=True,
+              help='Backend the files are on now')
+@click.option('--keep-source', is_flag=True, help='Leave the old copies in place')
+@click.option('--batch-size', default=200, show_default=True, help='Rows per transaction')
+@with_appcontext
+def migrate_storage_command(source_name, keep_source, batch_size):
+    """Move existing uploads into the configured backend and sharded layout.
+
+    Safe to run while the app is serving traffic, and to re-run after an
+    interruption: rows are switched only after their file has been copied.
+    """
+    target = get_storage()
+    source = target if source_name == target.name else create_storage(current_app, source_name)
+    started = time.monotonic()
+    rows, files = migrate_files(source, target, batch_size, remove_source=not keep_source, echo=click.echo)
+    click.echo(f'تم نقل {files} ملف وتحديث {rows} عنصر في {time.monotonic() - started:.1f} ثانية')
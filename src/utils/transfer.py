@@ -0,0 +1,382 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Boolean, DateTime, Enum, select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+
+from src.models.user import User, db
+from src.models.category import Category
+from src.models.type import Type
+from src.models.brand import Brand
+from src.models.settings import Settings
+from src.models.content import Content
+from src.models.change import Change, TRACKED_MODELS
+from src.utils.storage import get_storage, resolve_url, shard_key
+
+EXPORT_FORMAT = 'zamzam-catalogue'
+EXPORT_VERSION = 1
+
+# Record types in dependency order: every row's references precede it
+EXPORT_MODELS = (
+    ('user', User),
+    ('category', Category),
+    ('type', Type),
+    ('brand', Brand),
+    ('settings', Settings),
+    ('content', Content)
+)
+
+# Rows matching an existing row on these columns are merged into it rather than
+# inserted, and references to them are pointed at the existing row
+NATURAL_KEYS = {
+    'user': ('username',),
+    'category': ('name',),
+    'type': ('category_id', 'name'),
+    'brand': ('name',),
+    'settings': ('key',)
+}
+
+# Content columns holding upload URLs, rewritten when an archive brings the files along
+MEDIA_COLUMNS = ('file_url', 'thumbnail_url')
+
+CATALOGUE_NAME = 'catalogue.ndjson'
+MEDIA_PREFIX = 'media/'
+
+DEFAULT_BATCH_SIZE = 5000
+ERROR_LIMIT = 100
+CHUNK_SIZE = 64 * 1024
+
+
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=_encode) + '\n'
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Cannot export {type(value).__name__}')
+
+
+def export_records(media=False, batch_size=1000):
+    """Yield the catalogue as NDJSON lines: a header, then one line per row.
+
+    Rows are streamed with yield_per, so memory stays flat however large the
+    tables are.
+    """
+    yield _dump({
+        'type': 'header',
+        'format': EXPORT_FORMAT,
+        'version': EXPORT_VERSION,
+        'exported_at': datetime.utcnow(),
+        'media': media
+    })
+    for record_type, model in EXPORT_MODELS:
+        table = model.__table__
+        statement = select(table).order_by(*table.primary_key.columns)
+        for row in db.session.execute(statement, execution_options={'yield_per': batch_size}):
+            yield _dump({'type': record_type, 'data': dict(row._mapping)})
+
+
+def iter_chunks(lines, size=CHUNK_SIZE):
+    """Join lines into chunks of about size bytes for streaming responses"""
+    buffer, buffered = [], 0
+    for line in lines:
+        encoded = line.encode('utf-8')
+        buffer.append(encoded)
+        buffered += len(encoded)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def write_archive(fileobj, batch_size=1000):
+    """Write a tar archive with the catalogue and every stored file it references"""
+    with tempfile.TemporaryFile() as catalogue:
+        # Written out first because a tar header needs the member's size
+        for chunk in iter_chunks(export_records(media=True, batch_size=batch_size)):
+            catalogue.write(chunk)
+        size = catalogue.tell()
+        catalogue.seek(0)
+
+        files = 0
+        with tarfile.open(fileobj=fileobj, mode='w|') as tar:
+            info = tarfile.TarInfo(CATALOGUE_NAME)
+            info.size = size
+            info.mtime = int(time.time())
+            tar.addfile(info, catalogue)
+
+            statement = select(Content.file_url, Content.thumbnail_url).order_by(Content.id)
+            for urls in db.session.execute(statement, execution_options={'yield_per': batch_size}):
+                for url in dict.fromkeys(url for url in urls if url):
+                    backend, key = resolve_url(url)
+                    if backend is None or not backend.exists(key):
+                        continue  # Reported by `flask reconcile-uploads`
+                    with backend.local_file(key) as path:
+                        tar.add(path, arcname=MEDIA_PREFIX + key.rsplit('/', 1)[-1], recursive=False)
+                    files += 1
+    return files
+
+
+class CatalogueImport:
+    """Validates catalogue records and inserts them in batches.
+
+    The ids of every referenced table are loaded once, up front, so checking
+    and remapping foreign keys costs no queries per row.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, storage=None):
+        self.batch_size = batch_size
+        # Set when the files come along: upload URLs are pointed at this storage
+        self.storage = storage
+        self.id_maps = {}
+        self.known_ids = {}
+        self.plans = {}
+        self.report = {'inserted': {}, 'existing': {}, 'invalid': 0, 'dangling': 0, 'errors': []}
+
+    def _error(self, line_number, message):
+        self.report['invalid'] += 1
+        if len(self.report['errors']) < ERROR_LIMIT:
+            self.report['errors'].append({'line': line_number, 'error': message})
+
+    def _ids(self, table):
+        if table.name not in self.known_ids:
+            (column,) = table.primary_key.columns
+            self.known_ids[table.name] = set(db.session.scalars(select(column)))
+        return self.known_ids[table.name]
+
+    def _plan(self, table):
+        """Per-column decoding rules, worked out once per table rather than per row"""
+        if table.name not in self.plans:
+            plan = []
+            for column in table.columns:
+                default = column.default
+                if default is not None and not (default.is_scalar or default.is_callable):
+                    default = None  # SQL expression defaults cannot be sent as parameters
+                foreign_keys = [foreign_key.column.table for foreign_key in column.foreign_keys]
+                plan.append((
+                    column.name, column.type, default, column.nullable,
+                    foreign_keys[0] if foreign_keys else None,
+                    self.storage is not None and table.name == 'content' and column.name in MEDIA_COLUMNS
+                ))
+            self.plans[table.name] = plan
+        return self.plans[table.name]
+
+    def _decode(self, table, data):
+        if not isinstance(data, dict):
+            raise ValueError('data must be an object')
+        row = {}
+        for name, column_type, default, nullable, target, media in self._plan(table):
+            value = data.get(name)
+            if value is None:
+                if default is not None:
+                    value = default.arg if default.is_scalar else default.arg(None)
+                elif not nullable:
+                    raise ValueError(f'{name} is required')
+            elif isinstance(column_type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column_type, Enum) and value not in column_type.enums:
+                raise ValueError(f'{name} must be one of {", ".join(column_type.enums)}')
+            elif isinstance(column_type, Boolean) and not isinstance(value, bool):
+                raise ValueError(f'{name} must be true or false')
+
+            if target is not None:
+                value = self.id_maps.get(target.name, {}).get(value, value)
+                if value is not None and value not in self._ids(target):
+                    # Optional references are cleared; required ones are kept as they
+                    # were in the source (uploads without a user carry 'default-user-id')
+                    if nullable:
+                        value = None
+                    else:
+                        self.report['dangling'] += 1
+
+            if media and value:
+                value = self.storage.url(shard_key(value.rsplit('/', 1)[-1]))
+            row[name] = value
+        return row
+
+    def _merge_existing(self, record_type, table, rows):
+        """Drop rows that already exist under their natural key, remembering the id mapping"""
+        columns = NATURAL_KEYS.get(record_type)
+        if not columns or not rows:
+            return rows
+        (primary_key,) = table.primary_key.columns
+        key_columns = [table.c[name] for name in columns]
+        keys = {tuple(row[name] for name in columns) for row in rows}
+        condition = key_columns[0].in_([key[0] for key in keys]) if len(columns) == 1 else tuple_(*key_columns).in_(keys)
+        existing = {
+            tuple(found[1:]): found[0]
+            for found in db.session.execute(select(primary_key, *key_columns).where(condition))
+        }
+
+        remaining = []
+        id_map = self.id_maps.setdefault(table.name, {})
+        for row in rows:
+            local_id = existing.get(tuple(row[name] for name in columns))
+            if local_id is None:
+                remaining.append(row)
+            elif local_id != row[primary_key.name]:
+                id_map[row[primary_key.name]] = local_id
+        return remaining
+
+    def _flush(self, record_type, pending):
+        model = dict(EXPORT_MODELS)[record_type]
+        table = model.__table__
+        rows = []
+        for line_number, data in pending:
+            try:
+                rows.append(self._decode(table, data))
+            except (ValueError, TypeError) as e:
+                self._error(line_number, f'{record_type}: {e}')
+
+        total = len(rows)
+        rows = self._merge_existing(record_type, table, rows)
+        inserted = 0
+        if rows:
+            # Ids already present (a repeated import) are skipped, not failed
+            statement = insert(table).on_conflict_do_nothing()
+            if model in TRACKED_MODELS:
+                # Core inserts bypass the flush hook, so the change feed is written here
+                entity, key = TRACKED_MODELS[model]
+                keys = db.session.scalars(statement.returning(table.c[key]), rows).all()
+                Change.record(db.session, [(entity, value, 'upsert') for value in keys])
+                inserted = len(keys)
+            else:
+                inserted = db.session.execute(statement, rows).rowcount
+        db.session.commit()
+
+        # Skipped rows may have clashed on another unique column, so only ids now present count
+        (primary_key,) = table.primary_key.columns
+        if table.name in self.known_ids and rows:
+            ids = [row[primary_key.name] for row in rows]
+            self.known_ids[table.name].update(db.session.scalars(select(primary_key).where(primary_key.in_(ids))))
+        self.report['inserted'][record_type] = self.report['inserted'].get(record_type, 0) + inserted
+        self.report['existing'][record_type] = self.report['existing'].get(record_type, 0) + total - inserted
+
+    def run(self, lines):
+        """Import NDJSON lines (str or UTF-8 bytes) produced by export_records"""
+        pending, pending_type = [], None
+        header = None
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record_type = record['type']
+            except (ValueError, KeyError, TypeError):
+                self._error(line_number, 'not a JSON record with a type')
+                continue
+
+            if header is None:
+                if record_type != 'header' or record.get('format') != EXPORT_FORMAT:
+                    raise ValueError('Not a catalogue export')
+                if record.get('version', 0) > EXPORT_VERSION:
+                    raise ValueError(f'Unsupported catalogue version {record["version"]}')
+                header = record
+                continue
+            if record_type not in NATURAL_KEYS and record_type != 'content':
+                self._error(line_number, f'unknown record type {record_type!r}')
+                continue
+
+            if record_type != pending_type and pending:
+                self._flush(pending_type, pending)
+                pending = []
+            pending_type = record_type
+            pending.append((line_number, record.get('data')))
+            if len(pending) >= self.batch_size:
+                self._flush(pending_type, pending)
+                pending = []
+
+        if pending:
+            self._flush(pending_type, pending)
+        if header is None:
+            raise ValueError('Not a catalogue export')
+        return self.report
+
+
+def import_catalogue(fileobj, batch_size=DEFAULT_BATCH_SIZE):
+    """Import an NDJSON export (optionally gzipped) or a tar archive from write_archive"""
+    if not hasattr(fileobj, 'peek'):
+        fileobj = io.BufferedReader(fileobj)
+    if fileobj.peek(2)[:2] == b'\x1f\x8b':
+        fileobj = io.BufferedReader(gzip.GzipFile(fileobj=fileobj))
+    if fileobj.peek(1)[:1] != b'{':
+        return import_archive(fileobj, batch_size)
+    return CatalogueImport(batch_size).run(fileobj)
+
+
+def import_archive(fileobj, batch_size=DEFAULT_BATCH_SIZE):
+    """Import a tar archive: the catalogue, then its files into the configured storage"""
+    storage = get_storage()
+    report = None
+    files = 0
+    try:
+        tar = tarfile.open(fileobj=fileobj, mode='r|*')
+    except tarfile.ReadError as e:
+        raise ValueError(f'Not a catalogue export or archive ({e})')
+    with tar:
+        for member in tar:
+            if member.name == CATALOGUE_NAME:
+                report = CatalogueImport(batch_size, storage).run(tar.extractfile(member))
+            elif member.isfile() and member.name.startswith(MEDIA_PREFIX):
+                # Only the base name is used, so member paths cannot escape storage
+                filename = os.path.basename(member.name)
+                key = shard_key(filename)
+                if filename.startswith('.') or storage.exists(key):
+                    continue
+                handle, path = tempfile.mkstemp(dir=storage.temp_dir())
+                with os.fdopen(handle, 'wb') as f:
+                    shutil.copyfileobj(tar.extractfile(member), f)
+                storage.save_file(path, key, move=True)
+                files += 1
+    if report is None:
+        raise ValueError(f'The archive has no {CATALOGUE_NAME}')
+    report['files'] = files
+    return report
+
+
+@click.command('export-catalogue')
+@click.argument('output', type=click.File('wb'))
+@click.option('--media', is_flag=True, help='Write a tar archive that includes the stored files')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip')
+@with_appcontext
+def export_catalogue_command(output, media, batch_size):
+    """Export content, taxonomy, settings and users as NDJSON (OUTPUT may be -)."""
+    started = time.monotonic()
+    if media:
+        files = write_archive(output, batch_size)
+        click.echo(f'تم تصدير الكتالوج و{files} ملف في {time.monotonic() - started:.1f} ثانية', err=True)
+        return
+    for chunk in iter_chunks(export_records(batch_size=batch_size)):
+        output.write(chunk)
+    click.echo(f'تم تصدير الكتالوج في {time.monotonic() - started:.1f} ثانية', err=True)
+
+
+@click.command('import-catalogue')
+@click.argument('source', type=click.File('rb'))
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Rows per INSERT')
+@with_appcontext
+def import_catalogue_command(source, batch_size):
+    """Import an export (NDJSON or --media archive); existing rows are kept."""
+    started = time.monotonic()
+    report = import_catalogue(source, batch_size)
+    for record_type, _ in EXPORT_MODELS:
+        if record_type in report['inserted']:
+            click.echo(f'{record_type}: {report["inserted"][record_type]} جديد، '
+                       f'{report["existing"][record_type]} موجود مسبقاً')
+    if 'files' in report:
+        click.echo(f'{report["files"]} ملف')
+    click.echo(f'{report["invalid"]} سجل غير صالح، {report["dangling"]} مرجع إلى سجل غير موجود')
+    for error in report['errors'][:20]:
+        click.echo(f'  سطر {error["line"]}: {error["error"]}')
+    click.echo(f'اكتمل الاستيراد في {time.monotonic() - started:.1f} ثانية')
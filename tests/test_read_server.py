@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('aiosqlite')
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from benchmarks.seed import seed_database
+from src.models.taxonomy import invalidate_taxonomy
+from src.read_server import create_app
+
+# Longest a burst of requests may take before the loop counts as stuck
+DEADLOCK_TIMEOUT = 30
+
+
+@pytest.fixture(scope='module')
+def database(tmp_path_factory):
+    path = tmp_path_factory.mktemp('read-server') / 'app.db'
+    seed_database(str(path), 300, echo=lambda message: None)
+    return f'sqlite:///{path}'
+
+
+def run_in_thread(scenario):
+    """Run scenario() on its own event loop; a deadlocked loop cannot time itself out"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=asyncio.run(scenario())), daemon=True)
+    thread.start()
+    thread.join(DEADLOCK_TIMEOUT)
+    assert not thread.is_alive(), 'read server stopped answering (event loop blocked)'
+    return result['value']
+
+
+def test_concurrent_requests_on_a_cold_taxonomy(database, tmp_path):
+    invalidate_taxonomy()
+
+    async def scenario():
+        async with TestClient(TestServer(create_app(database, str(tmp_path)))) as client:
+            async def get(path):
+                async with client.get(path) as response:
+                    await response.read()
+                    return response.status
+
+            paths = ['/api/content'] * 8 + ['/api/taxonomy', '/api/categories', '/health']
+            return await asyncio.gather(*(get(path) for path in paths))
+
+    assert run_in_thread(scenario) == [200] * 11